@@ -4,21 +4,24 @@ A fully functional banking system with account management, transaction history,
 data persistence, and email notifications for all transactions.
 """
 
-import json
-import os
 from datetime import datetime
-import smtplib
-import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import re  # For email validation
+from bank_money import to_cents, parse_money, format_money
+from bank_store import (get_account, get_history_page, get_stats,
+                        get_payees, set_favorite_payee, account_exists, count_accounts, save_account,
+                        alert_threshold, get_contact, get_store, TransactionError, UnconvertedStore)
+from bank_engine import Bank, validate_email, MIN_INITIAL_DEPOSIT, DEFAULT_ALERT_THRESHOLD
+from bank_mail import get_dispatcher, EMAIL_TESTING_MODE
+from bank_templates import email_templates
+from bank_digest import DIGEST_MODES, DEFAULT_DIGEST, digest_window, digest_entries
+
+HISTORY_PAGE_SIZE = 20  # Transactions shown per history page
 
 # ========== ENHANCEMENT 1: Email Configuration ==========
 # Email settings for sending notifications
 # NOTE: For testing, you can use a Gmail account with "App Password"
 
 # Define TESTING_MODE at the global level
-TESTING_MODE = True  # Set to False when you have real email credentials
+TESTING_MODE = EMAIL_TESTING_MODE  # Set CYGOBANK_EMAIL_MODE=production when you have real email credentials
 
 EMAIL_CONFIG = {
     'smtp_server': 'smtp.gmail.com',  # For Gmail
@@ -28,15 +31,11 @@ EMAIL_CONFIG = {
     'use_tls': True
 }
 
-# ========== ENHANCEMENT 2: Email Validation Function ==========
-def validate_email(email):
-    """Validate email format using regex"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+mailer = get_dispatcher(EMAIL_CONFIG)  # Background sender with pooled SMTP sessions
 
 # ========== ENHANCEMENT 3: Email Notification Function ==========
-def send_email_notification(recipient_email, subject, message_body):
-    """Send email notification to customer"""
+def send_email_notification(recipient_email, subject, message_body, wait=False):
+    """Send email notification to customer (queued unless `wait` is True)"""
     
     # FIXED: Use the global TESTING_MODE without redeclaring it
     if TESTING_MODE:
@@ -52,310 +51,133 @@ def send_email_notification(recipient_email, subject, message_body):
         print("✅ Email would be sent in production mode")
         return True
     
-    try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_CONFIG['sender_email']
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
-        
-        # Add body
-        msg.attach(MIMEText(message_body, 'plain'))
-        
-        # Create secure connection
-        context = ssl.create_default_context()
-        
-        # Send email
-        with smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port']) as server:
-            server.starttls(context=context)
-            server.login(EMAIL_CONFIG['sender_email'], EMAIL_CONFIG['sender_password'])
-            server.send_message(msg)
-        
-        print(f"📧 Email notification sent to {recipient_email}")
+    # Production: hand the message to the background sender (pooled SMTP
+    # sessions), so the transaction never waits on the mail server
+    delivery = mailer.send(recipient_email, subject, message_body)
+    if not wait:
+        delivery.add_done_callback(lambda done: _report_delivery(recipient_email, done))
+        print(f"📧 Email notification queued for {recipient_email}")
         return True
-        
+    try:
+        delivery.result()
     except Exception as e:
         print(f"❌ Failed to send email: {e}")
         return False
+    print(f"📧 Email notification sent to {recipient_email}")
+    return True
+
+def _report_delivery(recipient_email, delivery):
+    """Print the outcome of a queued email once the sender thread is done with it"""
+    if delivery.exception() is not None:
+        print(f"❌ Failed to send email to {recipient_email}: {delivery.exception()}")
 
 # ========== ENHANCEMENT 4: Transaction Email Templates (FIXED) ==========
 def get_email_template(transaction_type, account_data, amount, balance):
-    """Generate email template based on transaction type"""
-    
-    templates = {
-        'WELCOME': {
-            'subject': '🎉 Welcome to Cy_Bank! Your Account Has Been Created',
-            'body': f"""
-Dear {account_data['name']},
-
-Welcome to Cy_Bank! We're thrilled to have you as our customer.
-
-Your new account has been successfully created with the following details:
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-Account Number: {account_data['account_number']}
-Account Holder: {account_data['name']}
-Email: {account_data['email']}
-Initial Deposit: ${amount:.2f}
-Current Balance: ${balance:.2f}
-Created Date: {account_data['created']}
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-You can now:
-• Check your balance anytime
-• Make deposits and withdrawals
-• Transfer money to other accounts
-• View transaction history
-• Earn interest on your savings
-
-Thank you for choosing Cy_Bank!
-
-Best regards,
-The Cy_Bank Team
-"""
-        },
-        
-        'DEPOSIT': {
-            'subject': '💰 Deposit Confirmation - Cy_Bank',
-            'body': f"""
-Dear {account_data['name']},
-
-Your deposit has been successfully processed!
-
-Transaction Details:
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-Account Number: {account_data['account_number']}
-Transaction Type: DEPOSIT
-Amount: +${amount:.2f}
-Previous Balance: ${balance - amount:.2f}
-New Balance: ${balance:.2f}
-Date/Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-Thank you for banking with us!
-
-Best regards,
-The Cy_Bank Team
-"""
-        },
-        
-        'WITHDRAWAL': {
-            'subject': '💳 Withdrawal Confirmation - Cy_Bank',
-            'body': f"""
-Dear {account_data['name']},
-
-Your withdrawal has been successfully processed!
-
-Transaction Details:
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-Account Number: {account_data['account_number']}
-Transaction Type: WITHDRAWAL
-Amount: -${amount:.2f}
-Previous Balance: ${balance + amount:.2f}
-New Balance: ${balance:.2f}
-Date/Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-If you did not authorize this transaction, please contact us immediately.
-
-Best regards,
-The Cy_Bank Team
-"""
-        },
-        
-        'TRANSFER_SENT': {
-            'subject': '💸 Transfer Sent Confirmation - Cy_Bank',
-            'body': f"""
-Dear {account_data['name']},
-
-Your transfer has been successfully sent!
-
-Transaction Details:
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-Account Number: {account_data['account_number']}
-Transaction Type: TRANSFER SENT
-To Account: {account_data.get('to_account', 'Unknown')}
-Amount: -${amount:.2f}
-Previous Balance: ${balance + amount:.2f}
-New Balance: ${balance:.2f}
-Date/Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-Thank you for using our transfer service!
-
-Best regards,
-The Cy_Bank Team
+    """Generate email template based on transaction type (only that template is rendered)"""
+    return email_templates.render(transaction_type, account_data, amount, balance)
+
+def get_digest_template(account_data, events, low_balance_threshold=None):
+    """Generate one summary email for several coalesced notifications
+
+    `low_balance_threshold` adds a low balance alert when the final
+    balance is below it.
+    """
+    entries = digest_entries(events)
+    lines = "\n".join(
+        f"{date}  {label:<18} {'+' if amount >= 0 else '-'}{format_money(abs(amount)):>12}  "
+        f"Balance: {format_money(balance)}{'  (' + detail + ')' if detail else ''}"
+        for date, label, amount, balance, detail in entries
+    )
+    net = sum(amount for _, _, amount, _, _ in entries)
+    balance = entries[-1][3]
+    alert = ""
+    if low_balance_threshold is not None and balance < low_balance_threshold:
+        alert = f"""
+⚠️ LOW BALANCE: your balance is below your alert threshold of {format_money(low_balance_threshold)}.
+Please consider making a deposit to maintain sufficient funds.
 """
-        },
-        
-        'TRANSFER_RECEIVED': {
-            'subject': '📥 Transfer Received Notification - Cy_Bank',
-            'body': f"""
+    return {
+        'subject': f"📋 Your Cy_Bank Activity Summary ({len(entries)} transactions)",
+        'body': f"""
 Dear {account_data['name']},
 
-You have received a transfer!
+Here is a summary of the recent activity on your account.
 
-Transaction Details:
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 Account Number: {account_data['account_number']}
-Transaction Type: TRANSFER RECEIVED
-From Account: {account_data.get('from_account', 'Unknown')}
-Amount: +${amount:.2f}
-Previous Balance: ${balance - amount:.2f}
-New Balance: ${balance:.2f}
-Date/Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-Best regards,
-The Cy_Bank Team
-"""
-        },
-        
-        'INTEREST': {
-            'subject': '💹 Interest Credited - Cy_Bank',
-            'body': f"""
-Dear {account_data['name']},
-
-Interest has been credited to your account!
-
-Transaction Details:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-Account Number: {account_data['account_number']}
-Transaction Type: INTEREST
-Amount: +${amount:.2f}
-Previous Balance: ${balance - amount:.2f}
-New Balance: ${balance:.2f}
-Interest Rate: 1% monthly
-Date/Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+{lines}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-Your money is growing with us!
+Net Change: {'+' if net >= 0 else '-'}{format_money(abs(net))}
+Current Balance: {format_money(balance)}
+{alert}
+You are receiving summaries instead of one email per transaction.
+You can change this in your notification preferences.
 
 Best regards,
 The Cy_Bank Team
 """
-        },
-        
-        'LOW_BALANCE': {
-            'subject': '⚠️ Low Balance Alert - Cy_Bank',
-            'body': f"""
-Dear {account_data['name']},
-
-This is an alert regarding your account balance.
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-Account Number: {account_data['account_number']}
-Current Balance: ${balance:.2f}
-Alert Type: LOW BALANCE (below $100)
-Date/Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-Please consider making a deposit to maintain sufficient funds.
-
-Best regards,
-The Cy_Bank Team
-"""
-        }
     }
-    
-    # Get the template or use default
-    template = templates.get(transaction_type)
-    
-    if template:
-        return template
-    else:
-        # Default template for unknown transaction types
-        return {
-            'subject': 'Cy_Bank Transaction Notification',
-            'body': f"""
-Dear {account_data['name']},
-
-A transaction has occurred on your account.
-
-Account: {account_data['account_number']}
-Amount: ${amount:.2f}
-New Balance: ${balance:.2f}
-
-Thank you for banking with Cy_Bank.
-"""
-        }
 
-# ========== Data Persistence Functions ==========
-def load_accounts():
-    """Load accounts from JSON file"""
-    if os.path.exists('bank_accounts.json'):
-        try:
-            with open('bank_accounts.json', 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_accounts(accounts):
-    """Save accounts to JSON file"""
-    with open('bank_accounts.json', 'w') as f:
-        json.dump(accounts, f, indent=2)
-
-def log_transaction(account_number, transaction_type, amount, description=""):
-    """Record a transaction in account history"""
-    accounts = load_accounts()
-    if account_number in accounts:
-        if 'transactions' not in accounts[account_number]:
-            accounts[account_number]['transactions'] = []
-        
-        accounts[account_number]['transactions'].append({
-            'type': transaction_type,
-            'amount': amount,
-            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'description': description
-        })
-        save_accounts(accounts)
-
-def show_transaction_history(account_number):
-    """Display transaction history"""
-    accounts = load_accounts()
-    if account_number not in accounts:
+def show_transaction_history(account_number, page_size=HISTORY_PAGE_SIZE):
+    """Display transaction history one page at a time (newest first)"""
+    if get_account(account_number, fields=('name',)) is None:
         print("❌ Account not found!")
         return
     
-    print("\n" + "="*60)
-    print("TRANSACTION HISTORY")
-    print("="*60)
-    
-    transactions = accounts[account_number].get('transactions', [])
-    if not transactions:
-        print("No transactions found.")
-        return
-    
-    print(f"{'Date':<20} {'Type':<15} {'Amount':>12} {'Description'}")
-    print("-"*70)
-    
-    for t in transactions:
-        date = t.get('date', 'Unknown')[:16]  # Truncate to YYYY-MM-DD HH:MM
-        trans_type = t.get('type', '')
-        amount = t.get('amount', 0)
-        desc = t.get('description', '')
+    cursors = [None]  # Cursor of every page shown so far, for going back
+    while True:
+        page = get_history_page(account_number, cursors[-1], page_size)
+        transactions = page['transactions']
+        
+        print("\n" + "="*60)
+        print("TRANSACTION HISTORY")
+        print("="*60)
+        
+        if not transactions:
+            print("No transactions found.")
+            return
+        
+        print(f"{'Date':<20} {'Type':<15} {'Amount':>12} {'Description'}")
+        print("-"*70)
+        
+        for t in transactions:
+            date = t.get('date', 'Unknown')[:16]  # Truncate to YYYY-MM-DD HH:MM
+            trans_type = t.get('type', '')
+            amount = t.get('amount', 0)
+            desc = t.get('description', '')
+            
+            if trans_type in ['DEPOSIT', 'TRANSFER_IN', 'INTEREST']:
+                print(f"{date:<20} {trans_type:<15} {format_money(amount, sign=True):>12}  {desc}")
+            else:
+                print(f"{date:<20} {trans_type:<15} {format_money(-amount):>12}  {desc}")
+        
+        print("-"*70)
+        total_pages = max((page['total'] + page_size - 1) // page_size, 1)
+        print(f"Page {len(cursors)} of {total_pages} ({page['total']} transactions)")
         
-        if trans_type in ['DEPOSIT', 'TRANSFER_IN', 'INTEREST']:
-            print(f"{date:<20} {trans_type:<15} +${amount:>10.2f}  {desc}")
+        options = []
+        if page['next_cursor'] is not None:
+            options.append("n = next (older)")
+        if len(cursors) > 1:
+            options.append("p = previous (newer)")
+        if not options:
+            return
+        choice = input(f"Page: {', '.join(options)}, q = quit: ").strip().lower()
+        if choice == 'n' and page['next_cursor'] is not None:
+            cursors.append(page['next_cursor'])
+        elif choice == 'p' and len(cursors) > 1:
+            cursors.pop()
         else:
-            print(f"{date:<20} {trans_type:<15} -${amount:>10.2f}  {desc}")
-    
-    print("-"*70)
-
-def calculate_interest(balance, rate=0.01):
-    """Calculate monthly interest on balance"""
-    interest = balance * rate
-    return interest
+            return
 
 def show_balance_enhanced(account_number):
     """Enhanced balance display with account info"""
-    accounts = load_accounts()
-    if account_number not in accounts:
+    account = get_account(account_number)
+    if account is None:
         print("❌ Account not found!")
         return
     
-    account = accounts[account_number]
-    balance = float(account['balance'])
+    balance = account['balance']
     
     print("\n" + "="*50)
     print(f"ACCOUNT STATEMENT")
@@ -364,13 +186,13 @@ def show_balance_enhanced(account_number):
     print(f"Account Holder: {account['name']}")
     print(f"Account Created: {account.get('created', 'Unknown')}")
     print("-"*50)
-    print(f"Current Balance: ${balance:,.2f}")
+    print(f"Current Balance: {format_money(balance)}")
     
-    if balance > 10000:
+    if balance > to_cents(10000):
         print("⭐ Premium Account Status")
-    elif balance > 1000:
+    elif balance > to_cents(1000):
         print("✓ Standard Account")
-    elif balance > 100:
+    elif balance > to_cents(100):
         print("ℹ️ Basic Account")
     else:
         print("⚠️ Low Balance")
@@ -379,31 +201,31 @@ def show_balance_enhanced(account_number):
 
 def show_account_summary(account_number):
     """Display comprehensive account summary"""
-    accounts = load_accounts()
-    if account_number not in accounts:
+    account = get_account(account_number)
+    if account is None:
         return
     
-    account = accounts[account_number]
-    balance = float(account['balance'])
-    transactions = account.get('transactions', [])
+    balance = account['balance']
+    stats = get_stats(account_number)
     
     print("\n" + "="*60)
     print("ACCOUNT SUMMARY")
     print("="*60)
     print(f"Account: {account_number}")
     print(f"Holder: {account['name']}")
-    print(f"Balance: ${balance:,.2f}")
+    print(f"Balance: {format_money(balance)}")
     
-    if transactions:
-        total_deposits = sum(t['amount'] for t in transactions if t['type'] in ['DEPOSIT', 'TRANSFER_IN', 'INTEREST'])
-        total_withdrawals = sum(t['amount'] for t in transactions if t['type'] in ['WITHDRAWAL', 'TRANSFER_OUT'])
+    if stats['count']:
+        total_deposits = stats['inflow']
+        total_withdrawals = stats['outflow']
         
         print("\n📊 STATISTICS")
         print("-"*40)
-        print(f"Total Deposits: ${total_deposits:,.2f}")
-        print(f"Total Withdrawals: ${total_withdrawals:,.2f}")
-        print(f"Net Flow: ${total_deposits - total_withdrawals:,.2f}")
-        print(f"Transaction Count: {len(transactions)}")
+        print(f"Total Deposits: {format_money(total_deposits)}")
+        print(f"Total Withdrawals: {format_money(total_withdrawals)}")
+        print(f"Net Flow: {format_money(total_deposits - total_withdrawals)}")
+        print(f"Transaction Count: {stats['count']}")
+        print(f"Last Activity: {stats['last_activity']}")
     
     if 'created' in account:
         created = datetime.strptime(account['created'], '%Y-%m-%d %H:%M:%S')
@@ -418,24 +240,18 @@ def login():
     print("ACCOUNT LOGIN")
     print("="*50)
     
-    accounts = load_accounts()
-    
-    if not accounts:
+    if not count_accounts():
         print("❌ No accounts found. Please create an account first.")
         return None
     
-    print("Available accounts:")
-    for acc_num, acc_data in accounts.items():
-        print(f"  • {acc_num} - {acc_data['name']}")
-    
-    print()
     account_number = input("Enter your account number: ").strip()
+    account = get_account(account_number, fields=('name',))
     
-    if account_number not in accounts:
+    if account is None:
         print(f"❌ Account '{account_number}' not found!")
         return None
     
-    print(f"\n✅ Welcome back, {accounts[account_number]['name']}!")
+    print(f"\n✅ Welcome back, {account['name']}!")
     return account_number
 
 # ========== ENHANCEMENT 5: Account Management with Email ==========
@@ -445,15 +261,13 @@ def create_account():
     print("CREATE NEW ACCOUNT")
     print("="*50)
     
-    accounts = load_accounts()
-    
     # Get account number
     while True:
         account_number = input("Enter new account number: ").strip()
         if not account_number:
             print("❌ Account number cannot be empty!")
             continue
-        if account_number in accounts:
+        if account_exists(account_number):
             print("❌ Account number already exists!")
             continue
         break
@@ -478,72 +292,46 @@ def create_account():
     initial_deposit = 0
     while True:
         try:
-            initial_deposit = float(input("Enter initial deposit (minimum $10): "))
-            if initial_deposit < 10:
+            initial_deposit = parse_money(input("Enter initial deposit (minimum $10): "))
+            if initial_deposit < MIN_INITIAL_DEPOSIT:
                 print("❌ Initial deposit must be at least $10!")
                 continue
             break
         except ValueError:
             print("❌ Please enter a valid number!")
     
-    # Create account with email
-    accounts[account_number] = {
-        'name': account_name,
-        'email': email,
-        'balance': initial_deposit,
-        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'transactions': [{
-            'type': 'DEPOSIT',
-            'amount': initial_deposit,
-            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'description': 'Initial deposit'
-        }],
-        'preferences': {
-            'email_notifications': True,
-            'low_balance_alert': True,
-            'alert_threshold': 100
-        }
-    }
-    
-    save_accounts(accounts)
-    
-    # Send welcome email
-    account_data = accounts[account_number]
-    template = get_email_template('WELCOME', {
-        'name': account_name,
-        'account_number': account_number,
-        'email': email,
-        'created': account_data['created']
-    }, initial_deposit, initial_deposit)
-    
-    send_email_notification(email, template['subject'], template['body'])
+    # Create account with email (the bank sends the welcome email)
+    try:
+        bank.create_account(account_number, account_name, email, initial_deposit)
+    except TransactionError as e:
+        print(f"❌ Account could not be created: {e}")
+        return None
     
     print(f"\n✅ Account created successfully!")
     print(f"Account Number: {account_number}")
     print(f"Account Holder: {account_name}")
     print(f"Email: {email}")
-    print(f"Initial Balance: ${initial_deposit:.2f}")
+    print(f"Initial Balance: {format_money(initial_deposit)}")
     print(f"📧 Welcome email sent to {email}")
     
     return account_number
 
 # ========== ENHANCEMENT 6: Transaction Notification Helper ==========
-def send_transaction_notification(account_number, transaction_type, amount, balance, **kwargs):
-    """Send email notification for transactions"""
-    accounts = load_accounts()
+def send_transaction_notification(account_number, transaction_type, amount, balance, wait=False, **kwargs):
+    """Send email notification for transactions (None if there was nothing to send)"""
+    account = get_contact(account_number)
     
-    if account_number not in accounts:
-        return False
+    if account is None:
+        return None
     
-    account = accounts[account_number]
     
     # Check if email notifications are enabled
     if not account.get('preferences', {}).get('email_notifications', True):
-        return False
+        return None
     
     email = account.get('email')
     if not email:
-        return False
+        return None
     
     # Prepare account data for template
     account_data = {
@@ -559,25 +347,20 @@ def send_transaction_notification(account_number, transaction_type, amount, bala
     template = get_email_template(transaction_type, account_data, amount, balance)
     
     # Send email
-    return send_email_notification(email, template['subject'], template['body'])
+    return send_email_notification(email, template['subject'], template['body'], wait=wait)
 
 # ========== ENHANCEMENT 7: Check and Send Low Balance Alert ==========
-def check_low_balance_alert(account_number, balance):
-    """Check if balance is low and send alert"""
-    accounts = load_accounts()
-    
-    if account_number not in accounts:
-        return False
-    
-    account = accounts[account_number]
-    
-    # Check if alerts are enabled
-    if not account.get('preferences', {}).get('low_balance_alert', True):
-        return False
-    
-    threshold = account.get('preferences', {}).get('alert_threshold', 100)
-    
-    if balance < threshold:
+def check_low_balance_alert(account_number, balance, wait=False):
+    """Check if balance is low and send alert (None if no alert was due)"""
+    # The threshold comes from the store's low balance index (None: alerts off or no account);
+    # the contact details are only looked up when an alert is due
+    threshold = alert_threshold(account_number)
+    
+    if threshold is not None and balance < threshold:
+        account = get_contact(account_number)
+        if account is None:
+            return None
+        
         account_data = {
             'name': account['name'],
             'account_number': account_number,
@@ -585,17 +368,42 @@ def check_low_balance_alert(account_number, balance):
         }
         
         template = get_email_template('LOW_BALANCE', account_data, 0, balance)
-        send_email_notification(account.get('email'), template['subject'], template['body'])
-        return True
+        return send_email_notification(account.get('email'), template['subject'], template['body'], wait=wait)
+    
+    return None
+
+# ========== Digest Notifications ==========
+def get_digest_window(account_number):
+    """Seconds an account's notifications are collected for a digest (0 for immediate emails)"""
+    account = get_contact(account_number)
+    return digest_window(account.get('preferences')) if account is not None else 0
+
+def send_digest_notification(account_number, events, wait=False):
+    """Send one summary email for several events (None if there was nothing to send)"""
+    account = get_contact(account_number)
+    
+    if account is None or not account.get('email'):
+        return None
+    
+    prefs = account.get('preferences', {})
+    if not prefs.get('email_notifications', True):
+        return None
     
-    return False
+    account_data = {
+        'name': account['name'],
+        'account_number': account_number,
+        'email': account['email']
+    }
+    threshold = prefs.get('alert_threshold', DEFAULT_ALERT_THRESHOLD) if prefs.get('low_balance_alert', True) else None
+    template = get_digest_template(account_data, events, threshold)
+    return send_email_notification(account['email'], template['subject'], template['body'], wait=wait)
 
 # ========== ENHANCEMENT 8: Update Notification Preferences ==========
 def update_notification_preferences(account_number):
     """Allow customer to update email notification preferences"""
-    accounts = load_accounts()
+    account = get_account(account_number)
     
-    if account_number not in accounts:
+    if account is None:
         print("❌ Account not found!")
         return False
     
@@ -603,9 +411,9 @@ def update_notification_preferences(account_number):
     print("NOTIFICATION PREFERENCES")
     print("="*50)
     
-    prefs = accounts[account_number].get('preferences', {})
+    prefs = account.get('preferences', {})
     
-    print(f"Current email: {accounts[account_number].get('email', 'Not set')}")
+    print(f"Current email: {account.get('email', 'Not set')}")
     
     # Option to update email
     change_email = input("\nDo you want to update your email? (y/n): ").lower()
@@ -613,7 +421,7 @@ def update_notification_preferences(account_number):
         while True:
             new_email = input("Enter new email address: ").strip().lower()
             if validate_email(new_email):
-                accounts[account_number]['email'] = new_email
+                account['email'] = new_email
                 print(f"✅ Email updated to {new_email}")
                 break
             else:
@@ -627,26 +435,52 @@ def update_notification_preferences(account_number):
     if new_value in ['y', 'n']:
         prefs['email_notifications'] = (new_value == 'y')
     
+    current = prefs.get('email_digest', DEFAULT_DIGEST)
+    new_value = input(f"Email frequency ({'/'.join(DIGEST_MODES)}) [current: {current}]: ").strip().lower()
+    if new_value in DIGEST_MODES:
+        prefs['email_digest'] = new_value
+    
     current = prefs.get('low_balance_alert', True)
     new_value = input(f"Enable low balance alerts? (y/n) [current: {'yes' if current else 'no'}]: ").lower()
     if new_value in ['y', 'n']:
         prefs['low_balance_alert'] = (new_value == 'y')
     
     if prefs.get('low_balance_alert', True):
-        current = prefs.get('alert_threshold', 100)
+        current = prefs.get('alert_threshold', DEFAULT_ALERT_THRESHOLD)
         try:
-            new_threshold = float(input(f"Set low balance alert threshold (current: ${current}): $"))
+            new_threshold = parse_money(input(f"Set low balance alert threshold (current: {format_money(current)}): $"))
             if new_threshold > 0:
                 prefs['alert_threshold'] = new_threshold
         except ValueError:
-            print(f"Keeping current threshold: ${current}")
+            print(f"Keeping current threshold: {format_money(current)}")
     
-    accounts[account_number]['preferences'] = prefs
-    save_accounts(accounts)
+    account['preferences'] = prefs
+    save_account(account_number, account)
     
     print("\n✅ Notification preferences updated!")
     return True
 
+# ========== BANK ENGINE ==========
+def notify_customer(event, wait=False):
+    """Bank notification hook: email the customer about a posted operation
+
+    With `wait`, the emails are delivered before returning and False means
+    one of them failed (the outbox worker retries the event).
+    """
+    results = [send_transaction_notification(event['account'], event['type'], event['amount'], event['balance'],
+                                             wait=wait, **event['details'])]
+    if event['type'] in ('WITHDRAWAL', 'TRANSFER_SENT'):
+        results.append(check_low_balance_alert(event['account'], event['balance'], wait=wait))
+    return False not in results
+
+def notify_customer_digest(account_number, events, wait=False):
+    """Outbox digest hook: one summary email for the events of a digest window"""
+    return send_digest_notification(account_number, events, wait=wait) is not False
+
+# The menu functions below only read input and print; the bank applies the rules.
+# Real emails go through the durable outbox (run `python bank_outbox.py` to deliver them)
+bank = Bank(notify=notify_customer, outbox=not TESTING_MODE)
+
 # ========== ENHANCEMENT 9: Enhanced Deposit with Notification ==========
 def deposit_enhanced(account_number):
     """Enhanced deposit with validation, logging, and email notification"""
@@ -655,105 +489,78 @@ def deposit_enhanced(account_number):
     print("="*50)
     
     try:
-        amount = float(input("Enter amount to deposit: $"))
+        amount = parse_money(input("Enter amount to deposit: $"))
     except ValueError:
         print("❌ Invalid amount! Please enter a number.")
         return 0
     
-    if amount <= 0:
-        print("❌ Deposit amount must be positive!")
+    try:
+        receipt = bank.deposit(account_number, amount, "Branch deposit")
+    except TransactionError as e:
+        print(f"❌ Deposit failed: {e}")
         return 0
     
-    # Optional: Add maximum deposit limit
-    if amount > 10000:
+    if receipt.review:
         print("⚠️ Large deposit detected. May be subject to review.")
     
-    # Get current balance
-    accounts = load_accounts()
-    current_balance = float(accounts[account_number]['balance'])
-    new_balance = current_balance + amount
-    
-    # Update balance
-    accounts[account_number]['balance'] = str(new_balance)
-    save_accounts(accounts)
-    
-    # Log the transaction
-    log_transaction(account_number, 'DEPOSIT', amount, "Branch deposit")
-    
-    # Send deposit notification
-    send_transaction_notification(
-        account_number, 
-        'DEPOSIT', 
-        amount, 
-        new_balance
-    )
-    
-    print(f"✅ Successfully deposited ${amount:.2f}")
+    print(f"✅ Successfully deposited {format_money(amount)}")
     return amount
 
 # ========== ENHANCEMENT 10: Enhanced Withdrawal with Notification ==========
-def withdraw_enhanced(account_number, balance):
+def withdraw_enhanced(account_number):
     """Enhanced withdraw with validation, logging, and email notification"""
     print("\n" + "="*50)
     print("WITHDRAW FUNDS")
     print("="*50)
     
     try:
-        amount = float(input("Enter amount to withdraw: $"))
+        amount = parse_money(input("Enter amount to withdraw: $"))
     except ValueError:
         print("❌ Invalid amount! Please enter a number.")
         return 0
     
-    if amount <= 0:
-        print("❌ Withdrawal amount must be positive!")
-        return 0
-    
-    if amount > balance:
-        print("❌ Insufficient funds!")
-        print(f"Available balance: ${balance:.2f}")
-        return 0
-    
-    # Optional: Add daily withdrawal limit
-    daily_limit = 2000
-    if amount > daily_limit:
-        print(f"⚠️ Amount exceeds daily limit of ${daily_limit}")
+    # Funds and the daily limit are checked by the bank against the current balance
+    try:
+        bank.withdraw(account_number, amount, "ATM withdrawal")
+    except TransactionError as e:
+        print(f"❌ Withdrawal failed: {e}")
+        if e.code == 'insufficient_funds':
+            print(f"Available balance: {format_money(bank.balance(account_number))}")
         return 0
     
-    # Calculate new balance
-    new_balance = balance - amount
-    
-    # Update balance in accounts
-    accounts = load_accounts()
-    accounts[account_number]['balance'] = str(new_balance)
-    save_accounts(accounts)
-    
-    # Log the transaction
-    log_transaction(account_number, 'WITHDRAWAL', amount, "ATM withdrawal")
-    
-    # Send withdrawal notification
-    send_transaction_notification(
-        account_number, 
-        'WITHDRAWAL', 
-        amount, 
-        new_balance
-    )
-    
-    # Check for low balance
-    check_low_balance_alert(account_number, new_balance)
-    
-    print(f"✅ Please take your cash: ${amount:.2f}")
+    print(f"✅ Please take your cash: {format_money(amount)}")
     return amount
 
 # ========== ENHANCEMENT 11: Enhanced Transfer with Notifications ==========
+def choose_payee(account_number):
+    """Pick a favorite/recent payee or type a destination account number"""
+    payees = get_payees(account_number)
+    if payees:
+        print("Saved payees:")
+        for i, payee in enumerate(payees, 1):
+            star = "⭐ " if payee['favorite'] else ""
+            print(f"  {i}. {star}{payee['account']} - {payee['name']}")
+        choice = input(f"Select a payee (1-{len(payees)}) or press Enter to type an account number: ").strip()
+        if choice:
+            if choice.isdigit() and 1 <= int(choice) <= len(payees):
+                return payees[int(choice) - 1]['account']
+            print("❌ Invalid choice!")
+            return None
+    
+    to_account = input("Enter destination account number: ").strip()
+    if to_account and to_account != account_number and get_account(to_account, fields=()) is not None:
+        if input("Save this account as a favorite payee? (y/n): ").strip().lower() == 'y':
+            set_favorite_payee(account_number, to_account)
+            print("✅ Saved to favorites")
+    return to_account
+
 def transfer_funds(from_account, to_account):
     """Transfer money between accounts with email notifications for both parties"""
-    accounts = load_accounts()
-    
-    if from_account not in accounts:
+    if not account_exists(from_account):
         print("❌ Your account not found!")
         return False
     
-    if to_account not in accounts:
+    if not account_exists(to_account):
         print("❌ Destination account not found!")
         return False
     
@@ -762,100 +569,41 @@ def transfer_funds(from_account, to_account):
         return False
     
     try:
-        amount = float(input("Enter amount to transfer: $"))
+        amount = parse_money(input("Enter amount to transfer: $"))
     except ValueError:
         print("❌ Invalid amount!")
         return False
     
-    if amount <= 0:
-        print("❌ Amount must be positive!")
-        return False
-    
-    from_balance = float(accounts[from_account]['balance'])
-    if amount > from_balance:
-        print("❌ Insufficient funds!")
+    # Both legs commit atomically; the bank notifies both parties
+    try:
+        bank.transfer(from_account, to_account, amount)
+    except TransactionError as e:
+        print(f"❌ Transfer failed: {e}")
         return False
     
-    to_balance = float(accounts[to_account]['balance'])
-    
-    # Perform transfer
-    accounts[from_account]['balance'] = str(from_balance - amount)
-    accounts[to_account]['balance'] = str(to_balance + amount)
-    
-    # Log transactions for both accounts
-    log_transaction(from_account, 'TRANSFER_OUT', amount, f"To account {to_account}")
-    log_transaction(to_account, 'TRANSFER_IN', amount, f"From account {from_account}")
-    
-    save_accounts(accounts)
-    
-    # Send notifications to both parties
-    # Notification to sender
-    send_transaction_notification(
-        from_account,
-        'TRANSFER_SENT',
-        amount,
-        from_balance - amount,
-        to_account=to_account
-    )
-    
-    # Notification to receiver
-    send_transaction_notification(
-        to_account,
-        'TRANSFER_RECEIVED',
-        amount,
-        to_balance + amount,
-        from_account=from_account
-    )
-    
-    # Check low balance for sender
-    check_low_balance_alert(from_account, from_balance - amount)
-    
-    print(f"✅ Successfully transferred ${amount:.2f} to account {to_account}")
+    print(f"✅ Successfully transferred {format_money(amount)} to account {to_account}")
     return True
 
 # ========== ENHANCEMENT 12: Enhanced Interest Application with Notification ==========
 def apply_interest(account_number):
     """Apply monthly interest to account with notification"""
-    accounts = load_accounts()
-    if account_number not in accounts:
+    try:
+        receipt = bank.apply_interest(account_number)
+    except TransactionError as e:
+        print(f"❌ Interest could not be applied: {e}")
         return False
     
-    balance = float(accounts[account_number]['balance'])
-    interest = calculate_interest(balance)
-    new_balance = balance + interest
-    
-    accounts[account_number]['balance'] = str(new_balance)
-    
-    # Log the interest transaction
-    accounts[account_number].setdefault('transactions', []).append({
-        'type': 'INTEREST',
-        'amount': interest,
-        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'description': f'Monthly interest at 1%'
-    })
-    
-    save_accounts(accounts)
-    
-    # Send interest notification
-    send_transaction_notification(
-        account_number,
-        'INTEREST',
-        interest,
-        new_balance
-    )
-    
-    print(f"✅ Interest of ${interest:.2f} applied to your account!")
+    print(f"✅ Interest of {format_money(receipt.amount)} applied to your account!")
     return True
 
 # ========== ENHANCEMENT 13: Display Account Info with Email ==========
 def show_account_info(account_number):
     """Display account information including email"""
-    accounts = load_accounts()
-    if account_number not in accounts:
+    account = get_account(account_number)
+    if account is None:
         print("❌ Account not found!")
         return
     
-    account = accounts[account_number]
     
     print("\n" + "="*50)
     print("ACCOUNT INFORMATION")
@@ -863,16 +611,17 @@ def show_account_info(account_number):
     print(f"Account Number: {account_number}")
     print(f"Account Holder: {account['name']}")
     print(f"Email Address: {account.get('email', 'Not set')}")
-    print(f"Balance: ${float(account['balance']):,.2f}")
+    print(f"Balance: {format_money(account['balance'])}")
     print(f"Created: {account.get('created', 'Unknown')}")
     
     # Show notification preferences
     prefs = account.get('preferences', {})
     print("\nNotification Preferences:")
     print(f"  Email Notifications: {'✅ Enabled' if prefs.get('email_notifications', True) else '❌ Disabled'}")
+    print(f"  Email Frequency: {prefs.get('email_digest', DEFAULT_DIGEST)}")
     print(f"  Low Balance Alerts: {'✅ Enabled' if prefs.get('low_balance_alert', True) else '❌ Disabled'}")
     if prefs.get('low_balance_alert', True):
-        print(f"  Alert Threshold: ${prefs.get('alert_threshold', 100)}")
+        print(f"  Alert Threshold: {format_money(prefs.get('alert_threshold', DEFAULT_ALERT_THRESHOLD))}")
     
     print("="*50)
 
@@ -891,7 +640,10 @@ def test_email_configuration():
         change = input("Do you want to switch to production mode? (y/n): ").lower()
         if change == 'y':
             TESTING_MODE = False
+            bank.outbox = True
             print("✅ Testing mode disabled - now attempting to send real emails")
+            print("📬 Transaction emails are queued in the outbox; run "
+                  "'CYGOBANK_EMAIL_MODE=production python bank_outbox.py' to deliver them")
     
     test_email = input("Enter email address to send test message: ").strip()
     
@@ -913,7 +665,8 @@ Time sent: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 Best regards,
 The Cy_Bank Team
-        """
+        """,
+        wait=True
     )
     
     if result:
@@ -924,21 +677,21 @@ The Cy_Bank Team
 # ========== ENHANCEMENT 15: Enhanced Main Menu ==========
 def main_menu(account_number):
     """Enhanced main menu with email notification options"""
-    accounts = load_accounts()
+    account = get_account(account_number, fields=('name', 'email', 'balance'))
     
-    if account_number not in accounts:
+    if account is None:
         print("❌ Account error!")
         return False
     
-    balance = float(accounts[account_number]['balance'])
+    balance = account['balance']
     
     while True:
         print("\n" + "="*60)
-        print(f"  CY_BANK - Welcome {accounts[account_number]['name']}")
+        print(f"  CY_BANK - Welcome {account['name']}")
         print("="*60)
         print(f"Account: {account_number}")
-        print(f"Email: {accounts[account_number].get('email', 'Not set')}")
-        print(f"Balance: ${balance:,.2f}")
+        print(f"Email: {account.get('email', 'Not set')}")
+        print(f"Balance: {format_money(balance)}")
         print("-"*60)
         print("1. 💰 Show Balance")
         print("2. 📥 Deposit Money")
@@ -960,14 +713,14 @@ def main_menu(account_number):
         elif choice == '2':
             deposit_amount = deposit_enhanced(account_number)
             if deposit_amount > 0:
-                accounts = load_accounts()
-                balance = float(accounts[account_number]['balance'])
+                account = get_account(account_number, fields=('name', 'email', 'balance'))
+                balance = account['balance']
             
         elif choice == '3':
-            withdraw_amount = withdraw_enhanced(account_number, balance)
+            withdraw_amount = withdraw_enhanced(account_number)
             if withdraw_amount > 0:
-                accounts = load_accounts()
-                balance = float(accounts[account_number]['balance'])
+                account = get_account(account_number, fields=('name', 'email', 'balance'))
+                balance = account['balance']
             
         elif choice == '4':
             show_transaction_history(account_number)
@@ -976,29 +729,30 @@ def main_menu(account_number):
             print("\n" + "-"*40)
             print("TRANSFER MONEY")
             print("-"*40)
-            to_account = input("Enter destination account number: ").strip()
-            transfer_funds(account_number, to_account)
-            accounts = load_accounts()
-            balance = float(accounts[account_number]['balance'])
+            to_account = choose_payee(account_number)
+            if to_account:
+                transfer_funds(account_number, to_account)
+            account = get_account(account_number, fields=('name', 'email', 'balance'))
+            balance = account['balance']
             
         elif choice == '6':
             show_account_summary(account_number)
             
         elif choice == '7':
             apply_interest(account_number)
-            accounts = load_accounts()
-            balance = float(accounts[account_number]['balance'])
+            account = get_account(account_number, fields=('name', 'email', 'balance'))
+            balance = account['balance']
             
         elif choice == '8':
             update_notification_preferences(account_number)
-            accounts = load_accounts()
+            account = get_account(account_number, fields=('name', 'email', 'balance'))
             
         elif choice == '9':
             show_account_info(account_number)
             
         elif choice == '10':
             print("\n✅ Logging out...")
-            print(f"Thank you for banking with Cy_Bank, {accounts[account_number]['name']}!")
+            print(f"Thank you for banking with Cy_Bank, {account['name']}!")
             return True
             
         else:
@@ -1011,6 +765,12 @@ def main():
     print("  WELCOME TO CY_BANK - With Email Notifications")
     print("="*60)
     
+    try:
+        get_store()
+    except UnconvertedStore as e:
+        print(f"❌ {e}")
+        return
+    
     while True:
         print("\n" + "="*40)
         print("MAIN MENU")
@@ -0,0 +1,171 @@
+"""
+BANK ACCRUAL - Average-daily-balance interest from the transaction history
+Interest is earned on each day's closing balance, not on whatever the
+balance happens to be when interest is posted, so money deposited the day
+before posting earns one day of interest instead of a whole month.
+
+The daily balance series is rebuilt from the history without replaying it
+row by row: each account's transactions since the start of the period are
+bucketed by day, a reverse cumulative sum over the buckets gives what was
+posted after each day, and taking that off the current balance gives every
+day's closing balance. A chunk of accounts is one (accounts x days) array,
+so the whole bank is a handful of numpy operations per chunk.
+
+Accrued interest = sum of the closing balances so far x monthly rate / days
+in the month, so the full month credits exactly rate x average daily balance.
+
+Usage: python bank_accrual.py [--period YYYY-MM] [--as-of YYYY-MM-DD] [--rate R]
+       (the nightly run; accruals are written to bank_accruals.json)
+"""
+
+import calendar
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from bank_money import format_money
+from bank_store import get_store, OUTFLOW_TYPES, VERSION_FIELD
+from bank_engine import MONTHLY_INTEREST_RATE
+
+# ========== ACCRUAL CONFIGURATION ==========
+ACCRUAL_CHUNK_SIZE = 5000  # Accounts whose daily balances are built as one array
+ACCRUALS_PATH = os.environ.get('CYGOBANK_ACCRUALS_PATH', 'bank_accruals.json')
+
+# ========== DAILY BALANCES ==========
+def period_days(period):
+    """First day and number of days of a 'YYYY-MM' period"""
+    first = datetime.strptime(period, '%Y-%m').date()
+    return first, calendar.monthrange(first.year, first.month)[1]
+
+def daily_balances(balances, rows, days_after_start, amounts, days):
+    """Closing balance of every account on each of the first `days` days, as an (accounts, days) array
+
+    `balances` are the accounts' current balances; rows/days_after_start/
+    amounts describe every transaction since the window start: the
+    account's row in `balances`, the day it was posted on (0 = first day)
+    and its signed amount in cents.
+    """
+    buckets = np.zeros((len(balances), days + 1), dtype=np.int64)
+    # Anything posted after the window lands in the last bucket
+    np.add.at(buckets, (rows, np.minimum(days_after_start, days)), amounts)
+    # posted_after[:, d] = everything posted after the close of day d
+    posted_after = np.cumsum(buckets[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    return np.asarray(balances, dtype=np.int64)[:, None] - posted_after
+
+def _transaction_arrays(account_numbers, histories, first):
+    """Flatten histories into (rows, days after `first`, signed amounts) arrays"""
+    rows, dates, types, amounts = [], [], [], []
+    for row, account_number in enumerate(account_numbers):
+        for transaction in histories.get(account_number, ()):
+            rows.append(row)
+            dates.append(transaction['date'][:10])
+            types.append(transaction['type'])
+            amounts.append(transaction['amount'])
+    amounts = np.array(amounts, dtype=np.int64)
+    amounts = np.where(np.isin(np.array(types, dtype=object), OUTFLOW_TYPES), -amounts, amounts)
+    days_after_start = (np.array(dates, dtype='datetime64[D]') - np.datetime64(first, 'D')).astype(np.int64)
+    return np.array(rows, dtype=np.int64), days_after_start, amounts
+
+# ========== ACCRUAL ==========
+def accrue_interest(store, account_numbers, period, rate=MONTHLY_INTEREST_RATE, as_of=None):
+    """Average-daily-balance interest accrued in a period up to `as_of` (today by default)
+
+    Returns {account: {'version', 'balance', 'average_balance', 'days',
+    'interest'}} for the accounts that exist, in int cents. Days with a
+    negative closing balance earn nothing. Pass it as Bank.post_interest's
+    `accrue` to credit it.
+    """
+    first, period_length = period_days(period)
+    last = min(as_of or date.today(), first + timedelta(days=period_length - 1))
+    days = max((last - first).days + 1, 0)
+    current = store.get_accounts(account_numbers, fields=('balance', VERSION_FIELD))
+    numbers = [number for number in account_numbers if current[number] is not None]
+    balances = [current[number]['balance'] for number in numbers]
+
+    if days and numbers:
+        histories = store.get_histories_since(first.isoformat(), numbers)
+        rows, days_after_start, amounts = _transaction_arrays(numbers, histories, first)
+        closing = daily_balances(balances, rows, days_after_start, amounts, days)
+        balance_days = np.maximum(closing, 0).sum(axis=1)
+    else:
+        balance_days = np.zeros(len(numbers), dtype=np.int64)
+
+    # Exact integer arithmetic, rounded half up like bank_money.apply_rate
+    numerator, denominator = Decimal(str(rate)).as_integer_ratio()
+    interest = (balance_days * (2 * numerator) + denominator * period_length) // (2 * denominator * period_length)
+    average = (balance_days * 2 + days) // (2 * days) if days else balance_days
+    return {number: {'version': current[number].get(VERSION_FIELD, 0), 'balance': current[number]['balance'],
+                     'average_balance': int(average[row]), 'days': days, 'interest': int(interest[row])}
+            for row, number in enumerate(numbers)}
+
+def _last_activity(account):
+    """Date of an account's latest transaction, or None if unknown"""
+    return (account.get('stats') or {}).get('last_activity')
+
+def earning_candidates(accounts, period):
+    """Sorted accounts that can have accrued anything in a period: a positive balance or activity in it"""
+    first = period_days(period)[0].isoformat()
+    numbers = sorted(accounts)
+    balances = np.fromiter((accounts[number].get('balance', 0) for number in numbers), dtype=np.int64,
+                           count=len(numbers))
+    # Accounts without aggregates (see rebuild_stats) are always checked
+    active = np.fromiter(((_last_activity(accounts[number]) or first) >= first for number in numbers),
+                         dtype=bool, count=len(numbers))
+    return [number for number, keep in zip(numbers, (balances > 0) | active) if keep]
+
+def accrue_bank(period=None, rate=MONTHLY_INTEREST_RATE, as_of=None, chunk_size=ACCRUAL_CHUNK_SIZE, store=None):
+    """Accrued interest of every account so far this period; returns {account: accrual}"""
+    store = store or get_store()
+    period = period or (as_of or date.today()).strftime('%Y-%m')
+    candidates = earning_candidates(store.load_accounts(), period)
+    accruals = {}
+    for start in range(0, len(candidates), chunk_size):
+        accruals.update(accrue_interest(store, candidates[start:start + chunk_size], period, rate, as_of))
+    return accruals
+
+def write_accruals(period, as_of, rate, accruals, path=ACCRUALS_PATH):
+    """Atomically write the nightly accruals report"""
+    report = {
+        'period': period,
+        'as_of': as_of.isoformat(),
+        'rate': rate,
+        'total': sum(accrual['interest'] for accrual in accruals.values()),
+        'accounts': {number: {'average_balance': accrual['average_balance'], 'accrued': accrual['interest']}
+                     for number, accrual in sorted(accruals.items())}
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+    return report
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    options = {'--period': None, '--as-of': None, '--rate': str(MONTHLY_INTEREST_RATE)}
+    try:
+        while args:
+            if args[0] not in options:
+                raise ValueError(args[0])
+            options[args[0]] = args[1]
+            args = args[2:]
+        as_of = datetime.strptime(options['--as-of'], '%Y-%m-%d').date() if options['--as-of'] else date.today()
+        period = options['--period'] or as_of.strftime('%Y-%m')
+        period_days(period)
+        rate = float(options['--rate'])
+        if rate <= 0:
+            raise ValueError(rate)
+    except (IndexError, ValueError):
+        print("Usage: python bank_accrual.py [--period YYYY-MM] [--as-of YYYY-MM-DD] [--rate R]")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    accruals = accrue_bank(period, rate, as_of)
+    report = write_accruals(period, as_of, rate, accruals)
+    print(f"✅ Accrued {format_money(report['total'])} of {period} interest on {len(accruals)} accounts "
+          f"as of {as_of} in {time.perf_counter() - started:.2f}s")
+    print(f"Accruals written to {ACCRUALS_PATH}")
@@ -0,0 +1,146 @@
+"""
+BANK BATCH - Bulk postings from a JSONL request file
+Streams a file of create/deposit/withdraw/transfer requests (one JSON
+object per line) through Bank.process_batch() a chunk at a time: each chunk
+is validated and applied in memory under one set of account locks and
+committed once, instead of one load/mutate/save cycle per operation. One
+result line is written per request, in file order.
+
+Request lines (amounts in dollars, as typed at the counter):
+  {"id": "r1", "op": "create", "account": "1001", "name": "Ann Lee", "email": "ann@example.com", "amount": 50}
+  {"id": "r2", "op": "deposit", "account": "1001", "amount": "1,250.00", "description": "Payroll"}
+  {"id": "r3", "op": "withdraw", "account": "1001", "amount": 40}
+  {"id": "r4", "op": "transfer", "from": "1001", "to": "1002", "amount": 12.5}
+
+Result lines echo the line number and id; amounts and balances are int cents:
+  {"line": 2, "id": "r2", "status": "ok", "operation": "DEPOSIT", "account": "1001", "amount": 125000, "balance": 130000}
+  {"line": 3, "id": "r3", "status": "error", "code": "insufficient_funds", "error": "Insufficient funds in account 1001"}
+
+Usage: python bank_batch.py REQUESTS.jsonl [RESULTS.jsonl] [--chunk N]
+       (results go to REQUESTS.results.jsonl by default)
+"""
+
+import json
+import os
+import sys
+import time
+
+from bank_money import parse_money
+from bank_engine import Bank, InvalidRequest
+
+# ========== BATCH CONFIGURATION ==========
+BATCH_CHUNK_SIZE = 1000  # Requests applied and committed together
+BATCH_OPERATIONS = ('create', 'deposit', 'withdraw', 'transfer')
+BATCH_PROFILE_FIELDS = ('phone', 'country', 'address')  # Extra fields a 'create' line may carry
+
+# ========== REQUEST PARSING ==========
+def _account_number(value):
+    """Account number of a request field ('' when missing); numbers are accepted as written"""
+    return str(value).strip() if value is not None else ''
+
+def parse_request(data):
+    """Turn one decoded request line into a Bank.process_batch() request; raises InvalidRequest"""
+    if not isinstance(data, dict):
+        raise InvalidRequest("Request must be a JSON object")
+    op = data.get('op')
+    if op not in BATCH_OPERATIONS:
+        raise InvalidRequest(f"Unknown operation: {op!r}")
+
+    amount = data.get('amount')
+    if isinstance(amount, bool) or not isinstance(amount, (int, float, str)):
+        raise InvalidRequest("Missing or invalid amount")
+    try:
+        amount = parse_money(str(amount))
+    except ValueError as e:
+        raise InvalidRequest(str(e))
+
+    account = _account_number(data.get('from', data.get('account')) if op == 'transfer' else data.get('account'))
+    if not account:
+        raise InvalidRequest("Missing account number")
+    request = {'op': op, 'account': account, 'amount': amount}
+
+    if op == 'transfer':
+        request['to'] = _account_number(data.get('to'))
+        if not request['to']:
+            raise InvalidRequest("Missing destination account number")
+    elif op == 'create':
+        request['name'] = str(data.get('name') or '').strip()
+        request['email'] = str(data.get('email') or '')
+        request['profile'] = {field: data[field] for field in BATCH_PROFILE_FIELDS if field in data}
+    else:
+        request['description'] = str(data.get('description') or '')
+    return request
+
+def _parse_line(line_number, line):
+    """Parse one request line; returns (line number, request id, request or InvalidRequest)"""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return line_number, None, InvalidRequest("Line is not valid JSON")
+    request_id = data.get('id') if isinstance(data, dict) else None
+    try:
+        return line_number, request_id, parse_request(data)
+    except InvalidRequest as e:
+        return line_number, request_id, e
+
+# ========== PROCESSING ==========
+def _run_chunk(bank, chunk, sink, summary):
+    """Apply one chunk of parsed lines and write their result lines"""
+    valid = [(position, request) for position, (_, _, request) in enumerate(chunk)
+             if not isinstance(request, Exception)]
+    outcomes = [request for _, _, request in chunk]
+    for (position, _), outcome in zip(valid, bank.process_batch([request for _, request in valid])):
+        outcomes[position] = outcome
+
+    for (line_number, request_id, _), outcome in zip(chunk, outcomes):
+        result = {'line': line_number, 'id': request_id}
+        if isinstance(outcome, Exception):
+            result.update(status='error', code=outcome.code, error=str(outcome))
+            summary['errors'] += 1
+        else:
+            result['status'] = 'ok'
+            result.update(outcome.as_dict())
+            summary['ok'] += 1
+        sink.write(json.dumps(result) + '\n')
+    sink.flush()
+    summary['chunks'] += 1
+
+def process_file(requests_path, results_path=None, chunk_size=BATCH_CHUNK_SIZE, bank=None):
+    """Stream a JSONL request file through the bank in chunks; returns a summary dict
+
+    Results are written (and flushed) chunk by chunk, so a crash leaves the
+    results of every committed chunk on disk.
+    """
+    results_path = results_path or os.path.splitext(requests_path)[0] + '.results.jsonl'
+    bank = bank or Bank()
+    summary = {'requests': 0, 'ok': 0, 'errors': 0, 'chunks': 0, 'results_path': results_path}
+    started = time.perf_counter()
+    with open(requests_path, 'r') as source, open(results_path, 'w') as sink:
+        chunk = []
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            chunk.append(_parse_line(line_number, line))
+            summary['requests'] += 1
+            if len(chunk) >= chunk_size:
+                _run_chunk(bank, chunk, sink, summary)
+                chunk = []
+        if chunk:
+            _run_chunk(bank, chunk, sink, summary)
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    chunk_size = BATCH_CHUNK_SIZE
+    if '--chunk' in args:
+        position = args.index('--chunk')
+        chunk_size = int(args[position + 1])
+        del args[position:position + 2]
+    if len(args) not in (1, 2) or chunk_size < 1:
+        print("Usage: python bank_batch.py REQUESTS.jsonl [RESULTS.jsonl] [--chunk N]")
+        sys.exit(1)
+    summary = process_file(args[0], args[1] if len(args) > 1 else None, chunk_size)
+    print(f"✅ Processed {summary['requests']} requests in {summary['chunks']} chunks "
+          f"({summary['ok']} ok, {summary['errors']} errors) in {summary['seconds']:.2f}s")
+    print(f"Results written to {summary['results_path']}")
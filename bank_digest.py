@@ -0,0 +1,98 @@
+"""
+BANK DIGEST - Coalescing a busy account's notifications into digests
+An account's 'email_digest' preference (see DIGEST_MODES) trades one email
+per posting for one summary email per time window. The outbox worker
+(bank_outbox) holds a digest account's events until the end of the window
+they were posted in, then sends all of them as one message. Windows are
+aligned to the clock (quarter hours, hours, local midnight), so every event
+of an account in one window is released at the same moment without any
+state besides the outbox itself.
+
+Welcome emails are never held back.
+
+Usage: imported by bank_outbox and the CLI (CyGoBank.py)
+"""
+
+from datetime import datetime, timedelta
+
+# ========== DIGEST CONFIGURATION ==========
+DIGEST_MODES = {  # Preference value -> window length in seconds (0: one email per event)
+    'immediate': 0,
+    '15min': 15 * 60,
+    'hourly': 60 * 60,
+    'daily': 24 * 60 * 60
+}
+DEFAULT_DIGEST = 'immediate'
+UNDIGESTED_EVENTS = ('WELCOME',)  # Always sent on their own, straight away
+
+# Event types as listed in a digest: (label, sign of the amount)
+DIGEST_LINES = {
+    'DEPOSIT': ('Deposit', '+'),
+    'WITHDRAWAL': ('Withdrawal', '-'),
+    'TRANSFER_SENT': ('Transfer sent', '-'),
+    'TRANSFER_RECEIVED': ('Transfer received', '+'),
+    'INTEREST': ('Interest', '+')
+}
+
+# ========== WINDOWS ==========
+def digest_window(preferences):
+    """Digest window of an account in seconds (0 for immediate emails)"""
+    return DIGEST_MODES.get((preferences or {}).get('email_digest', DEFAULT_DIGEST), 0)
+
+def window_end(created, window):
+    """Epoch time at which the window holding an event created at `created` closes
+
+    Windows are counted from local midnight, so they line up with the
+    clock for every length that divides a day.
+    """
+    created = datetime.strptime(created, '%Y-%m-%d %H:%M:%S')
+    midnight = created.replace(hour=0, minute=0, second=0)
+    elapsed = (created - midnight).total_seconds()
+    return (midnight + timedelta(seconds=(elapsed // window + 1) * window)).timestamp()
+
+def plan_deliveries(items, window_of, now):
+    """Split due outbox items into deliveries; returns (deliveries, held)
+
+    A delivery is a list of items sent as one email: a single item, or all
+    the released items of a digest account. `held` lists (item, release
+    time) for digest items whose window is still open. `window_of(account)`
+    returns an account's digest window in seconds.
+    """
+    windows = {}
+    deliveries = []
+    digests = {}
+    held = []
+    for item in items:
+        event = item['event']
+        if event['type'] in UNDIGESTED_EVENTS:
+            deliveries.append([item])
+            continue
+        if event['account'] not in windows:
+            windows[event['account']] = window_of(event['account'])
+        window = windows[event['account']]
+        if not window:
+            deliveries.append([item])
+            continue
+        release = window_end(item['created'], window)
+        if release > now:
+            held.append((item, release))
+        else:
+            digests.setdefault(event['account'], []).append(item)
+    deliveries.extend(digests.values())
+    return deliveries, held
+
+# ========== SUMMARIES ==========
+def digest_entries(events):
+    """One (date, label, signed amount in cents, balance after, detail) tuple per digested event"""
+    entries = []
+    for event in events:
+        label, sign = DIGEST_LINES.get(event['type'], (event['type'].replace('_', ' ').title(), '+'))
+        details = event.get('details') or {}
+        detail = ''
+        if details.get('to_account'):
+            detail = f"to {details['to_account']}"
+        elif details.get('from_account'):
+            detail = f"from {details['from_account']}"
+        amount = event['amount'] if sign == '+' else -event['amount']
+        entries.append((event.get('date', ''), label, amount, event['balance'], detail))
+    return entries
@@ -0,0 +1,420 @@
+"""
+BANK ENGINE - Headless banking operations
+The rules behind opening accounts, deposits, withdrawals, transfers and
+interest, with no input() or print(): methods take account numbers and int
+cents and return a Receipt, or raise a TransactionError subclass whose
+`code` says why the request was refused. The CLI (CyGoBank.py), the web app
+(cygobankapp.py) and batch scripts are thin adapters over a Bank.
+
+Customer notifications are not sent here. A Bank created with a `notify`
+callback hands it one event dict per posted operation ('type', 'account',
+'amount', 'balance' plus any 'details' for the email template), and the
+adapter decides how to deliver it. A Bank created with `outbox=True` commits
+the events into the store's notification outbox in the same write as the
+postings instead, and bank_outbox's worker delivers them from there.
+"""
+
+import re
+from datetime import datetime
+from decimal import Decimal
+
+from bank_money import to_cents, apply_rate, format_money
+from bank_store import (get_store, TransactionError, AccountNotFound, InsufficientFunds, VersionConflict, LockFailed,
+                        OUTFLOW_TYPES, VERSION_FIELD, COMMIT_RETRIES, DEFAULT_ALERT_THRESHOLD)
+
+# ========== BANK RULES ==========
+# Money is held in int cents (see bank_money)
+MIN_INITIAL_DEPOSIT = to_cents(10)
+DAILY_WITHDRAWAL_LIMIT = to_cents(2000)
+LARGE_DEPOSIT = to_cents(10000)  # Deposits above this are flagged for review
+MONTHLY_INTEREST_RATE = 0.01
+
+_EMAIL = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+def validate_email(email):
+    """Validate email format using regex"""
+    return _EMAIL.match(email) is not None
+
+def calculate_interest(balance, rate=MONTHLY_INTEREST_RATE):
+    """Calculate monthly interest on a balance (int cents, rounded to the cent)"""
+    return apply_rate(balance, rate)
+
+def interest_due(balances, rate=MONTHLY_INTEREST_RATE):
+    """calculate_interest over a whole array of balances at once (int64 cents)
+
+    The rate is applied as an exact fraction with integer arithmetic, so
+    every result matches calculate_interest to the cent. Balances at or
+    below zero earn nothing. numpy is only needed here (bulk interest
+    runs), so the CLI and the web app start without it.
+    """
+    import numpy as np
+    numerator, denominator = Decimal(str(rate)).as_integer_ratio()
+    balances = np.maximum(np.asarray(balances, dtype=np.int64), 0)
+    return (balances * (2 * numerator) + denominator) // (2 * denominator)
+
+# ========== ERRORS ==========
+class InvalidRequest(TransactionError):
+    """A request that breaks a bank rule (bad amount, bad email, same account)"""
+    code = 'invalid_request'
+
+class AccountExists(TransactionError):
+    """Opening an account under a number that is already taken"""
+    code = 'account_exists'
+
+class LimitExceeded(TransactionError):
+    """A withdrawal above the daily withdrawal limit"""
+    code = 'limit_exceeded'
+
+# ========== RESULTS ==========
+class Receipt:
+    """A posted operation: its type, account, amount and the resulting balance
+
+    Transfers also carry the other account (`counterparty`) and its new
+    balance. `review` flags deposits above LARGE_DEPOSIT.
+    """
+
+    def __init__(self, operation, account, amount, balance,
+                 counterparty=None, counterparty_balance=None, review=False):
+        self.operation = operation
+        self.account = account
+        self.amount = amount
+        self.balance = balance
+        self.counterparty = counterparty
+        self.counterparty_balance = counterparty_balance
+        self.review = review
+
+    def as_dict(self):
+        """Plain dict of the receipt (for JSON output), without empty fields"""
+        return {key: value for key, value in vars(self).items() if value is not None and value is not False}
+
+    def __repr__(self):
+        return f"Receipt({self.as_dict()})"
+
+# ========== ENGINE ==========
+class Bank:
+    """Headless bank over an AccountStore (the configured store by default)
+
+    `withdrawal_limit` caps single withdrawals (None for no cap) and
+    `notify(event)` is called after every posted operation, unless `outbox`
+    is set: the events are then written to the store's outbox atomically
+    with the operation and `notify` is not called.
+    """
+
+    def __init__(self, store=None, notify=None, withdrawal_limit=DAILY_WITHDRAWAL_LIMIT, outbox=False):
+        self._store = store
+        self.notify = notify
+        self.withdrawal_limit = withdrawal_limit
+        self.outbox = outbox
+
+    @property
+    def store(self):
+        """The store this bank posts to, resolved on first use"""
+        if self._store is None:
+            self._store = get_store()
+        return self._store
+
+    def _event(self, event_type, account_number, amount, balance, **details):
+        """One notification event"""
+        return {'type': event_type, 'account': account_number, 'amount': amount,
+                'balance': balance, 'details': details}
+
+    def _queued(self, events):
+        """Events to write to the outbox along with the operation (none unless in outbox mode)"""
+        return events if self.outbox else ()
+
+    def _emit(self, events):
+        """Hand committed events to the notify callback, unless they went to the outbox"""
+        if self.notify is not None and not self.outbox:
+            for event in events:
+                self.notify(event)
+
+    def _check_amount(self, amount, what):
+        """Reject amounts that are not a positive number of cents"""
+        if not isinstance(amount, int) or isinstance(amount, bool) or amount <= 0:
+            raise InvalidRequest(f"{what} amount must be positive")
+
+    def _opening(self, account_number, name, email, initial_deposit, profile=None):
+        """Validate an account opening; returns (account number, new account record)"""
+        account_number = str(account_number).strip()
+        email = email.strip().lower()
+        if not account_number:
+            raise InvalidRequest("Account number cannot be empty")
+        if not name:
+            raise InvalidRequest("Name cannot be empty")
+        if not validate_email(email):
+            raise InvalidRequest(f"Invalid email format: {email!r}")
+        if not isinstance(initial_deposit, int) or initial_deposit < MIN_INITIAL_DEPOSIT:
+            raise InvalidRequest(f"Initial deposit must be at least {format_money(MIN_INITIAL_DEPOSIT)}")
+
+        created = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        account = dict(profile or {})
+        account.update({
+            'name': name,
+            'email': email,
+            'balance': initial_deposit,
+            'created': created,
+            'transactions': [{
+                'type': 'DEPOSIT',
+                'amount': initial_deposit,
+                'date': created,
+                'description': 'Initial deposit'
+            }],
+            'preferences': {
+                'email_notifications': True,
+                'low_balance_alert': True,
+                'alert_threshold': DEFAULT_ALERT_THRESHOLD
+            }
+        })
+        return account_number, account
+
+    def _welcome(self, account_number, account):
+        """Welcome event of a new account"""
+        return self._event('WELCOME', account_number, account['balance'], account['balance'],
+                           created=account['created'])
+
+    def _opened(self, account_number, account):
+        """Receipt (and welcome event) of an account that was written"""
+        self._emit([self._welcome(account_number, account)])
+        return Receipt('OPEN', account_number, account['balance'], account['balance'])
+
+    def _entries(self, request):
+        """Validate a deposit/withdraw/transfer request; returns its transaction entries"""
+        op, account_number, amount = request['op'], request['account'], request['amount']
+        if op == 'deposit':
+            self._check_amount(amount, "Deposit")
+            return [{'account': account_number, 'type': 'DEPOSIT', 'amount': amount,
+                     'description': request.get('description', "")}]
+        if op == 'withdraw':
+            self._check_amount(amount, "Withdrawal")
+            if self.withdrawal_limit is not None and amount > self.withdrawal_limit:
+                raise LimitExceeded(f"Amount exceeds daily limit of {format_money(self.withdrawal_limit)}")
+            return [{'account': account_number, 'type': 'WITHDRAWAL', 'amount': amount,
+                     'description': request.get('description', "")}]
+        if op == 'transfer':
+            to_account = request['to']
+            if account_number == to_account:
+                raise InvalidRequest("Cannot transfer to the same account")
+            self._check_amount(amount, "Transfer")
+            return [{'account': account_number, 'type': 'TRANSFER_OUT', 'amount': amount,
+                     'description': f"To account {to_account}", 'counterparty': to_account},
+                    {'account': to_account, 'type': 'TRANSFER_IN', 'amount': amount,
+                     'description': f"From account {account_number}", 'counterparty': account_number}]
+        raise InvalidRequest(f"Unknown operation: {op!r}")
+
+    def _events(self, request, balances):
+        """Notification events of a money request, given the balances after it"""
+        op, account_number, amount = request['op'], request['account'], request['amount']
+        if op == 'transfer':
+            to_account = request['to']
+            return [self._event('TRANSFER_SENT', account_number, amount, balances[account_number],
+                                to_account=to_account),
+                    self._event('TRANSFER_RECEIVED', to_account, amount, balances[to_account],
+                                from_account=account_number)]
+        transaction_type = 'DEPOSIT' if op == 'deposit' else 'WITHDRAWAL'
+        return [self._event(transaction_type, account_number, amount, balances[account_number])]
+
+    def _posted(self, request, balances):
+        """Receipt (and notification events) of a request whose entries were committed"""
+        op, account_number, amount = request['op'], request['account'], request['amount']
+        self._emit(self._events(request, balances))
+        if op == 'transfer':
+            to_account = request['to']
+            return Receipt('TRANSFER', account_number, amount, balances[account_number],
+                           counterparty=to_account, counterparty_balance=balances[to_account])
+        transaction_type = 'DEPOSIT' if op == 'deposit' else 'WITHDRAWAL'
+        return Receipt(transaction_type, account_number, amount, balances[account_number],
+                       review=op == 'deposit' and amount > LARGE_DEPOSIT)
+
+    def _post(self, request):
+        """Validate, commit and acknowledge a single money request"""
+        balances = self.store.apply_transactions(
+            self._entries(request), events=lambda balances: self._queued(self._events(request, balances)))
+        return self._posted(request, balances)
+
+    def balance(self, account_number):
+        """Current balance of an account in cents"""
+        account = self.store.get_account(account_number, fields=('balance',))
+        if account is None:
+            raise AccountNotFound(f"Account {account_number} not found")
+        return account['balance']
+
+    def create_account(self, account_number, name, email, initial_deposit, profile=None):
+        """Open an account with an initial deposit; `profile` adds extra fields (phone, address...)"""
+        account_number, account = self._opening(account_number, name, email, initial_deposit, profile)
+        # The account lock makes the existence check and the insert one step
+        with self.store.account_locks.hold([account_number]):
+            if self.store.account_exists(account_number):
+                raise AccountExists(f"Account number {account_number} already exists")
+            self.store.save_account(account_number, account, self._queued([self._welcome(account_number, account)]))
+        return self._opened(account_number, account)
+
+    def deposit(self, account_number, amount, description=""):
+        """Deposit into an account"""
+        return self._post({'op': 'deposit', 'account': account_number, 'amount': amount,
+                           'description': description})
+
+    def withdraw(self, account_number, amount, description=""):
+        """Withdraw from an account (funds are checked against the current balance)"""
+        return self._post({'op': 'withdraw', 'account': account_number, 'amount': amount,
+                           'description': description})
+
+    def transfer(self, from_account, to_account, amount):
+        """Move money between two accounts; both legs commit atomically"""
+        return self._post({'op': 'transfer', 'account': from_account, 'to': to_account, 'amount': amount})
+
+    def apply_interest(self, account_number, rate=MONTHLY_INTEREST_RATE):
+        """Post one month of interest on the current balance"""
+        interest = calculate_interest(self.balance(account_number), rate)
+        balance = self.store.apply_transactions([
+            {'account': account_number, 'type': 'INTEREST', 'amount': interest,
+             'description': f"Monthly interest at {rate * 100:g}%"}
+        ], events=lambda balances: self._queued(
+            [self._event('INTEREST', account_number, interest, balances[account_number])]))[account_number]
+
+        self._emit([self._event('INTEREST', account_number, interest, balance)])
+        return Receipt('INTEREST', account_number, interest, balance)
+
+    def _balance_interest(self, account_numbers, rate):
+        """Interest on the accounts' current balances: {account: {'version', 'balance', 'interest'}}"""
+        current = self.store.get_accounts(account_numbers, fields=('balance', VERSION_FIELD))
+        found = [number for number in account_numbers if current[number] is not None]
+        interest = interest_due([current[number]['balance'] for number in found], rate)
+        return {number: {'version': current[number].get(VERSION_FIELD, 0), 'balance': current[number]['balance'],
+                         'interest': int(amount)}
+                for number, amount in zip(found, interest)}
+
+    def post_interest(self, account_numbers, rate=MONTHLY_INTEREST_RATE, description=None, accrue=None):
+        """Post interest on many accounts at once; returns a Receipt per account credited
+
+        With the accounts' locks held, the interest of the whole set is
+        worked out in one pass and committed as one set of transactions.
+        By default it is on the current balances (interest_due); `accrue`
+        replaces that with any accrual of the same shape, e.g. the average
+        daily balance (see bank_accrual.accrue_interest). Missing accounts
+        and accounts that earn nothing are skipped.
+        """
+        description = description or f"Monthly interest at {rate * 100:g}%"
+        account_numbers = sorted(set(account_numbers))
+        accrue = accrue or (lambda numbers: self._balance_interest(numbers, rate))
+        with self.store.account_locks.hold(account_numbers):
+            for _ in range(COMMIT_RETRIES):
+                accruals = accrue(account_numbers)
+                entries = [{'account': number, 'type': 'INTEREST', 'amount': accrual['interest'],
+                            'description': description, 'balance': accrual['balance'] + accrual['interest'],
+                            VERSION_FIELD: accrual['version']}
+                           for number, accrual in sorted(accruals.items()) if accrual['interest'] > 0]
+                events = [self._event('INTEREST', entry['account'], entry['amount'], entry['balance'])
+                          for entry in entries]
+                try:
+                    if entries:
+                        self.store.commit_transactions(entries, self._queued(events))
+                    break
+                except VersionConflict:
+                    continue
+            else:
+                raise VersionConflict("Accounts kept changing during the interest posting; nothing was posted")
+
+        self._emit(events)
+        return [Receipt('INTEREST', entry['account'], entry['amount'], entry['balance']) for entry in entries]
+
+    # ----- Batches -----
+    def process_batch(self, requests):
+        """Apply many requests under one set of account locks; returns a Receipt or error per request
+
+        Requests are dicts with 'op' ('create', 'deposit', 'withdraw' or
+        'transfer'), 'account' and 'amount' (int cents), plus 'to' for
+        transfers, 'description' for deposits/withdrawals and 'name',
+        'email' and an optional 'profile' for openings. The openings are
+        written first in one save. The money requests are then checked in
+        file order against in-memory balances and committed together as one
+        set of transactions. A refused request gets its TransactionError in
+        place of a receipt and leaves the others untouched.
+        """
+        results = [None] * len(requests)
+        account_numbers = sorted({number for request in requests
+                                  for number in (request.get('account'), request.get('to')) if number})
+        with self.store.account_locks.hold(account_numbers):
+            current = self.store.get_accounts(account_numbers, fields=('balance',))
+            opened = self._open_batch(requests, results, current)
+            posted = self._post_batch(requests, results, account_numbers, opened)
+        for index, account in opened.values():
+            results[index] = self._opened(requests[index]['account'], account)
+        for index, balances in posted:
+            results[index] = self._posted(requests[index], balances)
+        return results
+
+    def _open_batch(self, requests, results, current):
+        """Validate and write a batch's openings; returns {account: (request index, record)}"""
+        opened = {}
+        for index, request in enumerate(requests):
+            if request['op'] != 'create':
+                continue
+            try:
+                account_number, account = self._opening(request['account'], request.get('name'),
+                                                        request.get('email', ''), request['amount'],
+                                                        request.get('profile'))
+                if current.get(account_number) is not None or account_number in opened:
+                    raise AccountExists(f"Account number {account_number} already exists")
+                opened[account_number] = (index, account)
+            except TransactionError as e:
+                results[index] = e
+        if opened:
+            self.store.save_changes({number: account for number, (_, account) in opened.items()}, [],
+                                    self._queued([self._welcome(number, account)
+                                                  for number, (_, account) in opened.items()]))
+        return opened
+
+    def _post_batch(self, requests, results, account_numbers, opened):
+        """Plan a batch's money requests in memory and commit them as one set of transactions
+
+        Returns (request index, balances after it) for every committed
+        request. The caller holds the account locks, so a version conflict
+        only comes from a writer outside them (e.g. a profile save); the
+        plan is then rebuilt from fresh balances.
+        """
+        for _ in range(COMMIT_RETRIES):
+            current = self.store.get_accounts(account_numbers, fields=('balance', VERSION_FIELD))
+            balances = {number: account['balance'] for number, account in current.items() if account is not None}
+            # Accounts opened by this batch only exist from their 'create' line on
+            live = {number for number in balances if number not in opened}
+            entries = []
+            posted = []
+            for index, request in enumerate(requests):
+                if request['op'] == 'create':
+                    if opened.get(request['account'], (None,))[0] == index:
+                        live.add(request['account'])
+                    continue
+                try:
+                    after = {}
+                    pending = []
+                    for entry in self._entries(request):
+                        number = entry['account']
+                        if number not in live:
+                            raise AccountNotFound(f"Account {number} not found")
+                        balance = after.get(number, balances[number])
+                        if entry['type'] in OUTFLOW_TYPES:
+                            balance -= entry['amount']
+                            if balance < 0:
+                                raise InsufficientFunds(f"Insufficient funds in account {number}")
+                        else:
+                            balance += entry['amount']
+                        after[number] = balance
+                        pending.append(dict(entry, balance=balance,
+                                            version=current[number].get(VERSION_FIELD, 0)))
+                except TransactionError as e:
+                    results[index] = e
+                    continue
+                entries.extend(pending)
+                balances.update(after)
+                posted.append((index, after))
+            try:
+                if entries:
+                    self.store.commit_transactions(entries, self._queued(
+                        [event for index, after in posted for event in self._events(requests[index], after)]))
+                return posted
+            except VersionConflict:
+                continue
+        conflict = VersionConflict("Accounts kept changing during the batch; nothing was posted")
+        for index, _ in posted:
+            results[index] = conflict
+        return []
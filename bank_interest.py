@@ -0,0 +1,171 @@
+"""
+BANK INTEREST - Month-end interest run for every account
+Credits each account's average-daily-balance interest for the month (see
+bank_accrual) a chunk of accounts at a time through Bank.post_interest():
+one locked read and one commit per chunk instead of a load/save per
+customer. One vectorized pass over the balance column first drops the
+accounts that cannot have earned anything.
+
+Progress is checkpointed after every chunk (accounts are posted in sorted
+order), so a run that crashes resumes after the last committed account.
+The chunk that was being committed when it stopped is checked against the
+accounts' recent history, so no account is credited twice for a period.
+
+The period defaults to the last complete month, so a run just after
+midnight on the 1st posts the month that has just ended.
+
+Notifications go the way the CLI sends them. In production mode each
+chunk's interest events are committed to the outbox together with its
+postings, so they survive a crash and bank_outbox.py delivers them
+(digest customers get one coalesced email). In testing mode they are
+printed as the chunks commit (see bank_mail).
+
+Usage: python bank_interest.py [--period YYYY-MM] [--rate R] [--chunk N] [--no-notify]
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bank_money import format_money
+from bank_engine import Bank, MONTHLY_INTEREST_RATE
+from bank_accrual import accrue_interest, earning_candidates
+from bank_mail import EMAIL_TESTING_MODE
+
+# ========== INTEREST RUN CONFIGURATION ==========
+INTEREST_CHUNK_SIZE = 1000  # Accounts locked, read and committed together
+INTEREST_CHECKPOINT_PATH = os.environ.get('CYGOBANK_INTEREST_CHECKPOINT', 'bank_interest.checkpoint.json')
+RESUME_HISTORY_WINDOW = 50  # Recent transactions searched for an in-doubt posting on resume
+
+# ========== CHECKPOINTS ==========
+def read_checkpoint(path=INTEREST_CHECKPOINT_PATH):
+    """The saved progress of the last interest run, or None"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def write_checkpoint(checkpoint, path=INTEREST_CHECKPOINT_PATH):
+    """Atomically replace the checkpoint file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _already_credited(store, account_numbers, description):
+    """{account: interest} for accounts of an in-doubt chunk whose recent history has this run's posting"""
+    credited = {}
+    for account_number in account_numbers:
+        page = store.get_history_page(account_number, limit=RESUME_HISTORY_WINDOW)
+        for transaction in page['transactions']:
+            if transaction['type'] == 'INTEREST' and transaction.get('description') == description:
+                credited[account_number] = transaction['amount']
+                break
+    return credited
+
+# ========== MONTH-END RUN ==========
+def previous_period(now=None):
+    """The last complete month as YYYY-MM"""
+    now = now or datetime.now()
+    return (now.replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+
+def run_interest(period=None, rate=MONTHLY_INTEREST_RATE, chunk_size=INTEREST_CHUNK_SIZE,
+                 bank=None, checkpoint_path=INTEREST_CHECKPOINT_PATH):
+    """Credit a month's interest to every account, resuming an interrupted run; returns a summary dict
+
+    `period` defaults to the last complete month. A finished run for the
+    same period is not repeated. Starting a new period while the checkpoint
+    holds an unfinished one raises ValueError.
+    """
+    period = period or previous_period()
+    bank = bank or Bank()
+    description = f"Monthly interest at {rate * 100:g}% for {period}"
+    started = time.perf_counter()
+
+    checkpoint = read_checkpoint(checkpoint_path)
+    if checkpoint is not None and checkpoint['period'] != period and not checkpoint['finished']:
+        raise ValueError(f"The {checkpoint['period']} interest run is unfinished; resume it first")
+    if checkpoint is None or checkpoint['period'] != period:
+        checkpoint = {'period': period, 'rate': rate, 'description': description, 'done_through': None,
+                      'in_flight': None, 'credited': 0, 'interest': 0, 'finished': False}
+    elif checkpoint['rate'] != rate:
+        raise ValueError(f"The {period} run was started at rate {checkpoint['rate']:g}")
+    summary = {'period': period, 'resumed': checkpoint['done_through'] is not None or bool(checkpoint['in_flight'])}
+    if checkpoint['finished']:
+        summary.update(already_done=True, credited=checkpoint['credited'], interest=checkpoint['interest'],
+                       seconds=time.perf_counter() - started)
+        return summary
+    description = checkpoint['description']
+
+    earning = earning_candidates(bank.store.load_accounts(), period)
+    if checkpoint['done_through'] is not None:
+        earning = [number for number in earning if number > checkpoint['done_through']]
+
+    if checkpoint['in_flight']:
+        in_doubt = _already_credited(bank.store, checkpoint['in_flight'], description)
+        earning = [number for number in earning if number not in in_doubt]
+        checkpoint.update(credited=checkpoint['credited'] + len(in_doubt),
+                          interest=checkpoint['interest'] + sum(in_doubt.values()))
+
+    for start in range(0, len(earning), chunk_size):
+        chunk = earning[start:start + chunk_size]
+        checkpoint['in_flight'] = chunk
+        write_checkpoint(checkpoint, checkpoint_path)
+        receipts = bank.post_interest(chunk, rate, description,
+                                      accrue=lambda numbers: accrue_interest(bank.store, numbers, period, rate))
+        checkpoint.update(done_through=chunk[-1], in_flight=None,
+                          credited=checkpoint['credited'] + len(receipts),
+                          interest=checkpoint['interest'] + sum(receipt.amount for receipt in receipts))
+        write_checkpoint(checkpoint, checkpoint_path)
+
+    checkpoint.update(finished=True, in_flight=None)
+    write_checkpoint(checkpoint, checkpoint_path)
+    summary.update(already_done=False, credited=checkpoint['credited'], interest=checkpoint['interest'],
+                   seconds=time.perf_counter() - started)
+    return summary
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    options = {'--period': None, '--rate': MONTHLY_INTEREST_RATE, '--chunk': INTEREST_CHUNK_SIZE}
+    notify = '--no-notify' not in args
+    args = [arg for arg in args if arg != '--no-notify']
+    try:
+        while args:
+            option, value = args[0], args[1]
+            if option not in options:
+                raise ValueError(option)
+            options[option] = value if option == '--period' else type(options[option])(value)
+            args = args[2:]
+        if options['--period'] is not None:
+            datetime.strptime(options['--period'], '%Y-%m')
+        if options['--rate'] <= 0 or options['--chunk'] < 1:
+            raise ValueError(options)
+    except (IndexError, ValueError):
+        print("Usage: python bank_interest.py [--period YYYY-MM] [--rate R] [--chunk N] [--no-notify]")
+        sys.exit(1)
+
+    if notify:
+        from CyGoBank import notify_customer  # The CLI's email hook
+        bank = Bank(notify=notify_customer, outbox=not EMAIL_TESTING_MODE)
+    else:
+        bank = Bank()
+    try:
+        summary = run_interest(options['--period'], options['--rate'], options['--chunk'], bank)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if summary['already_done']:
+        print(f"✅ Interest for {summary['period']} was already posted "
+              f"({summary['credited']} accounts, {format_money(summary['interest'])})")
+    else:
+        print(f"✅ {'Resumed and finished' if summary['resumed'] else 'Posted'} interest for {summary['period']}: "
+              f"{summary['credited']} accounts credited {format_money(summary['interest'])} "
+              f"in {summary['seconds']:.2f}s")
+    if bank.outbox:
+        print("📧 Notifications are in the outbox; run 'python bank_outbox.py' to deliver them")
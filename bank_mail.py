@@ -0,0 +1,152 @@
+"""
+BANK MAIL - Background email delivery over pooled SMTP sessions
+Used by both the CLI (CyGoBank.py) and the web app (cygobankapp.py).
+Sending used to open a new SMTP connection, STARTTLS and log in for every
+message, inside the transaction that triggered it. Now the transaction only
+queues the message: a MailDispatcher's sender threads each keep one
+authenticated session open and send queued messages back to back over it,
+reconnecting only when the server drops the session or it sits idle.
+"""
+
+import atexit
+import os
+import queue
+import smtplib
+import ssl
+import threading
+from concurrent.futures import Future
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# ========== MAIL CONFIGURATION ==========
+MAIL_WORKERS = 2  # Sender threads, each holding one SMTP session
+SMTP_IDLE_TIMEOUT = 60  # Seconds an unused session stays open
+SMTP_TIMEOUT = 30  # Seconds to wait on the server before giving up on a message
+
+# Shared by the apps and the delivery workers: 'testing' prints emails instead
+# of sending them, 'production' sends them through the dispatcher
+EMAIL_MODE = os.environ.get('CYGOBANK_EMAIL_MODE', 'testing')
+EMAIL_TESTING_MODE = EMAIL_MODE != 'production'
+
+# ========== MESSAGES ==========
+def build_message(sender, recipient, subject, body):
+    """Plain-text email message"""
+    message = MIMEMultipart()
+    message['From'] = sender
+    message['To'] = recipient
+    message['Subject'] = subject
+    message.attach(MIMEText(body, 'plain'))
+    return message
+
+# ========== DISPATCHER ==========
+class MailDispatcher:
+    """Queue of outgoing emails served by sender threads with pooled SMTP sessions
+
+    `config` is an EMAIL_CONFIG dict (smtp_server, smtp_port, sender_email,
+    sender_password, use_tls). send() returns at once with a Future that
+    resolves to True or to the delivery error. Threads start on the first
+    send, and queued messages are still delivered when the program exits.
+    """
+
+    def __init__(self, config, workers=MAIL_WORKERS, idle_timeout=SMTP_IDLE_TIMEOUT):
+        self.config = config
+        self.workers = workers
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def send(self, recipient, subject, body):
+        """Queue one email; returns a Future of the delivery"""
+        future = Future()
+        message = build_message(self.config['sender_email'], recipient, subject, body)
+        self._queue.put((message, future))
+        self._ensure_started()
+        return future
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if not self._threads:
+                self._threads = [threading.Thread(target=self._run, name=f'bank-mail-{i}', daemon=True)
+                                 for i in range(self.workers)]
+                for thread in self._threads:
+                    thread.start()
+                atexit.register(self.close)
+
+    def _connect(self):
+        """Open and authenticate one SMTP session"""
+        server = smtplib.SMTP(self.config['smtp_server'], self.config['smtp_port'], timeout=SMTP_TIMEOUT)
+        try:
+            if self.config.get('use_tls', True):
+                server.starttls(context=ssl.create_default_context())
+            server.login(self.config['sender_email'], self.config['sender_password'])
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _deliver(self, server, message):
+        """Send over the pooled session, reconnecting once if it was dropped; returns the session"""
+        for attempt in range(2):
+            if server is None:
+                server = self._connect()
+            try:
+                server.send_message(message)
+                return server
+            except (smtplib.SMTPServerDisconnected, OSError):
+                _quit(server)
+                server = None
+                if attempt:
+                    raise
+
+    def _run(self):
+        server = None
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout if server is not None else None)
+            except queue.Empty:
+                _quit(server)  # Idle: don't hold the session open on the server
+                server = None
+                continue
+            if item is None:
+                _quit(server)
+                return
+            message, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                server = self._deliver(server, message)
+                future.set_result(True)
+            except Exception as e:
+                _quit(server)  # Start the next message on a fresh session
+                server = None
+                future.set_exception(e)
+
+    def close(self):
+        """Deliver everything queued, then close the sessions"""
+        with self._start_lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+def _quit(server):
+    """Politely end an SMTP session, ignoring a server that already hung up"""
+    if server is None:
+        return
+    try:
+        server.quit()
+    except Exception:
+        server.close()
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+def get_dispatcher(config):
+    """The shared dispatcher for an email configuration (one set of sessions per account/server)"""
+    key = (config['smtp_server'], config['smtp_port'], config['sender_email'])
+    with _dispatchers_lock:
+        if key not in _dispatchers:
+            _dispatchers[key] = MailDispatcher(config)
+        return _dispatchers[key]
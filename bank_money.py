@@ -0,0 +1,38 @@
+"""
+BANK MONEY - Integer-cents money helpers shared by the apps and the store
+Balances, transaction amounts, aggregates and alert thresholds are all
+held as int cents, so sums are exact and never drift. These helpers turn
+user input into cents and cents back into display strings.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# ========== MONEY ==========
+CENTS_PER_DOLLAR = 100
+
+def to_cents(dollars):
+    """Convert a dollar amount (number or numeric string) to int cents, rounding half up"""
+    cents = Decimal(str(dollars)) * CENTS_PER_DOLLAR
+    return int(cents.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def parse_money(text):
+    """Parse typed dollars ('25', '1,234.50', '$20') into int cents; raises ValueError"""
+    try:
+        return to_cents(text.strip().lstrip('$').replace(',', ''))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid amount: {text!r}")
+
+def to_dollars(cents):
+    """Dollar value of int cents, for widgets that only take floats"""
+    return cents / CENTS_PER_DOLLAR
+
+def apply_rate(cents, rate):
+    """A percentage of an amount (e.g. interest), rounded half up to whole cents"""
+    amount = Decimal(cents) * Decimal(str(rate))
+    return int(amount.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def format_money(cents, sign=False):
+    """Format int cents as '$1,234.56' (with a '+'/'-' prefix when sign is True)"""
+    prefix = '-' if cents < 0 else '+' if sign else ''
+    dollars, remainder = divmod(abs(cents), CENTS_PER_DOLLAR)
+    return f"{prefix}${dollars:,}.{remainder:02d}"
@@ -0,0 +1,182 @@
+"""
+BANK OUTBOX - Delivery worker for the notification outbox
+A Bank in outbox mode writes its notification events into the store's
+outbox in the same commit as the postings (see bank_store), so a
+transaction neither waits on the mail server nor loses its email when the
+server is down. This worker drains the outbox: every due item is delivered
+and marked 'sent', or rescheduled with exponential backoff and jitter, and
+marked 'failed' after OUTBOX_MAX_ATTEMPTS tries.
+
+Accounts with a digest preference get one email per time window instead
+of one per event: their items are held until the window closes and then
+delivered together (see bank_digest), however many polls they span.
+
+Items are keyed by a random id, so one item is only delivered again if the
+worker stops between sending it and recording it as sent (at-least-once).
+Only one worker runs at a time per store: the others exit on start.
+
+The worker only runs with CYGOBANK_EMAIL_MODE=production (see bank_mail): in
+testing mode emails are printed, not sent, so it leaves the outbox alone
+rather than mark undelivered items as sent.
+
+Usage: CYGOBANK_EMAIL_MODE=production python bank_outbox.py [--once]
+       (--once delivers what is due and exits; otherwise it polls until stopped)
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bank_store import get_store, STORE_CONFIG
+from bank_mail import EMAIL_TESTING_MODE
+from bank_digest import plan_deliveries, window_end, UNDIGESTED_EVENTS
+
+try:
+    import fcntl  # Single-worker lock (Linux/macOS)
+except ImportError:
+    fcntl = None
+
+# ========== OUTBOX WORKER CONFIGURATION ==========
+OUTBOX_POLL_INTERVAL = 2  # Seconds between polls when the outbox is empty
+OUTBOX_BATCH = 100  # Items read per poll
+OUTBOX_MAX_ATTEMPTS = 8  # Tries before an item is marked failed
+OUTBOX_RETRY_BASE = 30  # Seconds before the first retry, doubled on each failure
+OUTBOX_RETRY_MAX = 3600  # Longest wait between retries
+OUTBOX_KEEP_SENT = timedelta(days=7)  # Sent items kept for inspection before compaction
+OUTBOX_COMPACT_INTERVAL = 3600  # Seconds between compactions
+OUTBOX_LOCK_PATH = os.environ.get('CYGOBANK_OUTBOX_LOCK', STORE_CONFIG['outbox_path'] + '.worker.lock')
+
+# ========== DELIVERY ==========
+def retry_delay(attempts):
+    """Seconds to wait after the `attempts`-th failed try: exponential, capped, with jitter"""
+    delay = min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+def deliver_due(store, send, limit=OUTBOX_BATCH, now=None, send_digest=None, digest_window=None):
+    """Deliver the outbox items that are due; returns {'sent', 'held', 'retried', 'failed'} item counts
+
+    `send(event)` delivers one event; returning False or raising counts as
+    a failed try. With `digest_window(account)` (seconds, 0 for none) and
+    `send_digest(account, events)`, digest accounts' items are held until
+    their window closes and then sent as one email; each event then carries
+    the 'date' it was posted.
+    """
+    now = time.time() if now is None else now
+    counts = {'sent': 0, 'held': 0, 'retried': 0, 'failed': 0}
+    items = store.outbox_due(now, limit)
+    if digest_window is None or send_digest is None:
+        deliveries, held = [[item] for item in items], []
+    else:
+        windows = {}
+
+        def window_of(account):
+            if account not in windows:
+                windows[account] = digest_window(account)
+            return windows[account]
+
+        deliveries, held = plan_deliveries(items, window_of, now)
+        if len(items) >= limit:
+            # A full batch may hold only part of a released window
+            deliveries = [_whole_digest(store, delivery, window_of, now) for delivery in deliveries]
+    for item, release in held:
+        store.outbox_record(item['key'], 'pending', item['attempts'], release)
+        counts['held'] += 1
+
+    for delivery in deliveries:
+        attempts = max(item['attempts'] for item in delivery) + 1
+        try:
+            if len(delivery) == 1:
+                delivered = send(delivery[0]['event'])
+            else:
+                delivered = send_digest(delivery[0]['event']['account'],
+                                        [dict(item['event'], date=item['created']) for item in delivery])
+            error = None if delivered is not False else 'not delivered'
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        if error is None:
+            status, next_attempt = 'sent', 0
+        elif attempts >= OUTBOX_MAX_ATTEMPTS:
+            status, next_attempt = 'failed', 0
+        else:
+            # One delay for the whole delivery, so a digest is retried as one
+            status, next_attempt = 'pending', time.time() + retry_delay(attempts)
+        for item in delivery:
+            store.outbox_record(item['key'], status, attempts, next_attempt, error)
+        counts['retried' if status == 'pending' else status] += len(delivery)
+    return counts
+
+def _whole_digest(store, delivery, window_of, now):
+    """A delivery with every released item of its digest account, not only those in this batch"""
+    event = delivery[0]['event']
+    window = window_of(event['account'])
+    if event['type'] in UNDIGESTED_EVENTS or not window:
+        return delivery
+    return [item for item in store.outbox_due(now, None, event['account'])
+            if item['event']['type'] not in UNDIGESTED_EVENTS and window_end(item['created'], window) <= now]
+
+def _hold_worker_lock(path=OUTBOX_LOCK_PATH):
+    """Take the single-worker lock; returns the open lock file, or None if another worker holds it"""
+    lock_file = open(path, 'a')
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+    return lock_file
+
+def run_worker(send, store=None, once=False, poll_interval=OUTBOX_POLL_INTERVAL, send_digest=None,
+               digest_window=None):
+    """Deliver outbox items until stopped (or until nothing is due, with `once`); returns the totals
+
+    See deliver_due for the callbacks. Returns None without delivering
+    anything if another worker is running.
+    """
+    store = store or get_store()
+    lock_file = _hold_worker_lock()
+    if lock_file is None:
+        return None
+    totals = {'sent': 0, 'held': 0, 'retried': 0, 'failed': 0}
+    compacted = time.monotonic()
+    try:
+        while True:
+            counts = deliver_due(store, send, send_digest=send_digest, digest_window=digest_window)
+            for status, count in counts.items():
+                totals[status] += count
+            if sum(counts.values()) < OUTBOX_BATCH:
+                if once:
+                    return totals
+                time.sleep(poll_interval)
+            if time.monotonic() - compacted >= OUTBOX_COMPACT_INTERVAL:
+                store.outbox_compact((datetime.now() - OUTBOX_KEEP_SENT).strftime('%Y-%m-%d %H:%M:%S'))
+                compacted = time.monotonic()
+    finally:
+        lock_file.close()
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args not in ([], ['--once']):
+        print("Usage: CYGOBANK_EMAIL_MODE=production python bank_outbox.py [--once]")
+        sys.exit(1)
+    if EMAIL_TESTING_MODE:
+        # Testing mode prints emails; the items must stay pending until really sent
+        print("❌ Email is in testing mode; set CYGOBANK_EMAIL_MODE=production to deliver the outbox")
+        sys.exit(1)
+
+    from CyGoBank import notify_customer, notify_customer_digest, get_digest_window  # The CLI's email hooks
+    store = get_store()
+    print(f"📬 Outbox: {store.outbox_counts()}")
+    try:
+        totals = run_worker(lambda event: notify_customer(event, wait=True), store, once=bool(args),
+                            send_digest=lambda account, events: notify_customer_digest(account, events, wait=True),
+                            digest_window=get_digest_window)
+    except KeyboardInterrupt:
+        print(f"\n✅ Outbox worker stopped. Outbox: {store.outbox_counts()}")
+        sys.exit(0)
+    if totals is None:
+        print("❌ Another outbox worker is already running")
+        sys.exit(1)
+    print(f"✅ Delivered what was due: {totals['sent']} sent, {totals['held']} held for digests, "
+          f"{totals['retried']} retried, {totals['failed']} failed")
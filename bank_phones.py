@@ -0,0 +1,405 @@
+"""
+BANK PHONES - Phone number formats shared by the apps and the store
+Per-country formats used to validate phone numbers, plus normalization to
+E.164 (+<country code><digits>) so the same number typed with or without
+spaces, dashes or its country code maps to one key in the phone index.
+"""
+
+import re
+
+# ========== PHONE VALIDATION ==========
+COUNTRY_PHONE_FORMATS = {
+    'USA': {
+        'code': '+1',
+        'pattern': r'^[2-9][0-9]{2}-[2-9][0-9]{2}-[0-9]{4}$',
+        'example': '404-401-3601',
+        'description': 'XXX-XXX-XXXX'
+    },
+    'Canada': {
+        'code': '+1',
+        'pattern': r'^[2-9][0-9]{2}-[2-9][0-9]{2}-[0-9]{4}$',
+        'example': '416-555-0123',
+        'description': 'XXX-XXX-XXXX'
+    },
+    'United Kingdom': {
+        'code': '+44',
+        'pattern': r'^\+44\s?[1-9][0-9]{1,4}[\s.-]?[0-9]{3,4}[\s.-]?[0-9]{3,4}$',
+        'example': '+44 20 7946 0958',
+        'description': '+44 XXXX XXXX XXXX'
+    },
+    'Australia': {
+        'code': '+61',
+        'pattern': r'^\+61\s?[2-9][0-9]{8}$',
+        'example': '+61 2 1234 5678',
+        'description': '+61 X XXXX XXXX'
+    },
+    'Germany': {
+        'code': '+49',
+        'pattern': r'^\+49\s?[1-9][0-9]{1,5}[\s.-]?[0-9]{3,9}$',
+        'example': '+49 30 12345678',
+        'description': '+49 XX XXXXXXXX'
+    },
+    'France': {
+        'code': '+33',
+        'pattern': r'^\+33\s?[1-9][0-9]{8}$',
+        'example': '+33 1 42 68 53 00',
+        'description': '+33 X XX XX XX XX'
+    },
+    'India': {
+        'code': '+91',
+        'pattern': r'^\+91\s?[6-9][0-9]{9}$',
+        'example': '+91 98765 43210',
+        'description': '+91 XXXXX XXXXX'
+    },
+    'Japan': {
+        'code': '+81',
+        'pattern': r'^\+81\s?[1-9][0-9]{1,4}[\s.-]?[0-9]{1,4}[\s.-]?[0-9]{4}$',
+        'example': '+81 3-1234-5678',
+        'description': '+81 X XXXX XXXX'
+    },
+    'Cameroon': {
+        'code': '+237',
+        'pattern': r'^\+237\s?[2367][0-9]{7}$',
+        'example': '+237 6 7812 3456',
+        'description': '+237 X XXXX XXXX'
+    },
+    'South Africa': {
+        'code': '+27',
+        'pattern': r'^\+27\s?[1-9][0-9]{8}$',
+        'example': '+27 11 555 1234',
+        'description': '+27 XX XXX XXXX'
+    },
+    'Brazil': {
+        'code': '+55',
+        'pattern': r'^\+55\s?\(?[1-9][0-9]\)?\s?[3-9][0-9]{3,4}[\s.-]?[0-9]{4}$',
+        'example': '+55 (11) 98765-4321',
+        'description': '(XX) XXXXX-XXXX'
+    },
+    'Mexico': {
+        'code': '+52',
+        'pattern': r'^\+52\s?[1-9][0-9]{9}$',
+        'example': '+52 55 1234 5678',
+        'description': '+52 XX XXXX XXXX'
+    },
+    'China': {
+        'code': '+86',
+        'pattern': r'^\+86\s?1[3-9][0-9]{9}$',
+        'example': '+86 138 0001 2345',
+        'description': '+86 1XX XXXX XXXX'
+    },
+    'Russia': {
+        'code': '+7',
+        'pattern': r'^\+7\s?[1-9][0-9]{9}$',
+        'example': '+7 499 123 4567',
+        'description': '+7 XXX XXX XXXX'
+    },
+    'Spain': {
+        'code': '+34',
+        'pattern': r'^\+34\s?[1-9][0-9]{8}$',
+        'example': '+34 912 34 5678',
+        'description': '+34 XXX XXX XXXX'
+    },
+    'Italy': {
+        'code': '+39',
+        'pattern': r'^\+39\s?[0-9]{6,10}$',
+        'example': '+39 06 1234 5678',
+        'description': '+39 XX XXXX XXXX'
+    },
+    'Netherlands': {
+        'code': '+31',
+        'pattern': r'^\+31\s?[1-9][0-9]{8}$',
+        'example': '+31 20 123 4567',
+        'description': '+31 XX XXX XXXX'
+    },
+    'Belgium': {
+        'code': '+32',
+        'pattern': r'^\+32\s?[1-9][0-9]{8}$',
+        'example': '+32 2 123 4567',
+        'description': '+32 X XXX XXXX'
+    },
+    'Switzerland': {
+        'code': '+41',
+        'pattern': r'^\+41\s?[1-9][0-9]{8}$',
+        'example': '+41 44 123 4567',
+        'description': '+41 XX XXX XXXX'
+    },
+    'Sweden': {
+        'code': '+46',
+        'pattern': r'^\+46\s?[1-9][0-9]{8}$',
+        'example': '+46 8 123 4567',
+        'description': '+46 X XXX XXXX'
+    },
+    'Norway': {
+        'code': '+47',
+        'pattern': r'^\+47\s?[4-9][0-9]{7}$',
+        'example': '+47 412 34 567',
+        'description': '+47 XXX XX XXX'
+    },
+    'Denmark': {
+        'code': '+45',
+        'pattern': r'^\+45\s?[1-9][0-9]{7}$',
+        'example': '+45 1234 5678',
+        'description': '+45 XXXX XXXX'
+    },
+    'Poland': {
+        'code': '+48',
+        'pattern': r'^\+48\s?[1-9][0-9]{8}$',
+        'example': '+48 12 123 4567',
+        'description': '+48 XX XXX XXXX'
+    },
+    'New Zealand': {
+        'code': '+64',
+        'pattern': r'^\+64\s?[1-9][0-9]{7,9}$',
+        'example': '+64 9 123 4567',
+        'description': '+64 X XXX XXXX'
+    },
+    'Singapore': {
+        'code': '+65',
+        'pattern': r'^\+65\s?[6-9][0-9]{7}$',
+        'example': '+65 6123 4567',
+        'description': '+65 XXXX XXXX'
+    },
+    'Hong Kong': {
+        'code': '+852',
+        'pattern': r'^\+852\s?[2-9][0-9]{7}$',
+        'example': '+852 2123 4567',
+        'description': '+852 XXXX XXXX'
+    },
+    'Thailand': {
+        'code': '+66',
+        'pattern': r'^\+66\s?[2-9][0-9]{7,8}$',
+        'example': '+66 2 123 4567',
+        'description': '+66 X XXXX XXXX'
+    },
+    'Malaysia': {
+        'code': '+60',
+        'pattern': r'^\+60\s?[1-9][0-9]{7,9}$',
+        'example': '+60 3 1234 5678',
+        'description': '+60 X XXXX XXXX'
+    },
+    'Philippines': {
+        'code': '+63',
+        'pattern': r'^\+63\s?[2-9][0-9]{8,9}$',
+        'example': '+63 2 1234 5678',
+        'description': '+63 X XXXX XXXX'
+    },
+    'Indonesia': {
+        'code': '+62',
+        'pattern': r'^\+62\s?[1-9][0-9]{7,10}$',
+        'example': '+62 21 1234 5678',
+        'description': '+62 XX XXXX XXXX'
+    },
+    'Vietnam': {
+        'code': '+84',
+        'pattern': r'^\+84\s?[1-9][0-9]{7,9}$',
+        'example': '+84 24 1234 5678',
+        'description': '+84 XX XXXX XXXX'
+    },
+    'Pakistan': {
+        'code': '+92',
+        'pattern': r'^\+92\s?[3][0-9]{9}$',
+        'example': '+92 300 1234 567',
+        'description': '+92 XXX XXXX XXX'
+    },
+    'Bangladesh': {
+        'code': '+880',
+        'pattern': r'^\+880\s?1[1-9][0-9]{8}$',
+        'example': '+880 171 234 5678',
+        'description': '+880 1XX XXXX XXXX'
+    },
+    'Nigeria': {
+        'code': '+234',
+        'pattern': r'^\+234\s?[7-9][0-9]{9}$',
+        'example': '+234 701 234 5678',
+        'description': '+234 XXX XXXX XXXX'
+    },
+    'Egypt': {
+        'code': '+20',
+        'pattern': r'^\+20\s?1[0-1][0-9]{8}$',
+        'example': '+20 100 123 4567',
+        'description': '+20 1XX XXX XXXX'
+    },
+    'Kenya': {
+        'code': '+254',
+        'pattern': r'^\+254\s?[7][0-9]{8}$',
+        'example': '+254 701 234 567',
+        'description': '+254 XXX XXX XXX'
+    },
+    'Argentina': {
+        'code': '+54',
+        'pattern': r'^\+54\s?\(?[1-9]{1,3}\)?\s?[1-9][0-9]{3,4}[\s.-]?[0-9]{4}$',
+        'example': '+54 (11) 1234-5678',
+        'description': '(XXX) XXXX-XXXX'
+    },
+    'Chile': {
+        'code': '+56',
+        'pattern': r'^\+56\s?[2-9][0-9]{8}$',
+        'example': '+56 2 1234 5678',
+        'description': '+56 X XXXX XXXX'
+    },
+    'Colombia': {
+        'code': '+57',
+        'pattern': r'^\+57\s?[1-9][0-9]{8,9}$',
+        'example': '+57 1 1234 5678',
+        'description': '+57 X XXXX XXXX'
+    },
+    'Peru': {
+        'code': '+51',
+        'pattern': r'^\+51\s?[1-9][0-9]{8}$',
+        'example': '+51 1 1234 5678',
+        'description': '+51 X XXXX XXXX'
+    },
+    'Turkey': {
+        'code': '+90',
+        'pattern': r'^\+90\s?[1-9][0-9]{9}$',
+        'example': '+90 212 123 4567',
+        'description': '+90 XXX XXX XXXX'
+    },
+    'Saudi Arabia': {
+        'code': '+966',
+        'pattern': r'^\+966\s?[1-9][0-9]{8}$',
+        'example': '+966 11 1234 567',
+        'description': '+966 XX XXXX XXX'
+    },
+    'UAE': {
+        'code': '+971',
+        'pattern': r'^\+971\s?[1-9][0-9]{7,8}$',
+        'example': '+971 4 1234 5678',
+        'description': '+971 X XXXX XXXX'
+    },
+    'Israel': {
+        'code': '+972',
+        'pattern': r'^\+972\s?[1-9][0-9]{8}$',
+        'example': '+972 2 1234 567',
+        'description': '+972 X XXXX XXXX'
+    },
+    'Greece': {
+        'code': '+30',
+        'pattern': r'^\+30\s?[1-9][0-9]{9}$',
+        'example': '+30 2 1234 5678',
+        'description': '+30 X XXXX XXXX'
+    },
+    'Ireland': {
+        'code': '+353',
+        'pattern': r'^\+353\s?[1-9][0-9]{8}$',
+        'example': '+353 1 234 5678',
+        'description': '+353 X XXX XXXX'
+    },
+    'Portugal': {
+        'code': '+351',
+        'pattern': r'^\+351\s?[1-9][0-9]{8}$',
+        'example': '+351 21 1234 567',
+        'description': '+351 XX XXXX XXX'
+    },
+    'Austria': {
+        'code': '+43',
+        'pattern': r'^\+43\s?[1-9][0-9]{8}$',
+        'example': '+43 1 1234 567',
+        'description': '+43 X XXXX XXXX'
+    },
+    'Czech Republic': {
+        'code': '+420',
+        'pattern': r'^\+420\s?[1-9][0-9]{8}$',
+        'example': '+420 2 1234 5678',
+        'description': '+420 X XXXX XXXX'
+    },
+    'Hungary': {
+        'code': '+36',
+        'pattern': r'^\+36\s?[1-9][0-9]{8}$',
+        'example': '+36 1 1234 5678',
+        'description': '+36 X XXXX XXXX'
+    },
+    'Romania': {
+        'code': '+40',
+        'pattern': r'^\+40\s?[1-9][0-9]{8}$',
+        'example': '+40 21 1234 567',
+        'description': '+40 XX XXXX XXX'
+    },
+    'Ukraine': {
+        'code': '+380',
+        'pattern': r'^\+380\s?[1-9][0-9]{8}$',
+        'example': '+380 44 1234 567',
+        'description': '+380 XX XXXX XXX'
+    },
+    'Finland': {
+        'code': '+358',
+        'pattern': r'^\+358\s?[1-9][0-9]{7,8}$',
+        'example': '+358 9 1234 567',
+        'description': '+358 X XXXX XXX'
+    },
+    'Iceland': {
+        'code': '+354',
+        'pattern': r'^\+354\s?[1-9][0-9]{6}$',
+        'example': '+354 123 4567',
+        'description': '+354 XXX XXXX'
+    },
+    'Luxembourg': {
+        'code': '+352',
+        'pattern': r'^\+352\s?[1-9][0-9]{8}$',
+        'example': '+352 1234 5678',
+        'description': '+352 XXXX XXXX'
+    },
+    'Malta': {
+        'code': '+356',
+        'pattern': r'^\+356\s?[1-9][0-9]{7}$',
+        'example': '+356 7123 4567',
+        'description': '+356 XXXX XXXX'
+    },
+    'Cyprus': {
+        'code': '+357',
+        'pattern': r'^\+357\s?2[0-6][0-9]{6}$',
+        'example': '+357 22 1234 567',
+        'description': '+357 XX XXXX XXX'
+    },
+}
+
+
+def validate_phone(phone_number, country):
+    """Validate phone number based on country format"""
+    if country not in COUNTRY_PHONE_FORMATS:
+        return False
+    
+    pattern = COUNTRY_PHONE_FORMATS[country]['pattern']
+    return re.match(pattern, phone_number) is not None
+
+def get_phone_format_help(country):
+    """Get phone format help text for a country"""
+    if country in COUNTRY_PHONE_FORMATS:
+        fmt = COUNTRY_PHONE_FORMATS[country]
+        return f"Example: {fmt['example']} | Format: {fmt['description']}"
+    return ""
+
+# ========== PHONE NORMALIZATION ==========
+# Countries whose numbers are written without the country code (e.g. USA
+# 404-401-3601); a number typed without a code is assumed to be from these
+NATIONAL_FORMAT_CODES = sorted({
+    fmt['code'] for fmt in COUNTRY_PHONE_FORMATS.values() if not fmt['pattern'].startswith(r'^\+')
+})
+
+def normalize_phone(phone_number, country=None):
+    """Return the E.164 form of a phone number (e.g. '+35671234567'), or None
+
+    Spaces, dashes, dots and brackets are ignored. A number without a
+    leading '+' (or international '00') gets the country's calling code,
+    dropping a national trunk '0'; without a country this only works when
+    a single code uses the national format.
+    """
+    if not phone_number:
+        return None
+    phone = phone_number.strip()
+    digits = re.sub(r'\D', '', phone)
+    if not digits:
+        return None
+    if phone.startswith('+'):
+        return '+' + digits
+    if phone.startswith('00'):
+        return '+' + digits[2:]
+    if country in COUNTRY_PHONE_FORMATS:
+        code = COUNTRY_PHONE_FORMATS[country]['code']
+    elif len(NATIONAL_FORMAT_CODES) == 1:
+        code = NATIONAL_FORMAT_CODES[0]
+    else:
+        return None
+    if digits.startswith('0'):
+        digits = digits[1:]
+    return code + digits
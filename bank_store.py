@@ -0,0 +1,3151 @@
+"""
+BANK STORE - Shared persistence layer
+Pluggable account storage used by both the CLI (CyGoBank.py) and the web
+app (cygobankapp.py).
+
+Backends:
+- JsonAccountStore: bank_accounts.json snapshot plus an append-only
+  transaction journal. Every commit appends one JSON line instead of
+  rewriting the whole file, and a background thread periodically folds the
+  journal back into the snapshot (a checkpoint). Transaction histories are
+  folded into per-account segmented files under bank_history/ rather than
+  the snapshot, so balance reads never parse them.
+- SqliteAccountStore: SQLite database in WAL mode with indexed accounts and
+  transactions tables, so a deposit touches one row instead of the whole bank.
+
+Account records hold the profile, balance and a transaction_count; the
+history itself is only read through get_history(). Money (balances,
+transaction amounts, aggregates, alert thresholds) is stored as int cents;
+see bank_money for parsing and formatting. Secondary indexes
+(STORE_INDEXES, e.g. accounts by normalized phone number) answer lookups
+without scanning every account: the JSON backend saves them next to the
+snapshot at each checkpoint, SQLite keeps them as indexed columns.
+
+Both backends funnel writes through a GroupCommitWriter thread, so commits
+arriving from concurrent Streamlit sessions within a few milliseconds share
+a single fsync. Every account carries a version bumped by each write;
+apply_transactions() holds per-account locks (in sorted order, shared with
+other processes) and commits balance changes with a compare-and-swap on
+those versions, so sessions on unrelated accounts never wait for each other
+and a stale read can never overwrite a newer balance.
+
+Customer notifications can be committed together with the write that
+caused them into a notification outbox (a table in SQLite; journal records
+folded into bank_outbox.jsonl for JSON), which bank_outbox.py delivers with
+retries and status tracking.
+
+The backend is chosen by STORE_CONFIG (overridable through environment
+variables). Run `python bank_store.py migrate` to copy the JSON data into
+SQLite once, `python bank_store.py rebuild-stats` to recompute the
+per-account aggregates from the histories, `python bank_store.py
+convert-cents` to convert data written with dollar floats (stores that
+still hold dollars are not opened until this has run; the dollar files are
+backed up first), `python bank_store.py
+low-balance` to list the accounts under their alert threshold, and `python
+bank_store.py cache-stats [reads]` to see how much parsing the
+load_accounts() read cache saves.
+"""
+
+import bisect
+import errno
+import heapq
+import json
+import mmap
+import os
+import queue
+import random
+import re
+import shutil
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import quote
+
+from bank_money import to_cents, format_money
+from bank_phones import normalize_phone
+
+try:
+    import fcntl  # Cross-process locking (Linux/macOS)
+except ImportError:
+    fcntl = None  # Windows: fall back to in-process locking only
+
+# ========== STORE CONFIGURATION ==========
+STORE_CONFIG = {
+    'backend': os.environ.get('CYGOBANK_STORE', 'json'),  # 'json' or 'sqlite'
+    'json_path': os.environ.get('CYGOBANK_JSON_PATH', 'bank_accounts.json'),
+    'journal_path': os.environ.get('CYGOBANK_JOURNAL_PATH', 'bank_accounts.journal'),
+    'sqlite_path': os.environ.get('CYGOBANK_SQLITE_PATH', 'bank_accounts.db'),
+    'history_path': os.environ.get('CYGOBANK_HISTORY_PATH', 'bank_history'),
+    'index_path': os.environ.get('CYGOBANK_INDEX_PATH', 'bank_accounts.index.json'),
+    'outbox_path': os.environ.get('CYGOBANK_OUTBOX_PATH', 'bank_outbox.jsonl'),
+    'history_segment_size': 1000,  # Entries per history file before a new segment starts
+    'checkpoint_records': 1000,  # Checkpoint after this many journal records...
+    'checkpoint_interval': 60,   # ...or after this many seconds with pending records
+    'group_commit_window': 0.005,  # Seconds the writer waits to gather concurrent commits
+    'fsync': True                # fsync every group commit (durable across power loss)
+}
+
+# Transaction types that add to / take from the balance
+INFLOW_TYPES = ('DEPOSIT', 'TRANSFER_IN', 'INTEREST')
+OUTFLOW_TYPES = ('WITHDRAWAL', 'TRANSFER_OUT')
+
+# Recipients remembered per account for the transfer page's payee directory
+RECENT_PAYEES = 10
+
+# How older transfers name their recipient: "To 12345" / "To account 12345"
+_TRANSFER_OUT_DESCRIPTION = re.compile(r'^To (?:account )?(\S+)$')
+
+# Account fields maintained by the store from the transaction history
+STORE_COUNTERS = ('transaction_count', 'stats')
+
+# Per-account version, bumped by every write to the account. Commits that
+# carry the version they read are compare-and-swapped against it
+VERSION_FIELD = 'version'
+
+# Attempts apply_transactions() makes when another writer (a profile save, an
+# older client) bumps a version first, backing off a random 0..(delay * attempt)
+# seconds between them
+COMMIT_RETRIES = 5
+COMMIT_RETRY_DELAY = 0.005
+
+# Account numbers hash onto this many account locks; each is also one byte of
+# the store's account lock file, so other processes honour the same locks
+ACCOUNT_LOCK_STRIPES = 4096
+
+# Where open-file-description locks are missing, a byte lock the kernel refuses
+# with EDEADLK (its deadlock check is per process, so threads trip it falsely)
+# is retried this many times, backing off a random 0..(delay * attempt) seconds
+ACCOUNT_LOCK_RETRIES = 50
+ACCOUNT_LOCK_RETRY_DELAY = 0.002
+
+# get_accounts() on a cold JSON cache reads this many accounts one by one (a
+# journal scan each); more than that replays the whole store into the cache once
+LAZY_READ_LIMIT = 8
+
+# Delivery states of a notification outbox item: waiting (possibly to be
+# retried), delivered, or given up on after too many attempts
+OUTBOX_STATUSES = ('pending', 'sent', 'failed')
+
+# Low balance alert threshold of accounts whose preferences do not set one
+DEFAULT_ALERT_THRESHOLD = to_cents(100)
+
+# Account fields notifications are decided on: who to write to and whether to
+CONTACT_FIELDS = ('name', 'email', 'preferences')
+
+# Seconds a cached contact is served before being read again. Saves made
+# through the same store drop their accounts at once; this only bounds how
+# long a change saved by another process (the other app) can go unseen
+CONTACT_CACHE_TTL = 30
+
+# Snapshot key recording the last journal segment folded into it
+CHECKPOINT_KEY = '__checkpoint__'
+
+# Checkpoint 'money' unit of snapshots written since balances moved to int cents;
+# older snapshots (no marker) hold dollar floats until convert_to_cents() runs
+MONEY_UNIT = 'cents'
+
+# Suffix of the copies convert_to_cents() keeps of the dollar data it rewrites
+DOLLAR_BACKUP_SUFFIX = '.dollars.bak'
+
+# Top-level key line in an indent=2 snapshot: exactly two spaces, then the key
+_TOP_LEVEL_KEY = re.compile(rb'  ("(?:[^"\\\n]|\\.)*"): ')
+
+# JSON tokens that matter when scanning other layouts for top-level keys:
+# complete strings (so braces inside them are skipped) and structural brackets
+_SCAN_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+
+# ========== LOCKING ==========
+@contextmanager
+def _file_lock(lock_path, thread_lock):
+    """Hold a thread lock plus an exclusive lock file (when fcntl is available)"""
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class AccountLocks:
+    """Per-account locks shared by this process's threads and, through
+    byte-range locks on `lock_path`, by other processes (when fcntl is available)
+
+    Accounts hash onto ACCOUNT_LOCK_STRIPES locks. hold() takes the locks of
+    several accounts in sorted order, so two sessions transferring between
+    the same pair in opposite directions cannot deadlock, and sessions working
+    on other accounts (almost) never wait.
+
+    The byte locks are open-file-description locks where the kernel has them
+    (Linux): they belong to the lock file rather than the process, so the
+    kernel's deadlock check does not mistake two threads for one owner.
+    Elsewhere POSIX record locks are used and a false EDEADLK is retried.
+    A byte lock that still cannot be taken raises LockFailed.
+    """
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._locks = [threading.Lock() for _ in range(ACCOUNT_LOCK_STRIPES)]
+        self._lock_file = None
+        self._guard = threading.Lock()
+
+    def _file(self):
+        """Return the shared lock file, opening it on first use"""
+        with self._guard:
+            if self._lock_file is None:
+                self._lock_file = open(self.lock_path, 'a')
+            return self._lock_file
+
+    @staticmethod
+    def _lock_byte(lock_file, stripe):
+        """Take the byte lock of one stripe, waiting for other processes"""
+        if hasattr(fcntl, 'F_OFD_SETLKW'):
+            fcntl.fcntl(lock_file, fcntl.F_OFD_SETLKW, struct.pack('hhqqi', fcntl.F_WRLCK, os.SEEK_SET, stripe, 1, 0))
+            return
+        for attempt in range(1, ACCOUNT_LOCK_RETRIES + 1):
+            try:
+                fcntl.lockf(lock_file, fcntl.LOCK_EX, 1, stripe)
+                return
+            except OSError as e:
+                if e.errno != errno.EDEADLK or attempt == ACCOUNT_LOCK_RETRIES:
+                    raise
+                time.sleep(random.uniform(0, ACCOUNT_LOCK_RETRY_DELAY * attempt))
+
+    @staticmethod
+    def _unlock_byte(lock_file, stripe):
+        """Release the byte lock of one stripe"""
+        if hasattr(fcntl, 'F_OFD_SETLK'):
+            fcntl.fcntl(lock_file, fcntl.F_OFD_SETLK, struct.pack('hhqqi', fcntl.F_UNLCK, os.SEEK_SET, stripe, 1, 0))
+        else:
+            fcntl.lockf(lock_file, fcntl.LOCK_UN, 1, stripe)
+
+    @contextmanager
+    def hold(self, account_numbers):
+        """Hold the locks of every given account (acquired in sorted order)"""
+        stripes = sorted({zlib.crc32(str(account_number).encode()) % ACCOUNT_LOCK_STRIPES
+                          for account_number in account_numbers})
+        lock_file = self._file() if fcntl is not None else None
+        held = []
+        try:
+            for stripe in stripes:
+                # The thread lock comes first, so threads sharing the lock
+                # file never contend for the same byte
+                self._locks[stripe].acquire()
+                if lock_file is not None:
+                    try:
+                        self._lock_byte(lock_file, stripe)
+                    except OSError as e:
+                        self._locks[stripe].release()
+                        raise LockFailed(f"Could not lock the account (please try again): {e.strerror or e}")
+                held.append(stripe)
+            yield
+        finally:
+            for stripe in reversed(held):
+                if lock_file is not None:
+                    self._unlock_byte(lock_file, stripe)
+                self._locks[stripe].release()
+
+def _read_journal(path):
+    """Yield records from a journal file, stopping at a torn trailing write"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            try:
+                yield json.loads(line)
+            except ValueError:
+                break
+
+def _now():
+    """Timestamp in the format used throughout the bank data"""
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _outbox_items(events):
+    """Wrap notification events as outbox items; the random key is what deliveries are deduped on"""
+    created = _now()
+    return [{'key': uuid.uuid4().hex, 'event': event, 'created': created} for event in events]
+
+def _merge_outbox_line(items, line):
+    """Fold one outbox item or status line into {key: merged item}; returns the item"""
+    item = items.setdefault(line['key'], {'key': line['key'], 'status': 'pending', 'attempts': 0,
+                                          'next_attempt': 0, 'error': None})
+    if 'event' in line and 'status' not in line:
+        # A re-folded copy of the item must not reset its delivery state
+        item.setdefault('event', line['event'])
+        item.setdefault('created', line['created'])
+    else:
+        item.update(line)
+    return item
+
+class _AppendedLines:
+    """Reads the JSON lines appended to a file since the last call
+
+    Remembers the file's inode, its first line and how far it was read. A
+    new inode, a different first line (a rewritten file can get a freed
+    inode back, so rewriters start it with a unique line), a shorter file or
+    a new `generation` starts over from the top. As in _read_journal,
+    reading stops at a torn trailing write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._stamp = None  # (inode, first line, generation) of the file read so far
+        self._offset = 0
+
+    def read(self, needle=None, generation=None):
+        """Return (restarted, [parsed new lines]); with `needle`, only lines containing it are parsed"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            restarted = self._stamp is not None
+            self._stamp, self._offset = None, 0
+            return restarted, []
+        with f:
+            stat = os.fstat(f.fileno())
+            head = f.readline()
+            if not head.endswith(b'\n'):
+                head = b''
+            stamp = (stat.st_ino, head, generation)
+            restarted = stamp != self._stamp or stat.st_size < self._offset
+            if restarted:
+                self._stamp, self._offset = stamp if head else None, 0
+            lines = []
+            f.seek(self._offset)
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break
+                if needle is None or needle in raw:
+                    try:
+                        lines.append(json.loads(raw))
+                    except ValueError:
+                        break
+                self._offset += len(raw)
+        return restarted, lines
+
+# ========== ERRORS ==========
+class TransactionError(Exception):
+    """A transaction that cannot be applied; `code` names the reason for callers"""
+    code = 'rejected'
+
+class AccountNotFound(TransactionError):
+    """A transaction names an account that does not exist"""
+    code = 'account_not_found'
+
+class InsufficientFunds(TransactionError):
+    """An outflow would take a balance below zero"""
+    code = 'insufficient_funds'
+
+class VersionConflict(TransactionError):
+    """An account changed between reading it and committing (compare-and-swap failed)"""
+    code = 'conflict'
+
+class LockFailed(TransactionError):
+    """An account lock could not be taken (the lock file failed or kept reporting a deadlock)"""
+    code = 'lock_failed'
+
+class UnconvertedStore(RuntimeError):
+    """The store still holds dollar floats; `python bank_store.py convert-cents` has to run first"""
+
+# ========== GROUP COMMIT ==========
+class GroupCommitWriter:
+    """Background writer that batches commits from every session into one durable write
+
+    Callers block in submit() until their item is on disk. The writer thread
+    takes the first queued item, gathers whatever else arrives within
+    `window` seconds, hands the whole batch to `write_batch` (one write +
+    one fsync) and then releases all the waiting callers together.
+
+    `write_batch(items)` may return a list with one exception (or None) per
+    item to fail callers individually; raising fails the whole batch.
+    """
+
+    def __init__(self, write_batch, window=0.005, max_batch=1000, name='bank-writer'):
+        self.write_batch = write_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.name = name
+        self.batches = 0
+        self.commits = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, item):
+        """Queue one item and block until it has been durably written"""
+        self._ensure_started()
+        request = {'item': item, 'done': threading.Event(), 'error': None}
+        self._queue.put(request)
+        request['done'].wait()
+        if request['error'] is not None:
+            raise request['error']
+
+    def _gather(self):
+        """Wait for one request, then collect any others arriving within the window"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Writer thread main loop"""
+        while True:
+            batch = self._gather()
+            try:
+                errors = self.write_batch([request['item'] for request in batch])
+            except Exception as e:
+                errors = [e] * len(batch)
+            self.batches += 1
+            self.commits += len(batch)
+            for request, error in zip(batch, errors or [None] * len(batch)):
+                request['error'] = error
+                request['done'].set()
+
+    def _ensure_started(self):
+        """Start the writer thread once"""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+# ========== SECONDARY INDEXES ==========
+def _phone_key(account_number, account):
+    """Phone index key: the account's phone number in E.164 form"""
+    return normalize_phone(account.get('phone'), account.get('country'))
+
+def _search_keys(account_number, account):
+    """Search index keys: the account number, the holder's full name and each word of it (lowercased)"""
+    name = ' '.join(str(account.get('name') or '').lower().split())
+    keys = {account_number.lower(), name} | set(name.split())
+    keys.discard('')
+    return sorted(keys)
+
+# Indexes kept by every backend: name -> function(account number, record)
+# returning a key, a list of keys, or None when the account is not indexed
+STORE_INDEXES = {
+    'phone': _phone_key,
+    'search': _search_keys
+}
+
+def _index_keys(name, account_number, account):
+    """The keys an account has in one index, as a list"""
+    if account is None:
+        return []
+    keys = STORE_INDEXES[name](account_number, account)
+    if keys is None:
+        return []
+    return list(keys) if isinstance(keys, (list, tuple)) else [keys]
+
+class AccountIndexes:
+    """In-memory secondary indexes mapping each key to its account numbers
+
+    Every index also keeps its keys in sorted order, so prefix searches
+    are a bisect plus a short forward scan. The LowBalanceIndex of the same
+    accounts rides along (`low_balance`).
+    """
+
+    def __init__(self, keys=None, low_balance=None):
+        self.low_balance = LowBalanceIndex(low_balance)
+        self.keys = {name: {} for name in STORE_INDEXES}     # name -> {account number: [keys]}
+        self.lookup = {name: {} for name in STORE_INDEXES}   # name -> {key: {account numbers}}
+        self.sorted_keys = {name: [] for name in STORE_INDEXES}
+        for name, account_keys in (keys or {}).items():
+            if name in self.keys:
+                for account_number, account_key_list in account_keys.items():
+                    for key in account_key_list:
+                        self.lookup[name].setdefault(key, set()).add(account_number)
+                    self.keys[name][account_number] = list(account_key_list)
+        for name in self.lookup:
+            self.sorted_keys[name] = sorted(self.lookup[name])
+
+    @classmethod
+    def build(cls, accounts):
+        """Index every account of an accounts map"""
+        keys = {name: {} for name in STORE_INDEXES}
+        for account_number, account in accounts.items():
+            for name in STORE_INDEXES:
+                account_keys = _index_keys(name, account_number, account)
+                if account_keys:
+                    keys[name][account_number] = account_keys
+        indexes = cls(keys)
+        indexes.low_balance = LowBalanceIndex.build(accounts)
+        return indexes
+
+    def _add(self, name, account_number, key):
+        matches = self.lookup[name].get(key)
+        if matches is None:
+            matches = self.lookup[name][key] = set()
+            bisect.insort(self.sorted_keys[name], key)
+        matches.add(account_number)
+
+    def _remove(self, name, account_number, key):
+        matches = self.lookup[name].get(key)
+        if matches is None:
+            return
+        matches.discard(account_number)
+        if not matches:
+            del self.lookup[name][key]
+            sorted_keys = self.sorted_keys[name]
+            del sorted_keys[bisect.bisect_left(sorted_keys, key)]
+
+    def set(self, account_number, account):
+        """Re-index one account (None removes it)"""
+        for name in STORE_INDEXES:
+            old_keys = self.keys[name].pop(account_number, [])
+            new_keys = _index_keys(name, account_number, account)
+            for key in old_keys:
+                if key not in new_keys:
+                    self._remove(name, account_number, key)
+            for key in new_keys:
+                self._add(name, account_number, key)
+            if new_keys:
+                self.keys[name][account_number] = new_keys
+
+    def apply(self, record):
+        """Update the indexes for one journal record"""
+        self.low_balance.apply(record)
+        op = record.get('op')
+        if op == 'put':
+            self.set(record['account'], record['data'])
+        elif op == 'delta':
+            for account_number, account in record['put'].items():
+                self.set(account_number, account)
+            for account_number in record['delete']:
+                self.set(account_number, None)
+
+    def find(self, name, key):
+        """Account numbers whose `name` index has exactly `key`"""
+        return sorted(self.lookup[name].get(key, ()))
+
+    def search(self, name, prefix, limit):
+        """Up to `limit` account numbers with a `name` index key starting with `prefix`"""
+        sorted_keys = self.sorted_keys[name]
+        found = []
+        for position in range(bisect.bisect_left(sorted_keys, prefix), len(sorted_keys)):
+            key = sorted_keys[position]
+            if not key.startswith(prefix):
+                break
+            matches = self.lookup[name][key] - set(found)
+            found.extend(heapq.nsmallest(limit - len(found), matches))
+            if len(found) >= limit:
+                break
+        return found
+
+def _alert_threshold(account):
+    """An account's low balance alert threshold in cents, or None when its alerts are off"""
+    preferences = account.get('preferences') or {}
+    if not preferences.get('low_balance_alert', True):
+        return None
+    threshold = preferences.get('alert_threshold')
+    return int(threshold) if threshold is not None else DEFAULT_ALERT_THRESHOLD
+
+class LowBalanceIndex:
+    """Accounts with low balance alerts on, ordered by balance minus alert threshold
+
+    Every account's balance and threshold (None when alerts are off) are
+    kept in memory; the alerting ones are also held as a sorted list of
+    (balance - threshold, account number), so the accounts under their
+    threshold are a prefix of it and listing them costs O(k). The sum of
+    all balances and the number of funded accounts are kept alongside for
+    totals().
+    """
+
+    def __init__(self, state=None):
+        self.state = {}    # account number -> [balance, threshold or None]
+        self.ordered = []  # sorted (margin, account number) of alerting accounts
+        self.balance = 0   # sum of every balance
+        self.funded = 0    # accounts with a balance above zero
+        for account_number, (balance, threshold) in (state or {}).items():
+            self.state[account_number] = [balance, threshold]
+            self.balance += balance
+            self.funded += balance > 0
+            if threshold is not None:
+                self.ordered.append((balance - threshold, account_number))
+        self.ordered.sort()
+
+    @classmethod
+    def build(cls, accounts):
+        """Index every account of an accounts map"""
+        return cls({account_number: (account.get('balance', 0), _alert_threshold(account))
+                    for account_number, account in accounts.items()})
+
+    def _move(self, account_number, balance, threshold):
+        """Replace an account's entry, keeping the ordered list in step"""
+        previous = self.state.get(account_number)
+        if previous is not None:
+            self.balance -= previous[0]
+            self.funded -= previous[0] > 0
+            if previous[1] is not None:
+                margin = (previous[0] - previous[1], account_number)
+                del self.ordered[bisect.bisect_left(self.ordered, margin)]
+        if balance is None:
+            self.state.pop(account_number, None)
+            return
+        self.state[account_number] = [balance, threshold]
+        self.balance += balance
+        self.funded += balance > 0
+        if threshold is not None:
+            bisect.insort(self.ordered, (balance - threshold, account_number))
+
+    def set(self, account_number, account):
+        """Re-index one saved account record (None removes it)
+
+        As in the store, a save never changes the balance of an existing
+        account; only transactions do.
+        """
+        if account is None:
+            self._move(account_number, None, None)
+            return
+        previous = self.state.get(account_number)
+        balance = previous[0] if previous is not None else account.get('balance', 0)
+        self._move(account_number, balance, _alert_threshold(account))
+
+    def apply(self, record):
+        """Update the index for one journal record"""
+        op = record.get('op')
+        if op == 'put':
+            self.set(record['account'], record['data'])
+        elif op == 'delta':
+            for account_number, account in record['put'].items():
+                self.set(account_number, account)
+            for account_number in record['delete']:
+                self.set(account_number, None)
+        elif op == 'txn':
+            for entry in record['entries']:
+                current = self.state.get(entry['account'])
+                if current is not None and entry.get('balance') is not None:
+                    self._move(entry['account'], entry['balance'], current[1])
+
+    def threshold(self, account_number):
+        """An account's alert threshold, or None (alerts off or no such account)"""
+        current = self.state.get(account_number)
+        return current[1] if current is not None else None
+
+    def below(self, limit=None):
+        """[(account number, balance, threshold)] under their threshold, furthest below first"""
+        end = bisect.bisect_left(self.ordered, (0, ''))
+        if limit is not None:
+            end = min(end, limit)
+        return [(account_number, *self.state[account_number]) for _, account_number in self.ordered[:end]]
+
+    def totals(self):
+        """bank_totals() result: {'accounts', 'balance', 'funded'}"""
+        return {'accounts': len(self.state), 'balance': self.balance, 'funded': self.funded}
+
+def _low_balance_rows(rows):
+    """low_balance_accounts() result rows from (account number, balance, threshold) tuples"""
+    return [{'account': account_number, 'balance': balance, 'threshold': threshold}
+            for account_number, balance, threshold in rows]
+
+# ========== NOTIFICATION CONTACTS ==========
+class ContactCache:
+    """In-memory CONTACT_FIELDS of each account, read from the store once
+
+    get() is a dict lookup for a cached account. The store calls forget()
+    for every account it saves, and entries older than `ttl` seconds are
+    read again.
+    """
+
+    def __init__(self, store, ttl=CONTACT_CACHE_TTL):
+        self.store = store
+        self.ttl = ttl
+        self._entries = {}  # account number -> (read at, contact or None)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, account_number):
+        """An account's contact fields (a shared dict: do not modify), or None if it does not exist"""
+        entry = self._entries.get(account_number)
+        now = time.monotonic()
+        if entry is not None and now - entry[0] < self.ttl:
+            return entry[1]
+        generation = self._generation
+        contact = self.store.get_account(account_number, fields=CONTACT_FIELDS)
+        with self._lock:
+            # A save that landed during the read may have been missed: don't keep it
+            if generation == self._generation:
+                self._entries[account_number] = (now, contact)
+        return contact
+
+    def forget(self, account_numbers=None):
+        """Drop the given accounts (None: every account)"""
+        with self._lock:
+            self._generation += 1
+            if account_numbers is None:
+                self._entries.clear()
+            else:
+                for account_number in account_numbers:
+                    self._entries.pop(account_number, None)
+
+# ========== STORE INTERFACE ==========
+class AccountStore:
+    """Interface shared by every storage backend"""
+
+    # Read cache counters (see cache_stats)
+    cache_hits = 0
+    cache_misses = 0
+    cache_refreshes = 0
+
+    _contacts = None  # ContactCache, created on first use
+
+    def load_accounts(self):
+        """Return every account as a dict keyed by account number (bulk tools only)
+
+        The records are shared with the store's read cache: do not modify
+        them. Write through save_account/save_changes instead.
+        """
+        raise NotImplementedError
+
+    def replace_accounts(self, accounts):
+        """Replace the whole bank with the given accounts (bulk operations only)"""
+        raise NotImplementedError
+
+    def save_changes(self, changed, deleted, outbox=()):
+        """Atomically write changed account records and remove deleted ones
+
+        `outbox` lists notification events committed along with the change
+        (see outbox_due).
+        """
+        raise NotImplementedError
+
+    def get_account(self, account_number, fields=None):
+        """Return one account record, or None if it does not exist
+
+        If `fields` is given, only those keys of the record are returned.
+        """
+        raise NotImplementedError
+
+    def get_accounts(self, account_numbers, fields=None):
+        """Return {account number: record or None} for several accounts at once"""
+        return {account_number: self.get_account(account_number, fields) for account_number in account_numbers}
+
+    def get_contact(self, account_number):
+        """An account's CONTACT_FIELDS for notifications (None if it does not exist), cached in memory"""
+        if self._contacts is None:
+            self._contacts = ContactCache(self)
+        return self._contacts.get(account_number)
+
+    def _forget_contacts(self, account_numbers=None):
+        """Drop cached contacts of accounts just saved (None: every account)"""
+        if self._contacts is not None:
+            self._contacts.forget(account_numbers)
+
+    def get_history(self, account_number):
+        """Return one account's transaction history, oldest first"""
+        raise NotImplementedError
+
+    def get_histories_since(self, since, account_numbers):
+        """Return {account number: its transactions dated `since` or later, oldest first}
+
+        `since` is a date string ('2026-10-01' or a full timestamp), compared
+        with the stored 'YYYY-MM-DD HH:MM:SS' dates.
+        """
+        return {account_number: [t for t in self.get_history(account_number) if t['date'] >= since]
+                for account_number in account_numbers}
+
+    def find_accounts(self, index, key):
+        """Return the account numbers whose `index` key (see STORE_INDEXES) equals `key`"""
+        raise NotImplementedError
+
+    def search_accounts(self, index, prefix, limit=10):
+        """Return up to `limit` account numbers with an `index` key starting with `prefix`
+
+        Results are ordered by key, so the cost depends on `limit`, not on
+        the number of accounts.
+        """
+        raise NotImplementedError
+
+    def count_accounts(self):
+        """Number of accounts in the store"""
+        raise NotImplementedError
+
+    def alert_threshold(self, account_number):
+        """An account's low balance alert threshold in cents, or None if its alerts are off or it does not exist"""
+        account = self.get_account(account_number, fields=('preferences',))
+        return _alert_threshold(account) if account is not None else None
+
+    def low_balance_accounts(self, limit=None):
+        """Accounts with alerts on whose balance is under their alert threshold, furthest below first
+
+        Returns [{'account', 'balance', 'threshold'}]; backends answer it
+        from an index ordered by balance minus threshold.
+        """
+        return _low_balance_rows(LowBalanceIndex.build(self.load_accounts()).below(limit))
+
+    def bank_totals(self):
+        """Bank-wide figures: {'accounts': count, 'balance': sum of balances, 'funded': accounts above zero}
+
+        Backends answer it from an index or an aggregate query rather than
+        by loading every account.
+        """
+        return LowBalanceIndex.build(self.load_accounts()).totals()
+
+    def account_exists(self, account_number):
+        """Whether an account number is in use, answered without loading any accounts"""
+        raise NotImplementedError
+
+    def get_stats(self, account_number):
+        """Return an account's running aggregates plus its transaction 'count', or None
+
+        Served from the counters kept on the account record; accounts saved
+        before the aggregates existed fall back to reading their history
+        (run rebuild_stats() once to fix them).
+        """
+        account = self.get_account(account_number, fields=STORE_COUNTERS)
+        if account is None:
+            return None
+        if 'stats' not in account:
+            history = self.get_history(account_number)
+            return dict(history_stats(history), count=len(history))
+        return dict(account['stats'], count=account.get('transaction_count', 0))
+
+    def rebuild_stats(self):
+        """Recompute every account's counters from its history; returns the number of accounts"""
+        raise NotImplementedError
+
+    def get_history_page(self, account_number, cursor=None, limit=20):
+        """Return one page of an account's history, newest first
+
+        Returns {'transactions': [...], 'next_cursor': ..., 'total': ...}.
+        Pass next_cursor back to fetch the following (older) page; it is None
+        on the last page. Cursors are opaque and stay valid while new
+        transactions are added.
+        """
+        return _history_page(self.get_history(account_number), cursor, limit)
+
+    def save_account(self, account_number, account, outbox=()):
+        """Create or update a single account record (plus any outbox notification events)"""
+        raise NotImplementedError
+
+    def commit_transactions(self, entries, outbox=()):
+        """Atomically record one or more transaction entries
+
+        Each entry is a dict with 'account', 'type', 'amount' (int cents),
+        'description' and optionally 'balance' (the account's new balance in
+        cents after this entry), 'counterparty' (the other account of a
+        transfer, which feeds the payee directory) and 'version' (the account
+        version the balance was computed from). If any entry's version is
+        stale, nothing is committed and VersionConflict is raised. `outbox`
+        lists notification events that are committed with the entries or
+        not at all.
+        """
+        raise NotImplementedError
+
+    def apply_transactions(self, entries, events=None):
+        """Post entries as balance changes; returns {account: new balance}
+
+        The accounts touched are locked (in sorted order) for the duration,
+        their balances and versions read, and the entries committed with a
+        compare-and-swap on those versions. Unrelated accounts proceed in
+        parallel; only a conflicting commit from another process makes this
+        re-read and retry. Raises AccountNotFound or InsufficientFunds (both
+        TransactionErrors) when the entries cannot be applied. If given,
+        `events(balances)` returns the notification events to commit into
+        the outbox with the entries.
+        """
+        account_numbers = sorted({entry['account'] for entry in entries})
+        with self.account_locks.hold(account_numbers):
+            for attempt in range(COMMIT_RETRIES):
+                if attempt:
+                    time.sleep(random.uniform(0, COMMIT_RETRY_DELAY * attempt))
+                current = {}
+                for account_number in account_numbers:
+                    account = self.get_account(account_number, fields=('balance', VERSION_FIELD))
+                    if account is None:
+                        raise AccountNotFound(f"Account {account_number} not found")
+                    current[account_number] = account
+                balances = {acc: account['balance'] for acc, account in current.items()}
+                posted = []
+                for entry in entries:
+                    account_number = entry['account']
+                    if entry['type'] in OUTFLOW_TYPES:
+                        balances[account_number] -= entry['amount']
+                        if balances[account_number] < 0:
+                            raise InsufficientFunds(f"Insufficient funds in account {account_number}")
+                    else:
+                        balances[account_number] += entry['amount']
+                    posted.append(dict(entry, balance=balances[account_number],
+                                       version=current[account_number].get(VERSION_FIELD, 0)))
+                try:
+                    self.commit_transactions(posted, events(balances) if events is not None else ())
+                    return balances
+                except VersionConflict:
+                    continue
+        raise VersionConflict(f"Accounts {', '.join(account_numbers)} kept changing; giving up")
+
+    def outbox_due(self, now=None, limit=100, account=None):
+        """Pending outbox items whose next attempt is due, oldest first
+
+        Items are {'key', 'event', 'attempts', 'created'}; `now` is a
+        time.time() value (defaults to the current time). `limit=None`
+        returns every due item; `account` keeps only that account's events.
+        """
+        raise NotImplementedError
+
+    def outbox_record(self, key, status, attempts, next_attempt=0, error=None):
+        """Record a delivery attempt: the item's status (see OUTBOX_STATUSES), attempts so far and retry time"""
+        raise NotImplementedError
+
+    def outbox_counts(self):
+        """Number of outbox items in each status"""
+        raise NotImplementedError
+
+    def outbox_compact(self, sent_before):
+        """Forget delivered items last updated before the `sent_before` timestamp; returns how many"""
+        raise NotImplementedError
+
+    def holds_dollars(self):
+        """Whether the store still holds data written with dollar floats (see convert_to_cents)"""
+        raise NotImplementedError
+
+    def convert_to_cents(self):
+        """One-time conversion of data written with dollar floats to int cents
+
+        The dollar data is copied next to the store (DOLLAR_BACKUP_SUFFIX)
+        before it is rewritten. Returns the number of accounts converted (0
+        when the store already holds cents). Run while the bank is quiet.
+        """
+        raise NotImplementedError
+
+    def cache_stats(self):
+        """Report how often load_accounts() was served from memory
+
+        hits: nothing changed, no parsing at all
+        refreshes: only newly appended journal records were parsed
+        misses: the store was read from scratch
+        """
+        total = self.cache_hits + self.cache_misses + self.cache_refreshes
+        return {
+            'hits': self.cache_hits,
+            'refreshes': self.cache_refreshes,
+            'misses': self.cache_misses,
+            'hit_rate': (self.cache_hits + self.cache_refreshes) / total if total else 0.0
+        }
+
+    def close(self):
+        """Release any resources held by the store"""
+
+# ========== TRANSACTION HISTORY ==========
+def _history_entry(entry):
+    """Keep just the fields stored for one history row"""
+    return {
+        'type': entry.get('type', ''),
+        'amount': entry.get('amount', 0),
+        'date': entry.get('date', ''),
+        'description': entry.get('description', '')
+    }
+
+def empty_stats():
+    """Running aggregates of an account with no transactions"""
+    return {'inflow': 0, 'outflow': 0, 'last_activity': None, 'by_type': {}, 'recent_payees': []}
+
+def _counterparty(entry):
+    """Account a TRANSFER_OUT went to (older entries only name it in the description)"""
+    if entry.get('counterparty'):
+        return entry['counterparty']
+    match = _TRANSFER_OUT_DESCRIPTION.match(entry.get('description') or '')
+    return match.group(1) if match else None
+
+def add_to_stats(stats, entry):
+    """Fold one transaction into an account's running aggregates (in place)"""
+    amount = entry.get('amount', 0)
+    trans_type = entry.get('type', '')
+    if trans_type in INFLOW_TYPES:
+        stats['inflow'] += amount
+    elif trans_type in OUTFLOW_TYPES:
+        stats['outflow'] += amount
+    stats['by_type'][trans_type] = stats['by_type'].get(trans_type, 0) + amount
+    date = entry.get('date')
+    if date and (stats['last_activity'] is None or date > stats['last_activity']):
+        stats['last_activity'] = date
+    if trans_type == 'TRANSFER_OUT':
+        payee = _counterparty(entry)
+        if payee:
+            recent = [acc for acc in stats.get('recent_payees', []) if acc != payee]
+            stats['recent_payees'] = ([payee] + recent)[:RECENT_PAYEES]
+    return stats
+
+def history_stats(transactions):
+    """Compute an account's running aggregates from its full history"""
+    stats = empty_stats()
+    for entry in transactions:
+        add_to_stats(stats, entry)
+    return stats
+
+def _account_to_cents(account):
+    """Copy of a dollar-denominated account record with its money fields in int cents
+
+    Converts the balance, the alert threshold and any embedded transactions
+    (recomputing the aggregates from them); absent fields stay absent.
+    """
+    account = dict(account)
+    if account.get('balance') is not None:
+        account['balance'] = to_cents(account['balance'])
+    preferences = account.get('preferences')
+    if isinstance(preferences, dict) and preferences.get('alert_threshold') is not None:
+        account['preferences'] = dict(preferences, alert_threshold=to_cents(preferences['alert_threshold']))
+    if 'transactions' in account:
+        transactions = [dict(t, amount=to_cents(t.get('amount', 0))) for t in account['transactions'] or []]
+        account['transactions'] = transactions
+        account['transaction_count'] = len(transactions)
+        account['stats'] = history_stats(transactions)
+    return account
+
+def _copy_record(account, fields=None):
+    """Independent copy of a cached account record (optionally just some fields), or None"""
+    if account is None:
+        return None
+    if fields is not None:
+        account = {field: account[field] for field in fields if field in account}
+    return _copy_value(account)
+
+def _copy_value(value):
+    """Copy the nested dicts and lists of a JSON value (the leaves are immutable)"""
+    if isinstance(value, dict):
+        return {key: _copy_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    return value
+
+def _strip_history(account):
+    """Return an account record without its embedded transaction list
+
+    The record keeps a transaction_count and its running aggregates ('stats')
+    so summaries don't need the history.
+    """
+    if not isinstance(account, dict) or 'transactions' not in account:
+        return account
+    account = dict(account)
+    transactions = account.pop('transactions') or []
+    account['transaction_count'] = len(transactions)
+    account['stats'] = history_stats(transactions)
+    return account
+
+def _keep_counters(account, previous):
+    """Prepare a caller-saved record, keeping the fields the store maintains
+
+    transaction_count, stats and (for existing accounts) the balance only
+    change through transactions, so the possibly stale copies in a saved
+    record are replaced by the current ones. A record carrying
+    'transactions' resets the counters from that history. Every save bumps
+    the account's version.
+    """
+    if 'transactions' in account:
+        account = _strip_history(account)
+    else:
+        account = dict(account)
+        counters = previous if previous is not None else {'transaction_count': 0, 'stats': empty_stats()}
+        for key in STORE_COUNTERS:
+            if key in counters:
+                account[key] = counters[key]
+            else:
+                account.pop(key, None)
+    if previous is not None and 'balance' in previous:
+        account['balance'] = previous['balance']
+    account[VERSION_FIELD] = (previous or {}).get(VERSION_FIELD, 0) + 1
+    return account
+
+def _record_history(record):
+    """Yield (account number, 'append' or 'replace', entries) for one journal record
+
+    A record that carries a full account (put/delta with 'transactions')
+    replaces that account's history; a deleted account's history is replaced
+    with nothing.
+    """
+    op = record.get('op')
+    if op == 'put':
+        if 'transactions' in record['data']:
+            yield record['account'], 'replace', record['data']['transactions'] or []
+    elif op == 'delta':
+        for account_number, account in record['put'].items():
+            if 'transactions' in account:
+                yield account_number, 'replace', account['transactions'] or []
+        for account_number in record['delete']:
+            yield account_number, 'replace', []
+    elif op == 'txn':
+        for entry in record['entries']:
+            yield entry['account'], 'append', [entry]
+
+def _history_page(transactions, cursor, limit):
+    """Cut one newest-first page out of a full history list"""
+    total = len(transactions)
+    end = total if cursor is None else max(min(cursor, total), 0)
+    start = max(end - limit, 0)
+    return {
+        'transactions': transactions[start:end][::-1],
+        'next_cursor': start if start > 0 else None,
+        'total': total
+    }
+
+class HistoryFiles:
+    """Per-account transaction history kept in segmented append-only files
+
+    Layout: <root>/<generation>/<account>/<n>.jsonl. A new segment file is
+    started once the last one holds `segment_size` entries. Every line
+    records the checkpoint (journal segment id) it was folded from, so a
+    checkpoint that is retried after a crash never appends the same
+    entries twice.
+    """
+
+    def __init__(self, root, segment_size=1000):
+        self.root = root
+        self.segment_size = segment_size
+        self._line_counts = {}  # path -> (file stamp, complete lines)
+        self._line_counts_lock = threading.Lock()
+
+    def account_dir(self, generation, account_number):
+        """Directory holding one account's history files"""
+        return os.path.join(self.root, str(generation), quote(account_number, safe=''))
+
+    def segments(self, generation, account_number):
+        """List an account's history files as sorted (segment number, path) pairs"""
+        directory = self.account_dir(generation, account_number)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        segments = []
+        for name in names:
+            stem, extension = os.path.splitext(name)
+            if extension == '.jsonl' and stem.isdigit():
+                segments.append((int(stem), os.path.join(directory, name)))
+        return sorted(segments)
+
+    def _read_file(self, path):
+        """Return (complete lines parsed, byte offset after the last complete line)"""
+        rows = []
+        offset = 0
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        break
+                    offset += len(line)
+        except OSError:
+            pass
+        return rows, offset
+
+    def read(self, generation, account_number):
+        """Return (entries oldest first, last folded checkpoint) or ([], None) if no files exist"""
+        segments = self.segments(generation, account_number)
+        if not segments:
+            return [], None
+        entries = []
+        folded = 0
+        for _, path in segments:
+            for row in self._read_file(path)[0]:
+                folded = max(folded, row.pop('seg', 0))
+                entries.append(row)
+        return entries, folded
+
+    def read_since(self, generation, account_number, since):
+        """Like read(), but only the entries dated `since` or later
+
+        Segments are read newest first, stopping at the first one that
+        starts before `since`, so older history is never parsed.
+        """
+        segments = self.segments(generation, account_number)
+        if not segments:
+            return [], None
+        newest_first = []
+        folded = None
+        for _, path in reversed(segments):
+            rows = self._read_file(path)[0]
+            if folded is None:
+                folded = rows[-1].get('seg', 0) if rows else 0
+            newest_first.append([row for row in rows if row.get('date', '') >= since])
+            if rows and rows[0].get('date', '') < since:
+                break
+        entries = [row for rows in reversed(newest_first) for row in rows]
+        for row in entries:
+            row.pop('seg', None)
+        return entries, folded
+
+    def count(self, path):
+        """Number of complete entries in one history file (cached per file version)"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 0
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._line_counts_lock:
+            cached = self._line_counts.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(path, 'rb') as f:
+            lines = f.read().count(b'\n')
+        with self._line_counts_lock:
+            self._line_counts[path] = (stamp, lines)
+        return lines
+
+    def read_range(self, segments, start, end):
+        """Return entries [start, end) counted across the given segment files
+
+        Only the files overlapping the range are parsed; the others are just
+        counted (and their counts cached).
+        """
+        entries = []
+        position = 0
+        for _, path in segments:
+            if position >= end:
+                break
+            lines = self.count(path)
+            if position + lines > start:
+                rows = self._read_file(path)[0]
+                for row in rows[max(start - position, 0):end - position]:
+                    row.pop('seg', None)
+                    entries.append(row)
+            position += lines
+        return entries
+
+    def last_folded(self, generation, account_number):
+        """Checkpoint of the newest stored entry (None if the account has no files)"""
+        segments = self.segments(generation, account_number)
+        if not segments:
+            return None
+        rows = self._read_file(segments[-1][1])[0]
+        return rows[-1].get('seg', 0) if rows else 0
+
+    def _lines(self, entries, checkpoint):
+        """Serialize entries tagged with the checkpoint they came from"""
+        return ''.join(json.dumps(dict(_history_entry(e), seg=checkpoint)) + '\n' for e in entries)
+
+    def append(self, generation, account_number, entries, checkpoint):
+        """Append entries folded by `checkpoint` (skipped if already stored)"""
+        segments = self.segments(generation, account_number)
+        if not segments:
+            self.replace(generation, account_number, entries, checkpoint)
+            return
+        number, path = segments[-1]
+        rows, offset = self._read_file(path)
+        if rows and rows[-1].get('seg', 0) >= checkpoint:
+            return
+        if len(rows) >= self.segment_size:
+            number, path, offset = number + 1, os.path.join(os.path.dirname(path), f"{number + 1}.jsonl"), 0
+        # One write per account per checkpoint: a torn tail is cut off here
+        # and ignored by readers, so the append is all-or-nothing
+        with open(path, 'ab') as f:
+            f.truncate(offset)
+            f.write(self._lines(entries, checkpoint).encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def replace(self, generation, account_number, entries, checkpoint):
+        """Atomically swap an account's history for the given entries"""
+        directory = self.account_dir(generation, account_number)
+        tmp_dir = directory + '.tmp'
+        old_dir = directory + '.old'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for start in range(0, max(len(entries), 1), self.segment_size):
+            with open(os.path.join(tmp_dir, f"{start // self.segment_size}.jsonl"), 'w') as f:
+                f.write(self._lines(entries[start:start + self.segment_size], checkpoint))
+                f.flush()
+                os.fsync(f.fileno())
+        if os.path.exists(directory):
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def remove(self, generation, account_number):
+        """Delete an account's history files"""
+        shutil.rmtree(self.account_dir(generation, account_number), ignore_errors=True)
+
+    def remove_other_generations(self, generation):
+        """Delete history left over from generations replaced by a full rewrite"""
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            if name != str(generation):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+# ========== JSON BACKEND ==========
+class JsonAccountStore(AccountStore):
+    """JSON snapshot plus append-only journal with background checkpointing"""
+
+    def __init__(self, json_path, journal_path, checkpoint_records=1000, checkpoint_interval=60,
+                 group_commit_window=0.005, fsync=True, history_path='bank_history', history_segment_size=1000,
+                 index_path='bank_accounts.index.json', outbox_path='bank_outbox.jsonl'):
+        self.json_path = json_path
+        self.journal_path = journal_path
+        self.index_path = index_path
+        self.outbox_path = outbox_path
+        self.history = HistoryFiles(history_path, history_segment_size)
+        self.checkpoint_records = checkpoint_records
+        self.checkpoint_interval = checkpoint_interval
+        self.fsync = fsync
+        self._writer = GroupCommitWriter(self._write_records, group_commit_window, name='bank-journal-writer')
+        self.account_locks = AccountLocks(journal_path + '.accounts.lock')
+        self._cache = None  # Parsed accounts plus the file stamps they were built from
+        self._cache_lock = threading.Lock()
+        self._offset_index = None  # (snapshot stamp, {account: (start, end)}, checkpoint metadata)
+        self._offset_index_lock = threading.Lock()
+        self._indexes = None  # Secondary indexes plus the file stamps they were built from
+        self._indexes_lock = threading.Lock()
+        self.version = 0    # Bumped on every local group commit
+        self._journal_thread_lock = threading.Lock()
+        self._checkpoint_thread_lock = threading.Lock()
+        self._outbox_thread_lock = threading.Lock()
+        # Outbox state cache (see _outbox_state): merged outbox file lines, the
+        # keys still pending among them, and the items of unfolded journal files
+        self._outbox_file = _AppendedLines(outbox_path)
+        self._outbox_items = {}
+        self._outbox_pending = set()
+        self._outbox_segments = {}  # sealed segment id -> outbox item lines
+        self._outbox_journal = _AppendedLines(journal_path)
+        self._outbox_journal_lines = []
+        self._outbox_cache_lock = threading.Lock()
+        self._checkpointer_start_lock = threading.Lock()
+        self._checkpointer = None
+        self._pending_records = 0
+        self._checkpoint_wakeup = threading.Event()
+
+    # ----- Locks -----
+    def _journal_lock(self):
+        """Lock guarding journal appends and rotation"""
+        return _file_lock(self.journal_path + '.lock', self._journal_thread_lock)
+
+    def _checkpoint_lock(self):
+        """Lock guarding snapshot rewrites"""
+        return _file_lock(self.json_path + '.lock', self._checkpoint_thread_lock)
+
+    def _outbox_lock(self):
+        """Lock guarding outbox file appends and rewrites"""
+        return _file_lock(self.outbox_path + '.lock', self._outbox_thread_lock)
+
+    # ----- Snapshot & journal files -----
+    def _read_snapshot(self):
+        """Read the snapshot file, returning (accounts, checkpoint metadata)
+
+        The metadata holds the last folded journal 'segment' and the
+        'history' generation the history files belong to. Snapshots written
+        before histories were split out still embed 'transactions' lists.
+
+        Only a missing file reads as empty. A snapshot that exists but cannot
+        be read or parsed raises (OSError/ValueError): treating it as empty
+        would let the next checkpoint replace it with just the journal's
+        accounts.
+        """
+        if not os.path.exists(self.json_path):
+            return {}, {}
+        try:
+            with open(self.json_path, 'r') as f:
+                accounts = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"Snapshot {self.json_path} is corrupt ({e}); restore it before using the store") from e
+        meta = accounts.pop(CHECKPOINT_KEY, {})
+        return accounts, meta
+
+    def _write_snapshot(self, accounts, segment, generation, money=MONEY_UNIT):
+        """Atomically replace the snapshot file (temp file + fsync + rename)"""
+        data = dict(accounts)
+        data[CHECKPOINT_KEY] = {'segment': segment, 'history': generation, 'money': money, 'written': _now()}
+        tmp_path = self.json_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.json_path)
+
+    def _snapshot_stamp(self):
+        """Identify the current snapshot file version"""
+        try:
+            stat = os.stat(self.json_path)
+            return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _sealed_segments(self):
+        """List sealed journal segments as sorted (segment id, path) pairs"""
+        directory = os.path.dirname(self.journal_path) or '.'
+        prefix = os.path.basename(self.journal_path) + '.'
+        segments = []
+        for name in os.listdir(directory):
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and suffix.isdigit():
+                segments.append((int(suffix), os.path.join(directory, name)))
+        return sorted(segments)
+
+    def _read_journal_from(self, path, offset):
+        """Read complete records appended after `offset`; returns (records, new offset)"""
+        records = []
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+                    offset += len(line)
+        except OSError:
+            pass
+        return records, offset
+
+    def _journal_stamp(self):
+        """Identify the active journal file and its current size"""
+        try:
+            stat = os.stat(self.journal_path)
+            return stat.st_ino, stat.st_size
+        except OSError:
+            return None, 0
+
+    def _segments_stamp(self):
+        """Identify the sealed segments and their sizes"""
+        stamp = []
+        for segment, path in self._sealed_segments():
+            try:
+                stamp.append((segment, os.path.getsize(path)))
+            except OSError:
+                pass
+        return stamp
+
+    def _apply_record(self, accounts, record, copy_on_write=False):
+        """Apply one journal record to an accounts dict in place
+
+        With copy_on_write the touched account records are replaced rather
+        than mutated, so maps already handed out by the cache never change.
+        Histories are not kept here: a transaction only moves the balance
+        and updates the counters (see get_history for the entries).
+        """
+        op = record.get('op')
+        if op == 'put':
+            account_number = record['account']
+            accounts[account_number] = _keep_counters(record['data'], accounts.get(account_number))
+        elif op == 'delta':
+            for account_number, account in record['put'].items():
+                accounts[account_number] = _keep_counters(account, accounts.get(account_number))
+            for account_number in record['delete']:
+                accounts.pop(account_number, None)
+        elif op == 'txn':
+            for entry in record['entries']:
+                account = accounts.get(entry['account'])
+                if account is None:
+                    continue
+                if copy_on_write:
+                    account = dict(account)
+                    accounts[entry['account']] = account
+                if entry.get('balance') is not None:
+                    account['balance'] = entry['balance']
+                account[VERSION_FIELD] = account.get(VERSION_FIELD, 0) + 1
+                account['transaction_count'] = account.get('transaction_count', 0) + 1
+                if 'stats' in account:  # Accounts not yet rebuilt have no aggregates to update
+                    stats = account['stats']
+                    account['stats'] = add_to_stats(dict(stats, by_type=dict(stats['by_type'])), entry)
+        elif op == 'counters':
+            for account_number, counters in record['accounts'].items():
+                if account_number in accounts:
+                    accounts[account_number] = dict(accounts[account_number], **counters)
+
+    def _append_record(self, record):
+        """Append a single record to the journal, returning once it is durable"""
+        self._writer.submit(record)
+        self._ensure_checkpointer()
+        if self._pending_records >= self.checkpoint_records:
+            self._checkpoint_wakeup.set()
+
+    def _write_records(self, records):
+        """Group commit: append a batch of journal records with one write and one fsync
+
+        Transaction entries carrying a 'version' are checked against the
+        account's current version while the journal lock is held, so the
+        check and the append are atomic across processes. A stale record
+        fails its caller with VersionConflict; the rest of the batch is
+        written.
+        """
+        with self._journal_lock():
+            errors = self._check_versions(records)
+            lines = [json.dumps(record) + '\n' for record, error in zip(records, errors) if error is None]
+            if lines:
+                with open(self.journal_path, 'a') as f:
+                    f.write(''.join(lines))
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                self._pending_records += len(lines)
+                self.version += 1
+        return errors
+
+    def _check_versions(self, records):
+        """Compare-and-swap check of a batch; caller holds the journal lock
+
+        Returns one VersionConflict (or None) per record. Versions come from
+        the journal on disk plus the bumps of records accepted earlier in
+        this batch.
+        """
+        versions = self._current_versions(records)
+        errors = []
+        for record in records:
+            error = None
+            if record.get('op') == 'txn':
+                for entry in record['entries']:
+                    expected = entry.get(VERSION_FIELD)
+                    if expected is None:
+                        continue
+                    account_number = entry['account']
+                    if versions[account_number] != expected:
+                        error = VersionConflict(f"Account {account_number} changed since it was read")
+                        break
+            errors.append(error)
+            if error is None:
+                for account_number in self._written_accounts(record):
+                    if account_number in versions:
+                        versions[account_number] += 1
+        return errors
+
+    def _current_versions(self, records):
+        """Current versions of the accounts a batch's versioned entries name"""
+        account_numbers = {entry['account'] for record in records if record.get('op') == 'txn'
+                           for entry in record['entries'] if entry.get(VERSION_FIELD) is not None}
+        return {account_number: (account or {}).get(VERSION_FIELD, 0)
+                for account_number, account in self.get_accounts(account_numbers, (VERSION_FIELD,)).items()}
+
+    def _written_accounts(self, record):
+        """Account numbers a record bumps the version of (once per write)"""
+        op = record.get('op')
+        if op == 'put':
+            return [record['account']]
+        if op == 'delta':
+            return list(record['put'])
+        if op == 'txn':
+            return [entry['account'] for entry in record['entries']]
+        return []
+
+    # ----- AccountStore API -----
+    def load_accounts(self):
+        """Load accounts, re-parsing only what changed since the last call
+
+        The parsed state is cached together with the snapshot's inode/mtime/size,
+        the sealed segment sizes and the active journal's inode and read offset.
+        If only the journal grew, just the new records are replayed.
+        """
+        with self._cache_lock:
+            return dict(self._refresh_cache(full_load=True)['accounts'])
+
+    def _refresh_cache(self, full_load):
+        """Bring the cache up to date; caller holds the cache lock
+
+        Returns None instead of reading the whole store when the cache is
+        stale and full_load is False.
+        """
+        cache = self._cache
+        journal_inode, journal_size = self._journal_stamp()
+        if self._files_unchanged(cache, journal_inode, journal_size):
+            if journal_size == cache['journal_offset']:
+                self.cache_hits += 1
+            else:
+                records, offset = self._read_journal_from(self.journal_path, cache['journal_offset'])
+                accounts = dict(cache['accounts'])
+                for record in records:
+                    self._apply_record(accounts, record, copy_on_write=True)
+                cache = dict(cache, accounts=accounts, journal_inode=journal_inode, journal_offset=offset)
+                self._cache = cache
+                self.cache_refreshes += 1
+        elif full_load:
+            cache = self._load_from_disk()
+            self._cache = cache
+            self.cache_misses += 1
+        else:
+            return None
+        return cache
+
+    def _files_unchanged(self, state, journal_inode, journal_size):
+        """True if only the active journal may have grown since `state` was built"""
+        same_journal = state is not None and (
+            state['journal_inode'] == journal_inode
+            or (state['journal_inode'] is None and state['journal_offset'] == 0)  # Journal just created
+        )
+        return (same_journal and state['snapshot'] == self._snapshot_stamp()
+                and state['segments'] == self._segments_stamp()
+                and journal_size >= state['journal_offset'])
+
+    def _load_from_disk(self):
+        """Read the snapshot and replay every journal segment (cache miss)"""
+        while True:
+            before = self._snapshot_stamp()
+            segments = self._segments_stamp()
+            journal_inode, _ = self._journal_stamp()
+            accounts, meta = self._read_snapshot()
+            accounts = {acc: _strip_history(account) for acc, account in accounts.items()}
+            folded = meta.get('segment', 0)
+            for segment, path in self._sealed_segments():
+                if segment > folded:
+                    for record in _read_journal(path):
+                        self._apply_record(accounts, record)
+            records, offset = self._read_journal_from(self.journal_path, 0)
+            for record in records:
+                self._apply_record(accounts, record)
+            # A checkpoint that finished mid-read may have removed segments we
+            # still needed, so start again from the new snapshot
+            if self._snapshot_stamp() == before and self._journal_stamp()[0] == journal_inode:
+                return {
+                    'accounts': accounts,
+                    'snapshot': before,
+                    'segments': segments,
+                    'journal_inode': journal_inode,
+                    'journal_offset': offset
+                }
+
+    def replace_accounts(self, accounts):
+        """Replace every account with a full snapshot rewrite
+
+        Histories start a new generation: any 'transactions' in the given
+        records stay embedded in the snapshot until the next checkpoint
+        moves them into history files.
+        """
+        with self._checkpoint_lock():
+            _, meta = self._read_snapshot()
+            generation = meta.get('history', 0) + 1
+            with self._journal_lock():
+                segment = self._rotate_journal(meta.get('segment', 0))
+                self._write_snapshot(accounts, segment, generation)
+            self._write_index_file(accounts, segment)
+            self._remove_segments(segment)
+            self.history.remove_other_generations(generation)
+        self._forget_contacts()
+
+    def get_account(self, account_number, fields=None):
+        """Return one account record without loading the rest of the bank
+
+        Served from the read cache when it is current; otherwise only this
+        account's slice of the snapshot is parsed (via the offset index) and
+        the journal records mentioning it are replayed on top. The record
+        never includes the transaction history (see get_history).
+        """
+        with self._cache_lock:
+            cache = self._refresh_cache(full_load=False)
+        if cache is not None:
+            return _copy_record(cache['accounts'].get(account_number), fields)
+        account = self._read_account_lazily(account_number)
+        if account is not None and fields is not None:
+            account = {field: account[field] for field in fields if field in account}
+        return account
+
+    def get_accounts(self, account_numbers, fields=None):
+        """Return several account records, replaying the store once instead of per account
+
+        Up to LAZY_READ_LIMIT accounts on a stale cache are still read
+        lazily; a larger set brings the read cache up to date, which later
+        calls then refresh from the journal tail only.
+        """
+        account_numbers = list(account_numbers)
+        if len(account_numbers) <= LAZY_READ_LIMIT:
+            return super().get_accounts(account_numbers, fields)
+        with self._cache_lock:
+            accounts = self._refresh_cache(full_load=True)['accounts']
+        records = {}
+        for account_number in account_numbers:
+            records[account_number] = _copy_record(accounts.get(account_number), fields)
+        return records
+
+    def get_history(self, account_number):
+        """Return one account's transactions, oldest first
+
+        Reads the account's history files (or its slice of an older snapshot
+        that still embeds the history), then replays the journal records for
+        it that have not been folded yet.
+        """
+        while True:
+            before = self._snapshot_stamp()
+            journal_inode, _ = self._journal_stamp()
+            index, meta = self._get_offset_index(before)
+            entries, folded = self.history.read(meta.get('history', 0), account_number)
+            if folded is None:
+                account = self._read_snapshot_slice(index, account_number) or {}
+                entries = [_history_entry(t) for t in account.get('transactions') or []]
+            replaced, pending = self._journal_history(account_number, max(folded or 0, meta.get('segment', 0)))
+            if self._snapshot_stamp() == before and self._journal_stamp()[0] == journal_inode:
+                return pending if replaced else entries + pending
+
+    def get_histories_since(self, since, account_numbers):
+        """Recent histories of many accounts, reading the unfolded journal once for all of them
+
+        Only the newest history files of each account are parsed (see
+        HistoryFiles.read_since).
+        """
+        account_numbers = list(account_numbers)
+        wanted = set(account_numbers)
+        while True:
+            before = self._snapshot_stamp()
+            journal_inode, _ = self._journal_stamp()
+            index, meta = self._get_offset_index(before)
+            generation, base = meta.get('history', 0), meta.get('segment', 0)
+            histories = {}
+            folded = {}
+            for account_number in account_numbers:
+                entries, last = self.history.read_since(generation, account_number, since)
+                if last is None:
+                    account = self._read_snapshot_slice(index, account_number) or {}
+                    entries = [_history_entry(t) for t in account.get('transactions') or []
+                               if t.get('date', '') >= since]
+                histories[account_number] = entries
+                folded[account_number] = max(last or 0, base)
+            journals = [(segment, path) for segment, path in self._sealed_segments() if segment > base]
+            journals.append((None, self.journal_path))
+            for segment, path in journals:
+                for record in _read_journal(path):
+                    for account_number, action, changes in _record_history(record):
+                        if account_number not in wanted or (segment is not None and segment <= folded[account_number]):
+                            continue
+                        if action == 'replace':
+                            histories[account_number] = []
+                        histories[account_number].extend(entry for entry in map(_history_entry, changes)
+                                                         if entry['date'] >= since)
+            if self._snapshot_stamp() == before and self._journal_stamp()[0] == journal_inode:
+                return histories
+
+    def get_history_page(self, account_number, cursor=None, limit=20):
+        """Return one page of history, newest first (see AccountStore.get_history_page)
+
+        The cursor is the position of the oldest entry already shown. Only
+        the history files overlapping the requested page are parsed.
+        """
+        while True:
+            before = self._snapshot_stamp()
+            journal_inode, _ = self._journal_stamp()
+            _, meta = self._get_offset_index(before)
+            generation = meta.get('history', 0)
+            segments = self.history.segments(generation, account_number)
+            if not segments:
+                # No history files yet (new account or an older snapshot)
+                return _history_page(self.get_history(account_number), cursor, limit)
+            folded = self.history.last_folded(generation, account_number) or 0
+            replaced, pending = self._journal_history(account_number, max(folded, meta.get('segment', 0)))
+            if replaced:
+                segments = []
+            stored = sum(self.history.count(path) for _, path in segments)
+            total = stored + len(pending)
+            end = total if cursor is None else max(min(cursor, total), 0)
+            start = max(end - limit, 0)
+            entries = self.history.read_range(segments, start, min(end, stored))
+            entries.extend(pending[max(start - stored, 0):max(end - stored, 0)])
+            if self._snapshot_stamp() == before and self._journal_stamp()[0] == journal_inode:
+                return {
+                    'transactions': entries[::-1],
+                    'next_cursor': start if start > 0 else None,
+                    'total': total
+                }
+
+    def rebuild_stats(self):
+        """Recompute every account's counters from its history files
+
+        Run while the bank is quiet: transactions committed during the
+        rebuild may be missing from the recomputed aggregates.
+        """
+        self.checkpoint()  # Fold the journal so each history read is just its files
+        counters = {}
+        for account_number in self.load_accounts():
+            history = self.get_history(account_number)
+            counters[account_number] = {'transaction_count': len(history), 'stats': history_stats(history)}
+        if counters:
+            self._append_record({'op': 'counters', 'accounts': counters})
+        return len(counters)
+
+    def _journal_history(self, account_number, folded):
+        """Replay one account's history records from journal segments after `folded`
+
+        Returns (replaced, entries): replaced is True when a record reset the
+        account's history, in which case entries is the complete history.
+        History files may already be ahead of the snapshot while a checkpoint
+        is in progress, which is why the caller passes the newer of the two.
+        """
+        needle = json.dumps(account_number).encode()
+        replaced = False
+        entries = []
+        paths = [path for segment, path in self._sealed_segments() if segment > folded]
+        for path in paths + [self.journal_path]:
+            for record in self._scan_journal(path, needle):
+                for acc, action, changes in _record_history(record):
+                    if acc != account_number:
+                        continue
+                    if action == 'replace':
+                        replaced = True
+                        entries = []
+                    entries.extend(_history_entry(t) for t in changes)
+        return replaced, entries
+
+    # ----- Secondary indexes -----
+    def find_accounts(self, index, key):
+        """Look up account numbers by index key without loading the accounts"""
+        with self._indexes_lock:
+            return self._refresh_indexes().find(index, key)
+
+    def search_accounts(self, index, prefix, limit=10):
+        """Prefix search over an index's sorted keys"""
+        with self._indexes_lock:
+            return self._refresh_indexes().search(index, prefix, limit)
+
+    def count_accounts(self):
+        """Number of accounts, read from the search index (every account has keys there)"""
+        with self._indexes_lock:
+            return len(self._refresh_indexes().keys['search'])
+
+    def account_exists(self, account_number):
+        """Existence check against the search index, which has an entry for every account"""
+        with self._indexes_lock:
+            return account_number in self._refresh_indexes().keys['search']
+
+    def alert_threshold(self, account_number):
+        """Alert threshold from the in-memory low balance index"""
+        with self._indexes_lock:
+            return self._refresh_indexes().low_balance.threshold(account_number)
+
+    def low_balance_accounts(self, limit=None):
+        """Prefix of the low balance index's ordered margins"""
+        with self._indexes_lock:
+            return _low_balance_rows(self._refresh_indexes().low_balance.below(limit))
+
+    def bank_totals(self):
+        """Running totals kept by the low balance index, which holds every balance"""
+        with self._indexes_lock:
+            return self._refresh_indexes().low_balance.totals()
+
+    def _refresh_indexes(self):
+        """Bring the secondary indexes up to date; caller holds the indexes lock
+
+        The indexes saved at the last checkpoint are loaded once and kept
+        current by replaying only the journal records written since.
+        """
+        state = self._indexes
+        journal_inode, journal_size = self._journal_stamp()
+        if self._files_unchanged(state, journal_inode, journal_size):
+            if journal_size > state['journal_offset']:
+                records, offset = self._read_journal_from(self.journal_path, state['journal_offset'])
+                for record in records:
+                    state['indexes'].apply(record)
+                state.update(journal_inode=journal_inode, journal_offset=offset)
+        else:
+            state = self._indexes = self._load_indexes()
+        return state['indexes']
+
+    def _load_indexes(self):
+        """Load the saved index file and replay the journal on top of it
+
+        Falls back to indexing the full account map when the file is missing,
+        was written for a different snapshot or lacks one of STORE_INDEXES
+        (or the low balance index).
+        """
+        while True:
+            before = self._snapshot_stamp()
+            segments = self._segments_stamp()
+            journal_inode, _ = self._journal_stamp()
+            try:
+                with open(self.index_path, 'r') as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = {}
+            if (before is None or saved.get('snapshot') != list(before)
+                    or set(saved.get('keys', {})) != set(STORE_INDEXES) or 'low_balance' not in saved):
+                with self._cache_lock:
+                    cache = self._refresh_cache(full_load=True)
+                return dict(cache, accounts=None, indexes=AccountIndexes.build(cache['accounts']))
+            indexes = AccountIndexes(saved.get('keys'), saved.get('low_balance'))
+            for segment, path in self._sealed_segments():
+                if segment > saved.get('segment', 0):
+                    for record in _read_journal(path):
+                        indexes.apply(record)
+            records, offset = self._read_journal_from(self.journal_path, 0)
+            for record in records:
+                indexes.apply(record)
+            if self._snapshot_stamp() == before and self._journal_stamp()[0] == journal_inode:
+                return {
+                    'indexes': indexes,
+                    'snapshot': before,
+                    'segments': segments,
+                    'journal_inode': journal_inode,
+                    'journal_offset': offset
+                }
+
+    def _write_index_file(self, accounts, segment):
+        """Save the secondary indexes for the snapshot just written (temp file + rename)"""
+        indexes = AccountIndexes.build(accounts)
+        data = {
+            'snapshot': self._snapshot_stamp(),
+            'segment': segment,
+            'keys': indexes.keys,
+            'low_balance': indexes.low_balance.state
+        }
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    # ----- Lazy single-account loading -----
+    def _build_offset_index(self):
+        """Scan the snapshot once for the byte span of every top-level value
+
+        No values are built during the scan, so memory stays flat no matter
+        how many accounts the file holds. Returns ({key: (start, end)},
+        checkpoint metadata).
+        """
+        index = {}
+        if not os.path.exists(self.json_path) or os.path.getsize(self.json_path) == 0:
+            return index, {}
+        with open(self.json_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:5] == b'{\n  "':
+                    self._index_indented(data, index)
+                else:
+                    self._index_tokens(data, index)
+                meta = {}
+                if CHECKPOINT_KEY in index:
+                    start, end = index.pop(CHECKPOINT_KEY)
+                    meta = json.loads(data[start:end])
+        return index, meta
+
+    def _index_indented(self, data, index):
+        """Fast path for snapshots written with indent=2: key lines start with two spaces"""
+        previous = None
+        position = data.find(b'\n  "')
+        while position != -1:
+            match = _TOP_LEVEL_KEY.match(data, position + 1)
+            if match is not None:
+                if previous is not None:
+                    index[previous[0]] = (previous[1], self._value_end(data, previous[1], position))
+                raw_key = match.group(1)
+                key = raw_key[1:-1].decode() if b'\\' not in raw_key else json.loads(raw_key)
+                previous = (key, match.end())
+            position = data.find(b'\n  "', position + 1)
+        if previous is not None:
+            index[previous[0]] = (previous[1], self._value_end(data, previous[1], data.rfind(b'}')))
+
+    def _value_end(self, data, start, limit):
+        """Trim the separator (whitespace and comma) that follows a value"""
+        end = limit
+        while end > start and data[end - 1:end] in (b' ', b'\n', b'\r', b','):
+            end -= 1
+        return end
+
+    def _index_tokens(self, data, index):
+        """Generic path: track bracket depth over string and bracket tokens"""
+        depth = 0
+        key = None
+        start = None
+        for match in _SCAN_TOKEN.finditer(data):
+            token = match.group()
+            if token[:1] == b'"':
+                if depth == 1 and key is None:
+                    key = json.loads(token)
+            elif token in (b'{', b'['):
+                depth += 1
+                if depth == 2 and key is not None:
+                    start = match.start()
+            else:
+                depth -= 1
+                if depth == 1 and start is not None:
+                    index[key] = (start, match.end())
+                    key = start = None
+
+    def _get_offset_index(self, stamp):
+        """Return the offset index for the given snapshot version, rebuilding if needed"""
+        with self._offset_index_lock:
+            if self._offset_index is None or self._offset_index[0] != stamp:
+                index, meta = self._build_offset_index()
+                self._offset_index = (stamp, index, meta)
+            return self._offset_index[1], self._offset_index[2]
+
+    def _scan_journal(self, path, needle):
+        """Yield journal records whose raw line contains `needle` (cheap prefilter)"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                if needle in line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        break
+
+    def _read_snapshot_slice(self, index, account_number):
+        """Parse one account's record straight from its byte span in the snapshot"""
+        span = index.get(account_number)
+        if span is None:
+            return None
+        with open(self.json_path, 'rb') as f:
+            f.seek(span[0])
+            return json.loads(f.read(span[1] - span[0]))
+
+    def _read_account_lazily(self, account_number):
+        """Parse one account from its snapshot slice and replay its journal records"""
+        needle = json.dumps(account_number).encode()
+        while True:
+            before = self._snapshot_stamp()
+            index, meta = self._get_offset_index(before)
+            accounts = {}
+            account = self._read_snapshot_slice(index, account_number)
+            if account is not None:
+                accounts[account_number] = _strip_history(account)
+            paths = [path for segment, path in self._sealed_segments() if segment > meta.get('segment', 0)]
+            for path in paths + [self.journal_path]:
+                for record in self._scan_journal(path, needle):
+                    self._apply_record(accounts, record)
+            if self._snapshot_stamp() == before:
+                return accounts.get(account_number)
+
+    def save_account(self, account_number, account, outbox=()):
+        """Persist a new or updated account record as a single journal entry"""
+        self._append_record(self._with_outbox({'op': 'put', 'account': account_number, 'data': account}, outbox))
+        self._forget_contacts([account_number])
+
+    def save_changes(self, changed, deleted, outbox=()):
+        """Journal only the changed/deleted accounts as one delta record"""
+        self._append_record(self._with_outbox({'op': 'delta', 'put': changed, 'delete': list(deleted)}, outbox))
+        self._forget_contacts(list(changed) + list(deleted))
+
+    def commit_transactions(self, entries, outbox=()):
+        """Atomically journal one or more transaction entries as a single record"""
+        date = _now()
+        record = self._with_outbox({'op': 'txn', 'entries': []}, outbox)
+        for entry in entries:
+            record['entries'].append({
+                'account': entry['account'],
+                'type': entry['type'],
+                'amount': entry['amount'],
+                'description': entry.get('description', ''),
+                'balance': entry.get('balance'),
+                'counterparty': entry.get('counterparty'),
+                VERSION_FIELD: entry.get(VERSION_FIELD),
+                'date': date
+            })
+        self._append_record(record)
+
+    def holds_dollars(self):
+        """A snapshot without the cents marker (a new store has no snapshot yet)"""
+        stamp = self._snapshot_stamp()
+        if stamp is None:
+            return False
+        _, meta = self._get_offset_index(stamp)
+        return meta.get('money') != MONEY_UNIT
+
+    def convert_to_cents(self):
+        """Rewrite a snapshot (and its histories) written with dollar floats in int cents
+
+        The journal is folded first so every record is in the snapshot and
+        history files, which are then copied aside; the converted accounts
+        are written back with replace_accounts(), which starts a new history
+        generation.
+        """
+        if not self.holds_dollars():
+            return 0
+        self.checkpoint()
+        shutil.copy2(self.json_path, self.json_path + DOLLAR_BACKUP_SUFFIX)
+        if os.path.isdir(self.history.root):
+            shutil.copytree(self.history.root, self.history.root + DOLLAR_BACKUP_SUFFIX, dirs_exist_ok=True)
+        accounts, meta = self._read_snapshot()
+        generation = meta.get('history', 0)
+        converted = {}
+        for account_number, account in accounts.items():
+            history, folded = self.history.read(generation, account_number)
+            if folded is None:
+                history = account.get('transactions') or []
+            converted[account_number] = _account_to_cents(dict(account, transactions=history))
+        self.replace_accounts(converted)
+        self.checkpoint()  # Move the converted histories out of the snapshot
+        return len(converted)
+
+    # ----- Notification outbox -----
+    # Outbox items ride in the journal record of the write that caused them;
+    # checkpoints move them into the outbox file, where delivery attempts are
+    # appended as status lines. An item's state is its lines merged by key.
+    def _with_outbox(self, record, events):
+        """Attach outbox items for `events` to a journal record"""
+        if events:
+            record['outbox'] = _outbox_items(events)
+        return record
+
+    def _append_outbox(self, lines):
+        """Durably append items or status lines to the outbox file"""
+        with self._outbox_lock():
+            with open(self.outbox_path, 'a') as f:
+                f.write(''.join(json.dumps(line) + '\n' for line in lines))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+    def _outbox_state(self, pending_only=False):
+        """Outbox items with their merged delivery state, keyed by item key
+
+        Reads the outbox file, then the journal records not folded yet. A
+        checkpoint running in between can only hide an item until the next
+        call, never lose it: it is appended to the file before its journal
+        segment is removed.
+
+        The merged state is cached: each call only parses the lines appended
+        to the outbox file and the active journal since the last one, plus
+        any newly sealed segment. With `pending_only`, only pending items are
+        returned, so a poll costs what is pending rather than the whole
+        delivery history.
+        """
+        with self._outbox_cache_lock:
+            with self._outbox_lock():
+                restarted, lines = self._outbox_file.read()
+            if restarted:
+                self._outbox_items, self._outbox_pending = {}, set()
+            for line in lines:
+                if 'key' not in line:
+                    continue  # The line naming a compaction
+                item = _merge_outbox_line(self._outbox_items, line)
+                if item['status'] == 'pending':
+                    self._outbox_pending.add(item['key'])
+                else:
+                    self._outbox_pending.discard(item['key'])
+
+            _, meta = self._get_offset_index(self._snapshot_stamp())
+            sealed = {segment: path for segment, path in self._sealed_segments() if segment > meta.get('segment', 0)}
+            for segment in [segment for segment in self._outbox_segments if segment not in sealed]:
+                del self._outbox_segments[segment]  # Folded: its items are in the outbox file now
+            for segment, path in sealed.items():
+                if segment not in self._outbox_segments:
+                    self._outbox_segments[segment] = [line for record in self._scan_journal(path, b'"outbox"')
+                                                      for line in record.get('outbox', ())]
+            # Every rotation seals the journal under a new, higher segment id
+            rotation = max([meta.get('segment', 0), *sealed])
+            restarted, records = self._outbox_journal.read(b'"outbox"', rotation)
+            if restarted:
+                self._outbox_journal_lines = []
+            for record in records:
+                self._outbox_journal_lines.extend(record.get('outbox', ()))
+
+            if pending_only:
+                items = {key: dict(self._outbox_items[key]) for key in self._outbox_pending}
+            else:
+                items = {key: dict(item) for key, item in self._outbox_items.items()}
+            journal = [line for segment in sorted(self._outbox_segments) for line in self._outbox_segments[segment]]
+            for line in journal + self._outbox_journal_lines:
+                if line['key'] in self._outbox_items and line['key'] not in items:
+                    continue  # Delivered or failed already (pending_only)
+                _merge_outbox_line(items, line)
+        return items
+
+    def outbox_due(self, now=None, limit=100, account=None):
+        """Pending outbox items whose next attempt is due, oldest first"""
+        now = time.time() if now is None else now
+        due = [item for item in self._outbox_state(pending_only=True).values()
+               if item['status'] == 'pending' and item['next_attempt'] <= now and 'event' in item
+               and (account is None or item['event'].get('account') == account)]
+        due.sort(key=lambda item: item['created'])
+        return [{field: item[field] for field in ('key', 'event', 'attempts', 'created')} for item in due[:limit]]
+
+    def outbox_record(self, key, status, attempts, next_attempt=0, error=None):
+        """Append a delivery status line for an outbox item"""
+        self._append_outbox([{'key': key, 'status': status, 'attempts': attempts, 'next_attempt': next_attempt,
+                              'error': error, 'updated': _now()}])
+
+    def outbox_counts(self):
+        """Number of outbox items in each status"""
+        counts = dict.fromkeys(OUTBOX_STATUSES, 0)
+        for item in self._outbox_state().values():
+            if 'event' in item:
+                counts[item['status']] += 1
+        return counts
+
+    def outbox_compact(self, sent_before):
+        """Rewrite the outbox file with one line per item, leaving out items delivered before `sent_before`
+
+        The journal is folded first, so a dropped item cannot come back
+        from a journal record that still carried it. The new file starts
+        with a line naming the rewrite, so readers that cached the old file
+        (see _AppendedLines) always notice the change.
+        """
+        self.checkpoint()
+        with self._outbox_lock():
+            items = {}
+            for line in _read_journal(self.outbox_path):
+                if 'key' in line:
+                    items.setdefault(line['key'], {}).update(line)
+            kept = [item for item in items.values()
+                    if not (item.get('status') == 'sent' and item.get('updated', '') < sent_before)]
+            tmp_path = self.outbox_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(json.dumps({'compacted': uuid.uuid4().hex, 'at': _now()}) + '\n')
+                f.write(''.join(json.dumps(item) + '\n' for item in kept))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.outbox_path)
+        return len(items) - len(kept)
+
+    # ----- Checkpointing -----
+    def _rotate_journal(self, folded):
+        """Seal the active journal as the next segment; caller holds the journal lock"""
+        existing = [segment for segment, _ in self._sealed_segments()]
+        segment = max(existing + [folded]) + 1
+        if os.path.exists(self.journal_path):
+            os.replace(self.journal_path, f"{self.journal_path}.{segment}")
+        return segment
+
+    def _remove_segments(self, upto):
+        """Delete sealed segments already folded into the snapshot"""
+        for segment, path in self._sealed_segments():
+            if segment <= upto:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def checkpoint(self):
+        """Fold the journal into a fresh snapshot; returns True if anything was folded
+
+        Transaction entries (and any histories still embedded in an older
+        snapshot) are written to the history files first, then the snapshot
+        is rewritten without them.
+        """
+        with self._checkpoint_lock():
+            accounts, meta = self._read_snapshot()
+            folded = meta.get('segment', 0)
+            generation = meta.get('history', 0)
+            with self._journal_lock():
+                if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > 0:
+                    self._rotate_journal(folded)
+                self._pending_records = 0
+            pending = [(segment, path) for segment, path in self._sealed_segments() if segment > folded]
+            legacy = {acc: account['transactions'] for acc, account in accounts.items()
+                      if 'transactions' in account
+                      and not self.history.segments(generation, acc)}
+            if not pending and not legacy:
+                return False
+            upto = pending[-1][0] if pending else folded
+            plan = {acc: ('replace', list(transactions or [])) for acc, transactions in legacy.items()}
+            accounts = {acc: _strip_history(account) for acc, account in accounts.items()}
+            outbox = []
+            for segment, path in pending:
+                for record in _read_journal(path):
+                    self._apply_record(accounts, record)
+                    outbox.extend(record.get('outbox', ()))
+                    for account_number, action, entries in _record_history(record):
+                        if action == 'append' and account_number in plan:
+                            plan[account_number][1].extend(entries)
+                        else:
+                            plan[account_number] = (action, list(entries))
+            self._write_history(generation, plan, accounts, upto)
+            if outbox:
+                # Before the snapshot marks these segments folded (a retry may append them twice; keys dedupe)
+                self._append_outbox(outbox)
+            # Keep the unit of what was folded: a snapshot is only marked as
+            # cents once convert_to_cents() has rewritten it
+            money = meta.get('money', 'dollars' if os.path.exists(self.json_path) else MONEY_UNIT)
+            self._write_snapshot(accounts, upto, generation, money)
+            self._write_index_file(accounts, upto)
+            self._remove_segments(upto)
+            return True
+
+    def _write_history(self, generation, plan, accounts, checkpoint):
+        """Apply a checkpoint's per-account history changes to the history files"""
+        for account_number, (action, entries) in plan.items():
+            if account_number not in accounts:
+                self.history.remove(generation, account_number)
+            elif action == 'append':
+                self.history.append(generation, account_number, entries, checkpoint)
+            else:
+                last = self.history.last_folded(generation, account_number)
+                if last is None or last < checkpoint:
+                    self.history.replace(generation, account_number, entries, checkpoint)
+
+    def _checkpoint_loop(self):
+        """Background thread: checkpoint when enough records pile up or time passes"""
+        while True:
+            self._checkpoint_wakeup.wait(self.checkpoint_interval)
+            self._checkpoint_wakeup.clear()
+            if self._pending_records == 0:
+                continue
+            try:
+                self.checkpoint()
+            except Exception as e:
+                print(f"❌ Checkpoint failed: {e}")
+                time.sleep(1)
+
+    def _ensure_checkpointer(self):
+        """Start the background checkpoint thread once per store"""
+        if self._checkpointer is None:
+            with self._checkpointer_start_lock:
+                if self._checkpointer is None:
+                    self._checkpointer = threading.Thread(
+                        target=self._checkpoint_loop, name='bank-checkpointer', daemon=True
+                    )
+                    self._checkpointer.start()
+
+# ========== SQLITE BACKEND ==========
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    account_number TEXT PRIMARY KEY,
+    name TEXT,
+    email TEXT,
+    phone TEXT,
+    balance INTEGER NOT NULL DEFAULT 0,
+    created TEXT,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    stats TEXT,
+    phone_e164 TEXT,
+    version INTEGER NOT NULL DEFAULT 0,
+    alert_threshold INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_phone ON accounts(phone);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_number TEXT NOT NULL REFERENCES accounts(account_number),
+    type TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions(account_number, id);
+CREATE TABLE IF NOT EXISTS account_keys (
+    index_name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    account_number TEXT NOT NULL REFERENCES accounts(account_number),
+    PRIMARY KEY (index_name, key, account_number)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_account_keys_account ON account_keys(account_number);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS outbox (
+    key TEXT PRIMARY KEY,
+    event TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created TEXT NOT NULL,
+    updated TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt);
+"""
+
+# Account numbers bound into one "IN (...)" query (below SQLite's variable limit)
+SQLITE_QUERY_BATCH = 500
+
+# Account fields kept in dedicated columns rather than the JSON 'data' blob
+SQLITE_COLUMNS = ('name', 'email', 'phone', 'balance', 'created')
+
+# Columns added after the first release: (name, definition), added on open
+SQLITE_UPGRADES = (
+    ('transaction_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('stats', 'TEXT'),
+    ('phone_e164', 'TEXT'),
+    (VERSION_FIELD, 'INTEGER NOT NULL DEFAULT 0'),
+    ('alert_threshold', 'INTEGER'),
+)
+
+# Low balance index: accounts with alerts on (a non-NULL alert_threshold
+# column) ordered by how far their balance is above the threshold
+SQLITE_LOW_BALANCE_INDEX = (
+    'CREATE INDEX IF NOT EXISTS idx_accounts_low_balance ON accounts(balance - alert_threshold, account_number) '
+    'WHERE alert_threshold IS NOT NULL'
+)
+
+# Secondary indexes (see STORE_INDEXES) stored as indexed columns; every
+# other index (e.g. multi-key 'search') lives in the account_keys table
+SQLITE_INDEX_COLUMNS = {
+    'phone': 'phone_e164'
+}
+SQLITE_KEY_TABLE_INDEXES = tuple(name for name in STORE_INDEXES if name not in SQLITE_INDEX_COLUMNS)
+
+class SqliteAccountStore(AccountStore):
+    """SQLite database in WAL mode with indexed accounts and transactions tables"""
+
+    def __init__(self, sqlite_path, group_commit_window=0.005, fsync=True):
+        self.sqlite_path = sqlite_path
+        self.fsync = fsync
+        self._local = threading.local()  # One read connection per thread (Streamlit sessions)
+        self._writer_conn = None         # Owned by the group commit thread
+        self._writer = GroupCommitWriter(self._run_batch, group_commit_window, name='bank-sqlite-writer')
+        self.account_locks = AccountLocks(sqlite_path + '.accounts.lock')
+        self._cache = None  # (store version, parsed accounts)
+        self._cache_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+            self._upgrade_schema(conn)
+
+    def _upgrade_schema(self, conn):
+        """Add columns introduced after a database was created, backfilling the counters"""
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(accounts)')}
+        added = set()
+        for column, definition in SQLITE_UPGRADES:
+            if column not in columns:
+                try:
+                    conn.execute(f'ALTER TABLE accounts ADD COLUMN {column} {definition}')
+                    added.add(column)
+                except sqlite3.OperationalError:
+                    pass  # Another process upgraded it first
+        if added & {'transaction_count', 'stats'}:
+            self._rebuild_counters(conn)
+        if added & set(SQLITE_INDEX_COLUMNS.values()):
+            self._rebuild_index_columns(conn)
+        if 'alert_threshold' in added:
+            self._rebuild_alert_thresholds(conn)
+        for name, column in SQLITE_INDEX_COLUMNS.items():
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_accounts_{name} ON accounts({column})')
+        conn.execute(SQLITE_LOW_BALANCE_INDEX)
+        # Key-table indexes are filled once per index name, then kept current on every upsert
+        for name in SQLITE_KEY_TABLE_INDEXES:
+            built = conn.execute('SELECT 1 FROM store_meta WHERE key = ?', (f'index:{name}',)).fetchone()
+            if built is None:
+                for row in conn.execute('SELECT * FROM accounts').fetchall():
+                    self._write_index_keys(conn, row['account_number'], self._row_to_account(row), (name,))
+                conn.execute('INSERT OR IGNORE INTO store_meta (key, value) VALUES (?, 1)', (f'index:{name}',))
+
+    def _index_values(self, account_number, account):
+        """Secondary index column values for an account record, in SQLITE_INDEX_COLUMNS order"""
+        return tuple(STORE_INDEXES[name](account_number, account) for name in SQLITE_INDEX_COLUMNS)
+
+    def _write_index_keys(self, conn, account_number, account, names=SQLITE_KEY_TABLE_INDEXES):
+        """Replace an account's rows in the account_keys table"""
+        for name in names:
+            conn.execute(
+                'DELETE FROM account_keys WHERE index_name = ? AND account_number = ?', (name, account_number)
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO account_keys (index_name, key, account_number) VALUES (?, ?, ?)',
+                [(name, key, account_number) for key in _index_keys(name, account_number, account)]
+            )
+
+    def _rebuild_index_columns(self, conn):
+        """Recompute the secondary index columns of every account"""
+        assignments = ', '.join(f'{column} = ?' for column in SQLITE_INDEX_COLUMNS.values())
+        rows = conn.execute('SELECT * FROM accounts').fetchall()
+        conn.executemany(
+            f'UPDATE accounts SET {assignments} WHERE account_number = ?',
+            [self._index_values(row['account_number'], self._row_to_account(row)) + (row['account_number'],)
+             for row in rows]
+        )
+
+    def _rebuild_alert_thresholds(self, conn):
+        """Recompute every account's alert_threshold column from its preferences"""
+        rows = conn.execute('SELECT account_number, data FROM accounts').fetchall()
+        conn.executemany(
+            'UPDATE accounts SET alert_threshold = ? WHERE account_number = ?',
+            [(_alert_threshold(json.loads(row['data'])), row['account_number']) for row in rows]
+        )
+
+    def _rebuild_counters(self, conn):
+        """Recompute transaction_count and stats for every account with one scan"""
+        counters = {row['account_number']: [0, empty_stats()] for row in conn.execute('SELECT account_number FROM accounts')}
+        rows = conn.execute(
+            'SELECT account_number, type, COUNT(*) AS n, SUM(amount) AS total, MAX(date) AS last '
+            'FROM transactions GROUP BY account_number, type'
+        )
+        for row in rows:
+            if row['account_number'] not in counters:
+                continue
+            count, stats = counters[row['account_number']]
+            add_to_stats(stats, {'type': row['type'], 'amount': row['total'], 'date': row['last']})
+            counters[row['account_number']][0] = count + row['n']
+        rows = conn.execute(
+            "SELECT account_number, description FROM transactions WHERE type = 'TRANSFER_OUT' ORDER BY id"
+        )
+        for row in rows:
+            if row['account_number'] in counters:
+                stats = counters[row['account_number']][1]
+                add_to_stats(stats, {'type': 'TRANSFER_OUT', 'amount': 0, 'description': row['description']})
+        conn.executemany(
+            'UPDATE accounts SET transaction_count = ?, stats = ? WHERE account_number = ?',
+            [(count, json.dumps(stats), account_number) for account_number, (count, stats) in counters.items()]
+        )
+
+    def _open(self, synchronous):
+        """Open a connection configured for WAL mode"""
+        conn = sqlite3.connect(self.sqlite_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={synchronous}')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    def _connect(self):
+        """Return this thread's read connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open('NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _run_batch(self, operations):
+        """Group commit: run queued write operations in one transaction (one WAL fsync)
+
+        Each operation gets its own savepoint so a failing caller is rolled
+        back and reported without aborting the rest of the batch.
+        """
+        if self._writer_conn is None:
+            self._writer_conn = self._open('FULL' if self.fsync else 'NORMAL')
+            self._writer_conn.isolation_level = None  # Manage transactions explicitly
+        conn = self._writer_conn
+        errors = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for operation in operations:
+                conn.execute('SAVEPOINT op')
+                try:
+                    operation(conn)
+                    conn.execute('RELEASE op')
+                    errors.append(None)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO op')
+                    conn.execute('RELEASE op')
+                    errors.append(e)
+            conn.execute("UPDATE store_meta SET value = value + 1 WHERE key = 'version'")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return errors
+
+    def _row_to_account(self, row):
+        """Rebuild an account dict (without transactions) from a database row"""
+        account = json.loads(row['data'])
+        for column in SQLITE_COLUMNS + ('transaction_count', VERSION_FIELD):
+            if row[column] is not None:
+                account[column] = row[column]
+        account['stats'] = json.loads(row['stats']) if row['stats'] else empty_stats()
+        return account
+
+    def _fetch_transactions(self, conn, account_number):
+        """Return an account's transactions in chronological order"""
+        rows = conn.execute(
+            'SELECT type, amount, date, description FROM transactions '
+            'WHERE account_number = ? ORDER BY id',
+            (account_number,)
+        )
+        return [dict(row) for row in rows]
+
+    def _upsert_account(self, conn, account_number, account):
+        """Insert or update one account row, bumping its version
+
+        The balance of an existing account only changes through transactions,
+        so a (possibly stale) balance in the record is ignored. A record
+        carrying a 'transactions' list replaces that account's history.
+        """
+        data = {k: v for k, v in account.items()
+                if k not in SQLITE_COLUMNS + STORE_COUNTERS + (VERSION_FIELD, 'transactions')}
+        exists = conn.execute(
+            'SELECT 1 FROM accounts WHERE account_number = ?', (account_number,)
+        ).fetchone()
+        columns = SQLITE_COLUMNS + tuple(SQLITE_INDEX_COLUMNS.values()) + ('alert_threshold', 'data')
+        values = (
+            account.get('name'), account.get('email'), account.get('phone'),
+            int(account.get('balance', 0)), account.get('created')
+        ) + self._index_values(account_number, account) + (_alert_threshold(account), json.dumps(data))
+        if exists:
+            assignments = [(column, value) for column, value in zip(columns, values) if column != 'balance']
+            conn.execute(
+                f"UPDATE accounts SET {', '.join(f'{column} = ?' for column, _ in assignments)}, "
+                'version = version + 1 WHERE account_number = ?',
+                tuple(value for _, value in assignments) + (account_number,)
+            )
+        else:
+            conn.execute(
+                f"INSERT INTO accounts ({', '.join(columns)}, version, account_number) "
+                f"VALUES ({', '.join('?' * (len(columns) + 2))})",
+                values + (1, account_number)
+            )
+        self._write_index_keys(conn, account_number, account)
+        if 'transactions' in account:
+            transactions = account['transactions'] or []
+            conn.execute('DELETE FROM transactions WHERE account_number = ?', (account_number,))
+            conn.executemany(
+                'INSERT INTO transactions (account_number, type, amount, date, description) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(account_number, t.get('type', ''), int(t.get('amount', 0)),
+                  t.get('date', ''), t.get('description', ''))
+                 for t in transactions]
+            )
+            conn.execute(
+                'UPDATE accounts SET transaction_count = ?, stats = ? WHERE account_number = ?',
+                (len(transactions), json.dumps(history_stats(transactions)), account_number)
+            )
+
+    def _version(self, conn):
+        """Store version counter, bumped by every group commit from any process"""
+        return conn.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchone()[0]
+
+    def load_accounts(self):
+        """Return every account (without histories), cached until the store version changes"""
+        conn = self._connect()
+        with self._cache_lock:
+            version = self._version(conn)
+            if self._cache is not None and self._cache[0] == version:
+                self.cache_hits += 1
+            else:
+                self._cache = (version, self._read_all(conn))
+                self.cache_misses += 1
+            return dict(self._cache[1])
+
+    def _read_all(self, conn):
+        """Read every account row from the database"""
+        return {row['account_number']: self._row_to_account(row) for row in conn.execute('SELECT * FROM accounts')}
+
+    def replace_accounts(self, accounts):
+        """Replace the whole bank in one database transaction"""
+        def operation(conn):
+            conn.execute('DELETE FROM transactions')
+            conn.execute('DELETE FROM account_keys')
+            conn.execute('DELETE FROM accounts')
+            for account_number, account in accounts.items():
+                self._upsert_account(conn, account_number, account)
+        self._writer.submit(operation)
+        self._forget_contacts()
+
+    def get_account(self, account_number, fields=None):
+        """Return one account record (without its history), or None"""
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM accounts WHERE account_number = ?', (account_number,)).fetchone()
+        if row is None:
+            return None
+        account = self._row_to_account(row)
+        if fields is not None:
+            account = {field: account[field] for field in fields if field in account}
+        return account
+
+    def get_history(self, account_number):
+        """Return one account's transactions in chronological order"""
+        return self._fetch_transactions(self._connect(), account_number)
+
+    def get_histories_since(self, since, account_numbers):
+        """Recent histories of many accounts, a few hundred accounts per query"""
+        conn = self._connect()
+        account_numbers = list(account_numbers)
+        histories = {account_number: [] for account_number in account_numbers}
+        for start in range(0, len(account_numbers), SQLITE_QUERY_BATCH):
+            batch = account_numbers[start:start + SQLITE_QUERY_BATCH]
+            rows = conn.execute(
+                'SELECT account_number, type, amount, date, description FROM transactions '
+                f'WHERE account_number IN ({", ".join("?" * len(batch))}) AND date >= ? ORDER BY id',
+                (*batch, since)
+            )
+            for row in rows:
+                histories[row['account_number']].append(
+                    {'type': row['type'], 'amount': row['amount'], 'date': row['date'],
+                     'description': row['description']})
+        return histories
+
+    def find_accounts(self, index, key):
+        """Look up account numbers through the index on the matching column or key table"""
+        if index in SQLITE_INDEX_COLUMNS:
+            rows = self._connect().execute(
+                f'SELECT account_number FROM accounts WHERE {SQLITE_INDEX_COLUMNS[index]} = ? '
+                'ORDER BY account_number',
+                (key,)
+            )
+        else:
+            rows = self._connect().execute(
+                'SELECT account_number FROM account_keys WHERE index_name = ? AND key = ? '
+                'ORDER BY account_number',
+                (index, key)
+            )
+        return [row['account_number'] for row in rows]
+
+    def search_accounts(self, index, prefix, limit=10):
+        """Prefix search as an index range scan over the account_keys table"""
+        rows = self._connect().execute(
+            'SELECT key, account_number FROM account_keys '
+            'WHERE index_name = ? AND key >= ? AND key < ? ORDER BY key, account_number',
+            (index, prefix, prefix + '\U0010ffff')
+        )
+        found = []
+        for row in rows:
+            if row['account_number'] not in found:
+                found.append(row['account_number'])
+                if len(found) == limit:
+                    break
+        return found
+
+    def count_accounts(self):
+        """Number of account rows"""
+        return self._connect().execute('SELECT COUNT(*) FROM accounts').fetchone()[0]
+
+    def account_exists(self, account_number):
+        """Primary-key probe on the accounts table"""
+        return self._connect().execute(
+            'SELECT 1 FROM accounts WHERE account_number = ?', (account_number,)
+        ).fetchone() is not None
+
+    def alert_threshold(self, account_number):
+        """Alert threshold from the account's alert_threshold column"""
+        row = self._connect().execute(
+            'SELECT alert_threshold FROM accounts WHERE account_number = ?', (account_number,)
+        ).fetchone()
+        return row['alert_threshold'] if row is not None else None
+
+    def low_balance_accounts(self, limit=None):
+        """Range scan over the low balance index: rows with balance - alert_threshold < 0"""
+        rows = self._connect().execute(
+            'SELECT account_number, balance, alert_threshold FROM accounts '
+            'WHERE alert_threshold IS NOT NULL AND balance - alert_threshold < 0 '
+            'ORDER BY balance - alert_threshold, account_number LIMIT ?',
+            (limit if limit is not None else -1,)
+        )
+        return _low_balance_rows((row['account_number'], row['balance'], row['alert_threshold']) for row in rows)
+
+    def bank_totals(self):
+        """One aggregate query over the balance column"""
+        row = self._connect().execute(
+            'SELECT COUNT(*), COALESCE(SUM(balance), 0), COUNT(CASE WHEN balance > 0 THEN 1 END) FROM accounts'
+        ).fetchone()
+        return {'accounts': row[0], 'balance': row[1], 'funded': row[2]}
+
+    def get_history_page(self, account_number, cursor=None, limit=20):
+        """Return one page of history, newest first; the cursor is a transaction row id"""
+        conn = self._connect()
+        rows = conn.execute(
+            'SELECT id, type, amount, date, description FROM transactions '
+            'WHERE account_number = ? AND id < ? ORDER BY id DESC LIMIT ?',
+            (account_number, cursor if cursor is not None else sys.maxsize, limit + 1)
+        ).fetchall()
+        row = conn.execute(
+            'SELECT transaction_count FROM accounts WHERE account_number = ?', (account_number,)
+        ).fetchone()
+        page = rows[:limit]
+        return {
+            'transactions': [{k: r[k] for k in ('type', 'amount', 'date', 'description')} for r in page],
+            'next_cursor': page[-1]['id'] if len(rows) > limit else None,
+            'total': row['transaction_count'] if row is not None else 0
+        }
+
+    def save_account(self, account_number, account, outbox=()):
+        """Create or update a single account row"""
+        def operation(conn):
+            self._upsert_account(conn, account_number, account)
+            self._insert_outbox(conn, outbox)
+        self._writer.submit(operation)
+        self._forget_contacts([account_number])
+
+    def save_changes(self, changed, deleted, outbox=()):
+        """Upsert only the changed rows and delete removed accounts in one transaction"""
+        def operation(conn):
+            self._apply_changes(conn, changed, deleted)
+            self._insert_outbox(conn, outbox)
+        self._writer.submit(operation)
+        self._forget_contacts(list(changed) + list(deleted))
+
+    def _apply_changes(self, conn, changed, deleted):
+        """Write a change set inside the current transaction"""
+        for account_number, account in changed.items():
+            self._upsert_account(conn, account_number, account)
+        for account_number in deleted:
+            conn.execute('DELETE FROM transactions WHERE account_number = ?', (account_number,))
+            conn.execute('DELETE FROM account_keys WHERE account_number = ?', (account_number,))
+            conn.execute('DELETE FROM accounts WHERE account_number = ?', (account_number,))
+
+    def commit_transactions(self, entries, outbox=()):
+        """Insert transaction rows and update balances in one database transaction
+
+        Expected versions are checked inside the write transaction first, so
+        a stale entry rolls the whole operation back with VersionConflict.
+        """
+        date = _now()
+
+        def operation(conn):
+            for entry in entries:
+                if entry.get(VERSION_FIELD) is None:
+                    continue
+                row = conn.execute(
+                    'SELECT version FROM accounts WHERE account_number = ?', (entry['account'],)
+                ).fetchone()
+                if row is not None and row['version'] != entry[VERSION_FIELD]:
+                    raise VersionConflict(f"Account {entry['account']} changed since it was read")
+            for entry in entries:
+                conn.execute(
+                    'UPDATE accounts SET version = version + 1 WHERE account_number = ?', (entry['account'],)
+                )
+                if entry.get('balance') is not None:
+                    conn.execute(
+                        'UPDATE accounts SET balance = ? WHERE account_number = ?',
+                        (int(entry['balance']), entry['account'])
+                    )
+                row = conn.execute(
+                    'SELECT stats FROM accounts WHERE account_number = ?', (entry['account'],)
+                ).fetchone()
+                if row is not None:
+                    stats = json.loads(row['stats']) if row['stats'] else empty_stats()
+                    add_to_stats(stats, {'type': entry['type'], 'amount': int(entry['amount']), 'date': date,
+                                         'description': entry.get('description', ''),
+                                         'counterparty': entry.get('counterparty')})
+                    conn.execute(
+                        'UPDATE accounts SET transaction_count = transaction_count + 1, stats = ? '
+                        'WHERE account_number = ?',
+                        (json.dumps(stats), entry['account'])
+                    )
+                conn.execute(
+                    'INSERT INTO transactions (account_number, type, amount, date, description) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (entry['account'], entry['type'], int(entry['amount']), date,
+                     entry.get('description', ''))
+                )
+            self._insert_outbox(conn, outbox)
+        self._writer.submit(operation)
+
+    # ----- Notification outbox -----
+    def _insert_outbox(self, conn, events):
+        """Queue notification events inside the current write transaction"""
+        if events:
+            conn.executemany(
+                'INSERT OR IGNORE INTO outbox (key, event, created) VALUES (?, ?, ?)',
+                [(item['key'], json.dumps(item['event']), item['created']) for item in _outbox_items(events)]
+            )
+
+    def outbox_due(self, now=None, limit=100, account=None):
+        """Pending outbox rows whose next attempt is due, oldest first"""
+        rows = self._connect().execute(
+            "SELECT key, event, attempts, created FROM outbox WHERE status = 'pending' AND next_attempt <= ? "
+            "AND (? IS NULL OR json_extract(event, '$.account') = ?) ORDER BY created LIMIT ?",
+            (time.time() if now is None else now, account, account, -1 if limit is None else limit)
+        )
+        return [{'key': row['key'], 'event': json.loads(row['event']), 'attempts': row['attempts'],
+                 'created': row['created']} for row in rows]
+
+    def outbox_record(self, key, status, attempts, next_attempt=0, error=None):
+        """Update an outbox row's delivery status"""
+        updated = _now()
+        self._writer.submit(lambda conn: conn.execute(
+            'UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, updated = ? '
+            'WHERE key = ?',
+            (status, attempts, next_attempt, error, updated, key)
+        ))
+
+    def outbox_counts(self):
+        """Number of outbox rows in each status"""
+        counts = dict.fromkeys(OUTBOX_STATUSES, 0)
+        for row in self._connect().execute('SELECT status, COUNT(*) AS n FROM outbox GROUP BY status'):
+            counts[row['status']] = row['n']
+        return counts
+
+    def outbox_compact(self, sent_before):
+        """Delete rows delivered before `sent_before`"""
+        removed = []
+        self._writer.submit(lambda conn: removed.append(conn.execute(
+            "DELETE FROM outbox WHERE status = 'sent' AND updated < ?", (sent_before,)
+        ).rowcount))
+        return removed[0]
+
+    def rebuild_stats(self):
+        """Recompute every account's counters from the transactions table in one transaction"""
+        self._writer.submit(self._rebuild_counters)
+        return self._connect().execute('SELECT COUNT(*) FROM accounts').fetchone()[0]
+
+    def convert_to_cents(self):
+        """Convert REAL dollar columns from databases created before int cents
+
+        balance and amount are swapped for INTEGER cents columns in place
+        (rounded with bank_money.to_cents), alert thresholds in the data
+        blobs are converted and the aggregates rebuilt, all in one transaction.
+        The database is first copied aside with SQLite's online backup.
+        """
+        if not self.holds_dollars():
+            return 0
+        count = self.count_accounts()
+        backup = sqlite3.connect(self.sqlite_path + DOLLAR_BACKUP_SUFFIX)
+        try:
+            self._connect().backup(backup)
+        finally:
+            backup.close()
+
+        def operation(conn):
+            if self._money_columns(conn) != 'REAL':
+                return  # Another process converted it first
+            conn.create_function('to_cents', 1, to_cents, deterministic=True)
+            conn.execute('DROP INDEX IF EXISTS idx_accounts_low_balance')  # It reads the balance column
+            for table, column in (('accounts', 'balance'), ('transactions', 'amount')):
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column}_cents INTEGER NOT NULL DEFAULT 0')
+                conn.execute(f'UPDATE {table} SET {column}_cents = to_cents({column})')
+                conn.execute(f'ALTER TABLE {table} DROP COLUMN {column}')
+                conn.execute(f'ALTER TABLE {table} RENAME COLUMN {column}_cents TO {column}')
+            rows = conn.execute('SELECT account_number, data FROM accounts').fetchall()
+            conn.executemany(
+                'UPDATE accounts SET data = ? WHERE account_number = ?',
+                [(json.dumps(_account_to_cents(json.loads(row['data']))), row['account_number']) for row in rows]
+            )
+            self._rebuild_alert_thresholds(conn)
+            conn.execute(SQLITE_LOW_BALANCE_INDEX)
+            self._rebuild_counters(conn)
+        self._writer.submit(operation)
+        return count
+
+    def holds_dollars(self):
+        """REAL balance columns from before int cents"""
+        return self._money_columns(self._connect()) == 'REAL'
+
+    def _money_columns(self, conn):
+        """Declared type of the balance column: 'INTEGER' (cents) or 'REAL' (dollars)"""
+        for row in conn.execute('PRAGMA table_info(accounts)'):
+            if row['name'] == 'balance':
+                return row['type']
+        return None
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+# ========== STORE SELECTION ==========
+_store = None
+_store_lock = threading.Lock()
+
+def create_store(config=None):
+    """Build a store from a configuration dict (defaults to STORE_CONFIG)"""
+    config = config or STORE_CONFIG
+    backend = config.get('backend', 'json')
+    if backend == 'json':
+        return JsonAccountStore(
+            config['json_path'],
+            config['journal_path'],
+            config.get('checkpoint_records', 1000),
+            config.get('checkpoint_interval', 60),
+            config.get('group_commit_window', 0.005),
+            config.get('fsync', True),
+            config.get('history_path', 'bank_history'),
+            config.get('history_segment_size', 1000),
+            config.get('index_path', 'bank_accounts.index.json'),
+            config.get('outbox_path', 'bank_outbox.jsonl')
+        )
+    if backend == 'sqlite':
+        return SqliteAccountStore(
+            config['sqlite_path'],
+            config.get('group_commit_window', 0.005),
+            config.get('fsync', True)
+        )
+    raise ValueError(f"Unknown store backend: {backend}")
+
+def get_store():
+    """Return the process-wide store selected by STORE_CONFIG
+
+    Raises UnconvertedStore for data still written with dollar floats: the
+    conversion rewrites the files, so it only runs as an explicit step.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = create_store()
+                if store.holds_dollars():
+                    raise UnconvertedStore("The bank data still holds dollar amounts; "
+                                           "run 'python bank_store.py convert-cents' first")
+                _store = store
+    return _store
+
+# ========== DATA PERSISTENCE (shortcuts used by both apps) ==========
+def load_accounts():
+    """Load every account from the configured store"""
+    return get_store().load_accounts()
+
+def get_account(account_number, fields=None):
+    """Load a single account (optionally just some fields) from the configured store"""
+    return get_store().get_account(account_number, fields)
+
+def get_history(account_number):
+    """Load one account's transaction history from the configured store"""
+    return get_store().get_history(account_number)
+
+def get_stats(account_number):
+    """Load an account's running aggregates (inflow, outflow, count, ...) from the configured store"""
+    return get_store().get_stats(account_number)
+
+def find_accounts(index, key):
+    """Look up account numbers by a secondary index key (see STORE_INDEXES)"""
+    return get_store().find_accounts(index, key)
+
+def search_accounts(query, limit=10):
+    """Typeahead: account numbers whose number or holder name starts with `query`"""
+    prefix = ' '.join(query.lower().split())
+    return get_store().search_accounts('search', prefix, limit) if prefix else []
+
+def count_accounts():
+    """Number of accounts in the configured store"""
+    return get_store().count_accounts()
+
+def account_exists(account_number):
+    """Whether an account number exists in the configured store"""
+    return get_store().account_exists(account_number)
+
+def get_contact(account_number):
+    """Name, email and preferences of an account for notifications, from the store's contact cache"""
+    return get_store().get_contact(account_number)
+
+def alert_threshold(account_number):
+    """An account's low balance alert threshold (None when its alerts are off), from the store's index"""
+    return get_store().alert_threshold(account_number)
+
+def low_balance_accounts(limit=None):
+    """Accounts currently under their low balance alert threshold, furthest below first"""
+    return get_store().low_balance_accounts(limit)
+
+def bank_totals():
+    """Number of accounts, sum of their balances and number of funded accounts in the configured store"""
+    return get_store().bank_totals()
+
+def get_payees(account_number):
+    """Payee directory for the transfer page: favorites first, then recent recipients
+
+    Returns [{'account', 'name', 'favorite'}] built from the account's own
+    'favorite_payees' and the recent TRANSFER_OUT recipients kept in its
+    stats, so no other accounts are enumerated. Closed accounts are dropped.
+    """
+    account = get_account(account_number, fields=('favorite_payees', 'stats'))
+    if account is None:
+        return []
+    favorites = account.get('favorite_payees') or []
+    recent = (account.get('stats') or {}).get('recent_payees', [])
+    payees = []
+    for payee in favorites + recent:
+        if payee == account_number or any(p['account'] == payee for p in payees):
+            continue
+        holder = get_account(payee, fields=('name',))
+        if holder is not None:
+            payees.append({'account': payee, 'name': holder.get('name', ''), 'favorite': payee in favorites})
+    return payees
+
+def set_favorite_payee(account_number, payee, favorite=True):
+    """Add a payee to (or remove it from) an account's favorites"""
+    account = get_account(account_number)
+    if account is None:
+        return False
+    favorites = [acc for acc in account.get('favorite_payees', []) if acc != payee]
+    if favorite:
+        favorites.append(payee)
+    account['favorite_payees'] = favorites
+    save_account(account_number, account)
+    return True
+
+def find_accounts_by_phone(phone_number, country=None):
+    """Account numbers registered with this phone number, however it is formatted"""
+    key = normalize_phone(phone_number, country)
+    return find_accounts('phone', key) if key else []
+
+def get_history_page(account_number, cursor=None, limit=20):
+    """Load one newest-first page of an account's history from the configured store"""
+    return get_store().get_history_page(account_number, cursor, limit)
+
+def save_account(account_number, account):
+    """Create or update a single account in the configured store"""
+    get_store().save_account(account_number, account)
+
+def commit_transactions(entries):
+    """Atomically record one or more transaction entries"""
+    get_store().commit_transactions(entries)
+
+def apply_transactions(entries):
+    """Post entries as balance changes under per-account locks; returns {account: new balance}"""
+    return get_store().apply_transactions(entries)
+
+def cache_stats():
+    """Read cache hit/miss counters for the configured store"""
+    return get_store().cache_stats()
+
+def report_cache_stats(reads=10):
+    """Read every account `reads` times and print the read cache counters and timings
+
+    The counters belong to this process, so the reads are what they count:
+    the first is a cold read, the rest show what the cache saves.
+    """
+    store = get_store()
+    timings = []
+    for _ in range(reads):
+        started = time.perf_counter()
+        accounts = store.load_accounts()
+        timings.append(time.perf_counter() - started)
+    stats = store.cache_stats()
+    print(f"📊 {reads} reads of {len(accounts)} accounts: {stats['hits']} hits, "
+          f"{stats['refreshes']} refreshes, {stats['misses']} misses (hit rate {stats['hit_rate']:.0%})")
+    if reads > 1:
+        cached = sum(timings[1:]) / (reads - 1)
+        print(f"✅ Cold read {timings[0] * 1000:.2f} ms, cached reads {cached * 1000:.3f} ms on average")
+    return stats
+
+# ========== MIGRATION ==========
+def migrate_json_to_sqlite(json_path=None, journal_path=None, sqlite_path=None, history_path=None):
+    """Copy every account and transaction from the JSON store into SQLite (one shot)
+
+    Dollar data is converted to cents on the way; the JSON store is only read.
+    """
+    source = JsonAccountStore(
+        json_path or STORE_CONFIG['json_path'],
+        journal_path or STORE_CONFIG['journal_path'],
+        history_path=history_path or STORE_CONFIG['history_path']
+    )
+    target = SqliteAccountStore(sqlite_path or STORE_CONFIG['sqlite_path'])
+    try:
+        dollars = source.holds_dollars()
+        conn = target._connect()
+        if conn.execute('SELECT COUNT(*) FROM accounts').fetchone()[0]:
+            print(f"❌ {target.sqlite_path} already contains accounts - migration skipped")
+            return 0
+        accounts = {}
+        for account_number, account in source.load_accounts().items():
+            account = dict(account)
+            account['transactions'] = source.get_history(account_number)
+            accounts[account_number] = _account_to_cents(account) if dollars else account
+        target.replace_accounts(accounts)
+        transactions = sum(len(a['transactions']) for a in accounts.values())
+        print(f"✅ Migrated {len(accounts)} accounts and {transactions} transactions to {target.sqlite_path}")
+        return len(accounts)
+    finally:
+        target.close()
+
+def convert_to_cents(store=None):
+    """Convert a store written with dollar floats to int cents (one time)"""
+    store = store or create_store()
+    count = store.convert_to_cents()
+    if count:
+        print(f"✅ Converted {count} accounts to integer cents "
+              f"(the dollar data was kept in {DOLLAR_BACKUP_SUFFIX} copies next to the store)")
+    return count
+
+def rebuild_stats():
+    """Recompute the stored aggregates of every account from its history"""
+    count = get_store().rebuild_stats()
+    print(f"✅ Rebuilt transaction aggregates for {count} accounts")
+    return count
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'migrate':
+        migrate_json_to_sqlite()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'rebuild-stats':
+        rebuild_stats()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'convert-cents':
+        if not convert_to_cents():
+            print("✅ Store already holds integer cents")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'cache-stats':
+        if len(sys.argv) > 2 and (not sys.argv[2].isdigit() or int(sys.argv[2]) < 1):
+            print("Usage: python bank_store.py cache-stats [reads]")
+            sys.exit(1)
+        report_cache_stats(int(sys.argv[2]) if len(sys.argv) > 2 else 10)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'low-balance':
+        below = low_balance_accounts()
+        for row in below:
+            print(f"{row['account']}: {format_money(row['balance'])} (threshold {format_money(row['threshold'])})")
+        print(f"✅ {len(below)} accounts under their low balance alert threshold")
+    else:
+        print("Usage: python bank_store.py migrate | rebuild-stats | convert-cents | low-balance | cache-stats [reads]")
@@ -0,0 +1,289 @@
+"""
+BANK TEMPLATES - Email templates compiled once, rendered one type at a time
+Each template in EMAIL_TEMPLATES is parsed once, when the registry is
+built, into its literal text and the fields it uses. Rendering a
+notification fills in only the requested template, and only the fields that
+template needs are worked out (no money formatting for fields it does not
+show). render_batch() renders a whole bulk mailing with one timestamp.
+
+Template fields: name, account_number, email, created, to_account,
+from_account, date (now), and the money fields amount, balance,
+balance_before_credit / balance_before_debit (the balance before an amount
+was added / taken off).
+
+Usage: from bank_templates import email_templates
+       email_templates.render('DEPOSIT', account_data, amount, balance)
+"""
+
+from datetime import datetime
+from string import Formatter
+
+from bank_money import format_money
+
+# ========== TEMPLATE SOURCES ==========
+# Placeholders name TEMPLATE_FIELDS; 'DEFAULT' is used for unknown types
+EMAIL_TEMPLATES = {
+    'WELCOME': {
+        'subject': '🎉 Welcome to Cy_Bank! Your Account Has Been Created',
+        'body': """
+Dear {name},
+
+Welcome to Cy_Bank! We're thrilled to have you as our customer.
+
+Your new account has been successfully created with the following details:
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Account Number: {account_number}
+Account Holder: {name}
+Email: {email}
+Initial Deposit: {amount}
+Current Balance: {balance}
+Created Date: {created}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+You can now:
+• Check your balance anytime
+• Make deposits and withdrawals
+• Transfer money to other accounts
+• View transaction history
+• Earn interest on your savings
+
+Thank you for choosing Cy_Bank!
+
+Best regards,
+The Cy_Bank Team
+"""
+    },
+
+    'DEPOSIT': {
+        'subject': '💰 Deposit Confirmation - Cy_Bank',
+        'body': """
+Dear {name},
+
+Your deposit has been successfully processed!
+
+Transaction Details:
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Account Number: {account_number}
+Transaction Type: DEPOSIT
+Amount: +{amount}
+Previous Balance: {balance_before_credit}
+New Balance: {balance}
+Date/Time: {date}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+Thank you for banking with us!
+
+Best regards,
+The Cy_Bank Team
+"""
+    },
+
+    'WITHDRAWAL': {
+        'subject': '💳 Withdrawal Confirmation - Cy_Bank',
+        'body': """
+Dear {name},
+
+Your withdrawal has been successfully processed!
+
+Transaction Details:
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Account Number: {account_number}
+Transaction Type: WITHDRAWAL
+Amount: -{amount}
+Previous Balance: {balance_before_debit}
+New Balance: {balance}
+Date/Time: {date}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+If you did not authorize this transaction, please contact us immediately.
+
+Best regards,
+The Cy_Bank Team
+"""
+    },
+
+    'TRANSFER_SENT': {
+        'subject': '💸 Transfer Sent Confirmation - Cy_Bank',
+        'body': """
+Dear {name},
+
+Your transfer has been successfully sent!
+
+Transaction Details:
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Account Number: {account_number}
+Transaction Type: TRANSFER SENT
+To Account: {to_account}
+Amount: -{amount}
+Previous Balance: {balance_before_debit}
+New Balance: {balance}
+Date/Time: {date}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+Thank you for using our transfer service!
+
+Best regards,
+The Cy_Bank Team
+"""
+    },
+
+    'TRANSFER_RECEIVED': {
+        'subject': '📥 Transfer Received Notification - Cy_Bank',
+        'body': """
+Dear {name},
+
+You have received a transfer!
+
+Transaction Details:
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Account Number: {account_number}
+Transaction Type: TRANSFER RECEIVED
+From Account: {from_account}
+Amount: +{amount}
+Previous Balance: {balance_before_credit}
+New Balance: {balance}
+Date/Time: {date}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+Best regards,
+The Cy_Bank Team
+"""
+    },
+
+    'INTEREST': {
+        'subject': '💹 Interest Credited - Cy_Bank',
+        'body': """
+Dear {name},
+
+Interest has been credited to your account!
+
+Transaction Details:
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Account Number: {account_number}
+Transaction Type: INTEREST
+Amount: +{amount}
+Previous Balance: {balance_before_credit}
+New Balance: {balance}
+Interest Rate: 1% monthly
+Date/Time: {date}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+Your money is growing with us!
+
+Best regards,
+The Cy_Bank Team
+"""
+    },
+
+    'LOW_BALANCE': {
+        'subject': '⚠️ Low Balance Alert - Cy_Bank',
+        'body': """
+Dear {name},
+
+This is an alert regarding your account balance.
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Account Number: {account_number}
+Current Balance: {balance}
+Alert Type: LOW BALANCE (below $100)
+Date/Time: {date}
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+Please consider making a deposit to maintain sufficient funds.
+
+Best regards,
+The Cy_Bank Team
+"""
+    },
+
+    'DEFAULT': {
+        'subject': 'Cy_Bank Transaction Notification',
+        'body': """
+Dear {name},
+
+A transaction has occurred on your account.
+
+Account: {account_number}
+Amount: {amount}
+New Balance: {balance}
+
+Thank you for banking with Cy_Bank.
+"""
+    }
+}
+
+# ========== TEMPLATE FIELDS ==========
+# How each field is worked out from (account_data, amount, balance, now)
+TEMPLATE_FIELDS = {
+    'name': lambda data, amount, balance, now: data['name'],
+    'account_number': lambda data, amount, balance, now: data['account_number'],
+    'email': lambda data, amount, balance, now: data['email'],
+    'created': lambda data, amount, balance, now: data['created'],
+    'to_account': lambda data, amount, balance, now: data.get('to_account', 'Unknown'),
+    'from_account': lambda data, amount, balance, now: data.get('from_account', 'Unknown'),
+    'date': lambda data, amount, balance, now: now,
+    'amount': lambda data, amount, balance, now: format_money(amount),
+    'balance': lambda data, amount, balance, now: format_money(balance),
+    'balance_before_credit': lambda data, amount, balance, now: format_money(balance - amount),
+    'balance_before_debit': lambda data, amount, balance, now: format_money(balance + amount)
+}
+
+# ========== COMPILED TEMPLATES ==========
+def compile_template(text):
+    """Parse template text once into (literal chunks, field names)
+
+    Rendering is then a single join: chunks[0] + field 0 + chunks[1] + ...
+    """
+    chunks, fields = [''], []
+    for literal, field, _, _ in Formatter().parse(text):
+        chunks[-1] += literal
+        if field is not None:
+            if field not in TEMPLATE_FIELDS:
+                raise ValueError(f"Unknown template field: {field!r}")
+            fields.append(field)
+            chunks.append('')
+    return tuple(chunks), tuple(fields)
+
+def _fill(compiled, values):
+    """Join a compiled template's chunks with the values of its fields"""
+    chunks, fields = compiled
+    parts = [chunks[0]]
+    for field, chunk in zip(fields, chunks[1:]):
+        parts.append(values[field])
+        parts.append(chunk)
+    return ''.join(parts)
+
+class TemplateRegistry:
+    """Compiled email templates keyed by notification type
+
+    Unknown types render the 'DEFAULT' template.
+    """
+
+    def __init__(self, templates=EMAIL_TEMPLATES):
+        self._compiled = {}
+        for template_type, template in templates.items():
+            subject, body = compile_template(template['subject']), compile_template(template['body'])
+            self._compiled[template_type] = (subject, body, tuple(dict.fromkeys(subject[1] + body[1])))
+
+    def __contains__(self, template_type):
+        return template_type in self._compiled
+
+    def render(self, template_type, account_data, amount, balance, now=None):
+        """Subject and body of one notification: {'subject', 'body'}"""
+        subject, body, fields = self._compiled.get(template_type) or self._compiled['DEFAULT']
+        now = now or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        values = {field: TEMPLATE_FIELDS[field](account_data, amount, balance, now) for field in fields}
+        return {'subject': _fill(subject, values), 'body': _fill(body, values)}
+
+    def render_batch(self, notifications):
+        """Render many notifications at once; returns one {'subject', 'body'} per notification
+
+        `notifications` are (template type, account data, amount, balance)
+        tuples. They all carry the same timestamp.
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return [self.render(template_type, account_data, amount, balance, now)
+                for template_type, account_data, amount, balance in notifications]
+
+# The shared registry, compiled at import
+email_templates = TemplateRegistry()
@@ -0,0 +1,74 @@
+"""
+HISTORY BENCHMARK - Row-by-row vs vectorized history pipeline
+Times the old show_history() pipeline (df.apply formatting plus generator
+sums over the raw dicts) against history_frame()/history_totals() from
+cygobankapp.py on synthetic histories.
+
+Usage: python benchmark_history.py [rows ...]   (default: 10000 100000 1000000)
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from cygobankapp import history_frame, history_totals
+
+TRANSACTION_TYPES = ['DEPOSIT', 'WITHDRAWAL', 'TRANSFER_IN', 'TRANSFER_OUT', 'INTEREST']
+
+def make_transactions(rows, seed=42):
+    """Generate a synthetic transaction history (amounts in int cents, as stored)"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [{
+        'type': rng.choice(TRANSACTION_TYPES),
+        'amount': rng.randint(100, 500_000),
+        'date': (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'),
+        'description': f"Payment {i}"
+    } for i in range(rows)]
+
+def row_by_row(transactions):
+    """The original show_history() pipeline (on dollar floats, as stored back then)"""
+    df = pd.DataFrame(transactions)
+    df['amount_display'] = df.apply(
+        lambda row: f"+${row['amount']:,.2f}" if row['type'] in ['DEPOSIT', 'TRANSFER_IN', 'INTEREST']
+        else f"-${row['amount']:,.2f}",
+        axis=1
+    )
+    total_deposits = sum(t['amount'] for t in transactions if t['type'] in ['DEPOSIT', 'TRANSFER_IN', 'INTEREST'])
+    total_withdrawals = sum(t['amount'] for t in transactions if t['type'] in ['WITHDRAWAL', 'TRANSFER_OUT'])
+    return df, total_deposits - total_withdrawals
+
+def vectorized(transactions):
+    """The typed-column pipeline used by show_history() now"""
+    df = history_frame(transactions)
+    return df, history_totals(df)['net']
+
+def best_of(function, transactions, repeat):
+    """Fastest of `repeat` runs, in seconds"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(transactions)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'Rows':>10} {'Row-by-row':>12} {'Vectorized':>12} {'Speedup':>9}")
+    print("-"*46)
+    for rows in sizes:
+        transactions = make_transactions(rows)
+        dollar_transactions = [dict(t, amount=t['amount'] / 100) for t in transactions]
+        repeat = 3 if rows <= 100_000 else 1
+        old_time, (_, old_net) = best_of(row_by_row, dollar_transactions, repeat)
+        new_time, (_, new_net) = best_of(vectorized, transactions, repeat)
+        if abs(old_net - new_net / 100) > 0.01:
+            print(f"❌ Net flow mismatch at {rows} rows: {old_net:.2f} vs {new_net / 100:.2f}")
+        print(f"{rows:>10,} {old_time:>11.3f}s {new_time:>11.3f}s {old_time / new_time:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
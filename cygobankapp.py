@@ -4,18 +4,24 @@ A fully functional banking system with web interface
 """
 
 import streamlit as st
-import json
-import os
 from datetime import datetime
-import smtplib
-import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import re
+import numpy as np
 import pandas as pd
+from bank_money import to_cents, to_dollars, format_money
+from bank_phones import COUNTRY_PHONE_FORMATS, validate_phone, get_phone_format_help
+from bank_store import (get_account, save_account, get_history_page, get_stats,
+                        find_accounts_by_phone, search_accounts, count_accounts, bank_totals,
+                        account_exists, get_payees, set_favorite_payee,
+                        get_store, TransactionError, UnconvertedStore, INFLOW_TYPES, OUTFLOW_TYPES)
+from bank_engine import Bank, validate_email, DEFAULT_ALERT_THRESHOLD
+from bank_mail import get_dispatcher, EMAIL_TESTING_MODE
+from bank_digest import DIGEST_MODES, DEFAULT_DIGEST
 
 # ========== CONFIGURATION ==========
-TESTING_MODE = True  # Set to False for real emails
+TESTING_MODE = EMAIL_TESTING_MODE  # Set CYGOBANK_EMAIL_MODE=production for real emails
+HISTORY_PAGE_SIZE = 25  # Rows per page on the History page
+LOGIN_SEARCH_RESULTS = 10  # Matches shown by the account search on the login page
 
 EMAIL_CONFIG = {
     'smtp_server': 'smtp.gmail.com',
@@ -25,388 +31,12 @@ EMAIL_CONFIG = {
     'use_tls': True
 }
 
-# ========== DATA PERSISTENCE ==========
-def load_accounts():
-    """Load accounts from JSON file"""
-    if os.path.exists('bank_accounts.json'):
-        try:
-            with open('bank_accounts.json', 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+# Shared across reruns and sessions: the module cache keeps one dispatcher
+mailer = get_dispatcher(EMAIL_CONFIG)
 
-def save_accounts(accounts):
-    """Save accounts to JSON file"""
-    with open('bank_accounts.json', 'w') as f:
-        json.dump(accounts, f, indent=2)
-
-def validate_email(email):
-    """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
-
-# ========== PHONE VALIDATION ==========
-COUNTRY_PHONE_FORMATS = {
-    'USA': {
-        'code': '+1',
-        'pattern': r'^[2-9][0-9]{2}-[2-9][0-9]{2}-[0-9]{4}$',
-        'example': '404-401-3601',
-        'description': 'XXX-XXX-XXXX'
-    },
-    'Canada': {
-        'code': '+1',
-        'pattern': r'^[2-9][0-9]{2}-[2-9][0-9]{2}-[0-9]{4}$',
-        'example': '416-555-0123',
-        'description': 'XXX-XXX-XXXX'
-    },
-    'United Kingdom': {
-        'code': '+44',
-        'pattern': r'^\+44\s?[1-9][0-9]{1,4}[\s.-]?[0-9]{3,4}[\s.-]?[0-9]{3,4}$',
-        'example': '+44 20 7946 0958',
-        'description': '+44 XXXX XXXX XXXX'
-    },
-    'Australia': {
-        'code': '+61',
-        'pattern': r'^\+61\s?[2-9][0-9]{8}$',
-        'example': '+61 2 1234 5678',
-        'description': '+61 X XXXX XXXX'
-    },
-    'Germany': {
-        'code': '+49',
-        'pattern': r'^\+49\s?[1-9][0-9]{1,5}[\s.-]?[0-9]{3,9}$',
-        'example': '+49 30 12345678',
-        'description': '+49 XX XXXXXXXX'
-    },
-    'France': {
-        'code': '+33',
-        'pattern': r'^\+33\s?[1-9][0-9]{8}$',
-        'example': '+33 1 42 68 53 00',
-        'description': '+33 X XX XX XX XX'
-    },
-    'India': {
-        'code': '+91',
-        'pattern': r'^\+91\s?[6-9][0-9]{9}$',
-        'example': '+91 98765 43210',
-        'description': '+91 XXXXX XXXXX'
-    },
-    'Japan': {
-        'code': '+81',
-        'pattern': r'^\+81\s?[1-9][0-9]{1,4}[\s.-]?[0-9]{1,4}[\s.-]?[0-9]{4}$',
-        'example': '+81 3-1234-5678',
-        'description': '+81 X XXXX XXXX'
-    },
-    'Cameroon': {
-        'code': '+237',
-        'pattern': r'^\+237\s?[2367][0-9]{7}$',
-        'example': '+237 6 7812 3456',
-        'description': '+237 X XXXX XXXX'
-    },
-    'South Africa': {
-        'code': '+27',
-        'pattern': r'^\+27\s?[1-9][0-9]{8}$',
-        'example': '+27 11 555 1234',
-        'description': '+27 XX XXX XXXX'
-    },
-    'Brazil': {
-        'code': '+55',
-        'pattern': r'^\+55\s?\(?[1-9][0-9]\)?\s?[3-9][0-9]{3,4}[\s.-]?[0-9]{4}$',
-        'example': '+55 (11) 98765-4321',
-        'description': '(XX) XXXXX-XXXX'
-    },
-    'Mexico': {
-        'code': '+52',
-        'pattern': r'^\+52\s?[1-9][0-9]{9}$',
-        'example': '+52 55 1234 5678',
-        'description': '+52 XX XXXX XXXX'
-    },
-    'China': {
-        'code': '+86',
-        'pattern': r'^\+86\s?1[3-9][0-9]{9}$',
-        'example': '+86 138 0001 2345',
-        'description': '+86 1XX XXXX XXXX'
-    },
-    'Russia': {
-        'code': '+7',
-        'pattern': r'^\+7\s?[1-9][0-9]{9}$',
-        'example': '+7 499 123 4567',
-        'description': '+7 XXX XXX XXXX'
-    },
-    'Spain': {
-        'code': '+34',
-        'pattern': r'^\+34\s?[1-9][0-9]{8}$',
-        'example': '+34 912 34 5678',
-        'description': '+34 XXX XXX XXXX'
-    },
-    'Italy': {
-        'code': '+39',
-        'pattern': r'^\+39\s?[0-9]{6,10}$',
-        'example': '+39 06 1234 5678',
-        'description': '+39 XX XXXX XXXX'
-    },
-    'Netherlands': {
-        'code': '+31',
-        'pattern': r'^\+31\s?[1-9][0-9]{8}$',
-        'example': '+31 20 123 4567',
-        'description': '+31 XX XXX XXXX'
-    },
-    'Belgium': {
-        'code': '+32',
-        'pattern': r'^\+32\s?[1-9][0-9]{8}$',
-        'example': '+32 2 123 4567',
-        'description': '+32 X XXX XXXX'
-    },
-    'Switzerland': {
-        'code': '+41',
-        'pattern': r'^\+41\s?[1-9][0-9]{8}$',
-        'example': '+41 44 123 4567',
-        'description': '+41 XX XXX XXXX'
-    },
-    'Sweden': {
-        'code': '+46',
-        'pattern': r'^\+46\s?[1-9][0-9]{8}$',
-        'example': '+46 8 123 4567',
-        'description': '+46 X XXX XXXX'
-    },
-    'Norway': {
-        'code': '+47',
-        'pattern': r'^\+47\s?[4-9][0-9]{7}$',
-        'example': '+47 412 34 567',
-        'description': '+47 XXX XX XXX'
-    },
-    'Denmark': {
-        'code': '+45',
-        'pattern': r'^\+45\s?[1-9][0-9]{7}$',
-        'example': '+45 1234 5678',
-        'description': '+45 XXXX XXXX'
-    },
-    'Poland': {
-        'code': '+48',
-        'pattern': r'^\+48\s?[1-9][0-9]{8}$',
-        'example': '+48 12 123 4567',
-        'description': '+48 XX XXX XXXX'
-    },
-    'New Zealand': {
-        'code': '+64',
-        'pattern': r'^\+64\s?[1-9][0-9]{7,9}$',
-        'example': '+64 9 123 4567',
-        'description': '+64 X XXX XXXX'
-    },
-    'Singapore': {
-        'code': '+65',
-        'pattern': r'^\+65\s?[6-9][0-9]{7}$',
-        'example': '+65 6123 4567',
-        'description': '+65 XXXX XXXX'
-    },
-    'Hong Kong': {
-        'code': '+852',
-        'pattern': r'^\+852\s?[2-9][0-9]{7}$',
-        'example': '+852 2123 4567',
-        'description': '+852 XXXX XXXX'
-    },
-    'Thailand': {
-        'code': '+66',
-        'pattern': r'^\+66\s?[2-9][0-9]{7,8}$',
-        'example': '+66 2 123 4567',
-        'description': '+66 X XXXX XXXX'
-    },
-    'Malaysia': {
-        'code': '+60',
-        'pattern': r'^\+60\s?[1-9][0-9]{7,9}$',
-        'example': '+60 3 1234 5678',
-        'description': '+60 X XXXX XXXX'
-    },
-    'Philippines': {
-        'code': '+63',
-        'pattern': r'^\+63\s?[2-9][0-9]{8,9}$',
-        'example': '+63 2 1234 5678',
-        'description': '+63 X XXXX XXXX'
-    },
-    'Indonesia': {
-        'code': '+62',
-        'pattern': r'^\+62\s?[1-9][0-9]{7,10}$',
-        'example': '+62 21 1234 5678',
-        'description': '+62 XX XXXX XXXX'
-    },
-    'Vietnam': {
-        'code': '+84',
-        'pattern': r'^\+84\s?[1-9][0-9]{7,9}$',
-        'example': '+84 24 1234 5678',
-        'description': '+84 XX XXXX XXXX'
-    },
-    'Pakistan': {
-        'code': '+92',
-        'pattern': r'^\+92\s?[3][0-9]{9}$',
-        'example': '+92 300 1234 567',
-        'description': '+92 XXX XXXX XXX'
-    },
-    'Bangladesh': {
-        'code': '+880',
-        'pattern': r'^\+880\s?1[1-9][0-9]{8}$',
-        'example': '+880 171 234 5678',
-        'description': '+880 1XX XXXX XXXX'
-    },
-    'Nigeria': {
-        'code': '+234',
-        'pattern': r'^\+234\s?[7-9][0-9]{9}$',
-        'example': '+234 701 234 5678',
-        'description': '+234 XXX XXXX XXXX'
-    },
-    'Egypt': {
-        'code': '+20',
-        'pattern': r'^\+20\s?1[0-1][0-9]{8}$',
-        'example': '+20 100 123 4567',
-        'description': '+20 1XX XXX XXXX'
-    },
-    'Kenya': {
-        'code': '+254',
-        'pattern': r'^\+254\s?[7][0-9]{8}$',
-        'example': '+254 701 234 567',
-        'description': '+254 XXX XXX XXX'
-    },
-    'Argentina': {
-        'code': '+54',
-        'pattern': r'^\+54\s?\(?[1-9]{1,3}\)?\s?[1-9][0-9]{3,4}[\s.-]?[0-9]{4}$',
-        'example': '+54 (11) 1234-5678',
-        'description': '(XXX) XXXX-XXXX'
-    },
-    'Chile': {
-        'code': '+56',
-        'pattern': r'^\+56\s?[2-9][0-9]{8}$',
-        'example': '+56 2 1234 5678',
-        'description': '+56 X XXXX XXXX'
-    },
-    'Colombia': {
-        'code': '+57',
-        'pattern': r'^\+57\s?[1-9][0-9]{8,9}$',
-        'example': '+57 1 1234 5678',
-        'description': '+57 X XXXX XXXX'
-    },
-    'Peru': {
-        'code': '+51',
-        'pattern': r'^\+51\s?[1-9][0-9]{8}$',
-        'example': '+51 1 1234 5678',
-        'description': '+51 X XXXX XXXX'
-    },
-    'Turkey': {
-        'code': '+90',
-        'pattern': r'^\+90\s?[1-9][0-9]{9}$',
-        'example': '+90 212 123 4567',
-        'description': '+90 XXX XXX XXXX'
-    },
-    'Saudi Arabia': {
-        'code': '+966',
-        'pattern': r'^\+966\s?[1-9][0-9]{8}$',
-        'example': '+966 11 1234 567',
-        'description': '+966 XX XXXX XXX'
-    },
-    'UAE': {
-        'code': '+971',
-        'pattern': r'^\+971\s?[1-9][0-9]{7,8}$',
-        'example': '+971 4 1234 5678',
-        'description': '+971 X XXXX XXXX'
-    },
-    'Israel': {
-        'code': '+972',
-        'pattern': r'^\+972\s?[1-9][0-9]{8}$',
-        'example': '+972 2 1234 567',
-        'description': '+972 X XXXX XXXX'
-    },
-    'Greece': {
-        'code': '+30',
-        'pattern': r'^\+30\s?[1-9][0-9]{9}$',
-        'example': '+30 2 1234 5678',
-        'description': '+30 X XXXX XXXX'
-    },
-    'Ireland': {
-        'code': '+353',
-        'pattern': r'^\+353\s?[1-9][0-9]{8}$',
-        'example': '+353 1 234 5678',
-        'description': '+353 X XXX XXXX'
-    },
-    'Portugal': {
-        'code': '+351',
-        'pattern': r'^\+351\s?[1-9][0-9]{8}$',
-        'example': '+351 21 1234 567',
-        'description': '+351 XX XXXX XXX'
-    },
-    'Austria': {
-        'code': '+43',
-        'pattern': r'^\+43\s?[1-9][0-9]{8}$',
-        'example': '+43 1 1234 567',
-        'description': '+43 X XXXX XXXX'
-    },
-    'Czech Republic': {
-        'code': '+420',
-        'pattern': r'^\+420\s?[1-9][0-9]{8}$',
-        'example': '+420 2 1234 5678',
-        'description': '+420 X XXXX XXXX'
-    },
-    'Hungary': {
-        'code': '+36',
-        'pattern': r'^\+36\s?[1-9][0-9]{8}$',
-        'example': '+36 1 1234 5678',
-        'description': '+36 X XXXX XXXX'
-    },
-    'Romania': {
-        'code': '+40',
-        'pattern': r'^\+40\s?[1-9][0-9]{8}$',
-        'example': '+40 21 1234 567',
-        'description': '+40 XX XXXX XXX'
-    },
-    'Ukraine': {
-        'code': '+380',
-        'pattern': r'^\+380\s?[1-9][0-9]{8}$',
-        'example': '+380 44 1234 567',
-        'description': '+380 XX XXXX XXX'
-    },
-    'Finland': {
-        'code': '+358',
-        'pattern': r'^\+358\s?[1-9][0-9]{7,8}$',
-        'example': '+358 9 1234 567',
-        'description': '+358 X XXXX XXX'
-    },
-    'Iceland': {
-        'code': '+354',
-        'pattern': r'^\+354\s?[1-9][0-9]{6}$',
-        'example': '+354 123 4567',
-        'description': '+354 XXX XXXX'
-    },
-    'Luxembourg': {
-        'code': '+352',
-        'pattern': r'^\+352\s?[1-9][0-9]{8}$',
-        'example': '+352 1234 5678',
-        'description': '+352 XXXX XXXX'
-    },
-    'Malta': {
-        'code': '+356',
-        'pattern': r'^\+356\s?[1-9][0-9]{7}$',
-        'example': '+356 7123 4567',
-        'description': '+356 XXXX XXXX'
-    },
-    'Cyprus': {
-        'code': '+357',
-        'pattern': r'^\+357\s?2[0-6][0-9]{6}$',
-        'example': '+357 22 1234 567',
-        'description': '+357 XX XXXX XXX'
-    },
-}
-
-
-def validate_phone(phone_number, country):
-    """Validate phone number based on country format"""
-    if country not in COUNTRY_PHONE_FORMATS:
-        return False
-    
-    pattern = COUNTRY_PHONE_FORMATS[country]['pattern']
-    return re.match(pattern, phone_number) is not None
-
-def get_phone_format_help(country):
-    """Get phone format help text for a country"""
-    if country in COUNTRY_PHONE_FORMATS:
-        fmt = COUNTRY_PHONE_FORMATS[country]
-        return f"Example: {fmt['example']} | Format: {fmt['description']}"
-    return ""
+# The bank applies the rules; these pages only collect input and show results.
+# The web app has never capped single withdrawals, so no withdrawal limit here
+bank = Bank(withdrawal_limit=None)
 
 # ========== SSN VALIDATION ==========
 def validate_ssn(ssn):
@@ -463,43 +93,16 @@ def send_email_notification(recipient_email, subject, message_body):
         st.info(f"📧 Email would be sent to {recipient_email}\n\nSubject: {subject}")
         return True
     
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_CONFIG['sender_email']
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(message_body, 'plain'))
-        
-        context = ssl.create_default_context()
-        with smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port']) as server:
-            server.starttls(context=context)
-            server.login(EMAIL_CONFIG['sender_email'], EMAIL_CONFIG['sender_password'])
-            server.send_message(msg)
-        
-        return True
-    except Exception as e:
-        st.error(f"Failed to send email: {e}")
-        return False
-
-# ========== TRANSACTION FUNCTIONS ==========
-def log_transaction(account_number, transaction_type, amount, description=""):
-    """Record a transaction"""
-    accounts = load_accounts()
-    if account_number in accounts:
-        if 'transactions' not in accounts[account_number]:
-            accounts[account_number]['transactions'] = []
-        
-        accounts[account_number]['transactions'].append({
-            'type': transaction_type,
-            'amount': amount,
-            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'description': description
-        })
-        save_accounts(accounts)
+    # Queued for the background sender (pooled SMTP sessions); the page never
+    # waits on the mail server. Delivery failures end up in the server log
+    delivery = mailer.send(recipient_email, subject, message_body)
+    delivery.add_done_callback(lambda done: _log_delivery(recipient_email, done))
+    return True
 
-def calculate_interest(balance, rate=0.01):
-    """Calculate monthly interest"""
-    return balance * rate
+def _log_delivery(recipient_email, delivery):
+    """Log a queued email that could not be delivered (runs on the sender thread)"""
+    if delivery.exception() is not None:
+        print(f"Failed to send email to {recipient_email}: {delivery.exception()}")
 
 # ========== STREAMLIT UI ==========
 def init_session_state():
@@ -510,8 +113,6 @@ def init_session_state():
         st.session_state.current_account = None
     if 'page' not in st.session_state:
         st.session_state.page = 'main'
-    if 'accounts' not in st.session_state:
-        st.session_state.accounts = load_accounts()
 
 # ========== MAIN PAGES ==========
 def main_menu():
@@ -535,14 +136,14 @@ def main_menu():
     # Show stats
     st.markdown("---")
     col1, col2, col3 = st.columns(3)
-    accounts = load_accounts()
+    # Answered by the store's index/aggregate query, not by loading every account
+    totals = bank_totals()
     with col1:
-        st.metric("Total Accounts", len(accounts))
+        st.metric("Total Accounts", totals['accounts'])
     with col2:
-        total_balance = sum(float(a['balance']) for a in accounts.values()) if accounts else 0
-        st.metric("Total Deposits", f"${total_balance:,.2f}")
+        st.metric("Total Deposits", format_money(totals['balance']))
     with col3:
-        st.metric("Active Users", len([a for a in accounts.values() if float(a['balance']) > 0]))
+        st.metric("Active Users", totals['funded'])
 
 def create_account_page():
     """Create new account page"""
@@ -602,18 +203,8 @@ def create_account_page():
         submitted = st.form_submit_button("Create Account", use_container_width=True)
         
         if submitted:
-            accounts = load_accounts()
-            
-            # Validation
-            if not account_number:
-                st.error("❌ Account number cannot be empty!")
-            elif account_number in accounts:
-                st.error("❌ Account number already exists!")
-            elif not name:
-                st.error("❌ Name cannot be empty!")
-            elif not validate_email(email):
-                st.error("❌ Invalid email format!")
-            elif not phone_number:
+            # Validation of the form's own fields (the bank checks number, name, email, deposit)
+            if not phone_number:
                 st.error("❌ Phone number cannot be empty!")
             elif not validate_phone(phone_number, country):
                 st.error(f"❌ Invalid phone format for {country}! Expected format: {get_phone_format_help(country)}")
@@ -632,37 +223,25 @@ def create_account_page():
             elif not zip_code:
                 st.error("❌ Zip code cannot be empty!")
             else:
-                # Create account
-                accounts[account_number] = {
-                    'name': name,
-                    'email': email,
-                    'phone': phone_number,
-                    'ssn': ssn,
-                    'dob': dob,
-                    'country': country,
-                    'address': {
-                        'street': street_address,
-                        'apartment': apartment,
-                        'city': city,
-                        'county': county,
-                        'zip_code': zip_code
-                    },
-                    'balance': initial_deposit,
-                    'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'transactions': [{
-                        'type': 'DEPOSIT',
-                        'amount': initial_deposit,
-                        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'description': 'Initial deposit'
-                    }],
-                    'preferences': {
-                        'email_notifications': True,
-                        'low_balance_alert': True,
-                        'alert_threshold': 100
-                    }
-                }
-                
-                save_accounts(accounts)
+                # Create account (money in int cents)
+                initial_deposit = to_cents(initial_deposit)
+                try:
+                    bank.create_account(account_number, name, email, initial_deposit, profile={
+                        'phone': phone_number,
+                        'ssn': ssn,
+                        'dob': dob,
+                        'country': country,
+                        'address': {
+                            'street': street_address,
+                            'apartment': apartment,
+                            'city': city,
+                            'county': county,
+                            'zip_code': zip_code
+                        }
+                    })
+                except TransactionError as e:
+                    st.error(f"❌ {e}")
+                    return
                 
                 # Send welcome email
                 subject = "🎉 Welcome to Cy_Bank!"
@@ -681,7 +260,7 @@ Address:
 {street_address}{apt_info}
 {city}, {zip_code}{county_info}
 
-Initial Deposit: ${initial_deposit:.2f}
+Initial Deposit: {format_money(initial_deposit)}
 
 Thank you for choosing Cy_Bank!
 """
@@ -704,9 +283,7 @@ def login_page():
     """Login page"""
     st.title("🔑 Login to Your Account")
     
-    accounts = load_accounts()
-    
-    if not accounts:
+    if not count_accounts():
         st.warning("No accounts found. Please create an account first.")
         if st.button("Create Account"):
             st.session_state.page = 'create'
@@ -728,40 +305,42 @@ def login_page():
     st.markdown("---")
     
     if login_method == "Account Number":
-        # Account number login
-        account_list = list(accounts.keys())
-        account_labels = [f"{acc} - {accounts[acc]['name']}" for acc in account_list]
+        # Account number login: prefix search, only the top matches are rendered
+        query = st.text_input("Search by account number or name", placeholder="e.g., 12345 or Cyril",
+                              key='account_search')
+        account_list = search_accounts(query, limit=LOGIN_SEARCH_RESULTS) if query.strip() else []
+        names = {acc: get_account(acc, fields=('name',))['name'] for acc in account_list}
         
-        selected_index = st.selectbox(
+        if query.strip() and not account_list:
+            st.info("No matching accounts. Try another account number or name.")
+        
+        selected_account = st.selectbox(
             "Select your account",
-            range(len(account_list)),
-            format_func=lambda i: account_labels[i],
-            key='account_number_select'
+            account_list,
+            format_func=lambda acc: f"{acc} - {names[acc]}",
+            disabled=not account_list
         )
         
-        if st.button("Login", use_container_width=True):
-            account_number = account_list[selected_index]
+        if st.button("Login", use_container_width=True, disabled=selected_account is None):
+            account_number = selected_account
             st.session_state.logged_in = True
             st.session_state.current_account = account_number
             st.session_state.page = 'dashboard'
-            st.success(f"✅ Welcome back, {accounts[account_number]['name']}!")
+            st.success(f"✅ Welcome back, {names[account_number]}!")
             st.rerun()
     
     else:  # Phone Number login
         phone_input = st.text_input("Enter your phone number", placeholder="e.g., +237 6 7812 3456")
         
         if st.button("Login", use_container_width=True):
-            # Search for account with matching phone number
-            matching_accounts = []
-            for acc_num, acc_data in accounts.items():
-                if acc_data.get('phone', '').strip().lower() == phone_input.strip().lower():
-                    matching_accounts.append((acc_num, acc_data))
+            # Look up the normalized (E.164) number in the phone index
+            matching_accounts = find_accounts_by_phone(phone_input)
             
             if not matching_accounts:
                 st.error("❌ No account found with this phone number. Please try again.")
             elif len(matching_accounts) == 1:
-                account_number = matching_accounts[0][0]
-                account_name = matching_accounts[0][1]['name']
+                account_number = matching_accounts[0]
+                account_name = get_account(account_number, fields=('name',))['name']
                 st.session_state.logged_in = True
                 st.session_state.current_account = account_number
                 st.session_state.page = 'dashboard'
@@ -779,16 +358,15 @@ def login_page():
 def dashboard_page():
     """Main dashboard after login"""
     account_number = st.session_state.current_account
-    accounts = load_accounts()
+    account = get_account(account_number)
     
-    if account_number not in accounts:
+    if account is None:
         st.error("Account not found!")
         st.session_state.logged_in = False
         st.session_state.page = 'main'
         st.rerun()
     
-    account = accounts[account_number]
-    balance = float(account['balance'])
+    balance = account['balance']
     
     # Sidebar for navigation
     with st.sidebar:
@@ -797,7 +375,7 @@ def dashboard_page():
         st.markdown(f"**Email:** {account.get('email', 'Not set')}")
         st.markdown(f"**Phone:** {account.get('phone', 'Not set')}")
         st.markdown(f"**Country:** {account.get('country', 'Not set')}")
-        st.markdown(f"**Balance:** ${balance:,.2f}")
+        st.markdown(f"**Balance:** {format_money(balance)}")
         st.markdown("---")
         
         menu_option = st.radio(
@@ -832,7 +410,7 @@ def show_dashboard(account_number, account, balance):
     # Account summary cards
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Current Balance", f"${balance:,.2f}")
+        st.metric("Current Balance", format_money(balance))
     with col2:
         st.metric("Account Status", "Active" if balance > 0 else "Low Balance")
     with col3:
@@ -859,16 +437,16 @@ def show_dashboard(account_number, account, balance):
     # Recent transactions
     st.markdown("---")
     st.subheader("Recent Transactions")
-    transactions = account.get('transactions', [])[-5:]  # Last 5
+    transactions = get_history_page(account_number, limit=5)['transactions']  # Last 5, newest first
     if transactions:
-        for t in reversed(transactions):
+        for t in transactions:
             amount = t['amount']
             sign = "+" if t['type'] in ['DEPOSIT', 'TRANSFER_IN', 'INTEREST'] else "-"
             color = "green" if sign == "+" else "red"
             
             st.markdown(
                 f"**{t['date'][:16]}** | {t['type']} | "
-                f":{color}[{sign}${amount:,.2f}] | {t.get('description', '')}"
+                f":{color}[{sign}{format_money(amount)}] | {t.get('description', '')}"
             )
     else:
         st.info("No transactions yet")
@@ -882,16 +460,17 @@ def show_deposit(account_number, balance):
         description = st.text_input("Description (optional)", placeholder="e.g., Salary, Gift, etc.")
         
         if st.form_submit_button("Deposit", use_container_width=True):
+            amount = to_cents(amount)
             if amount > 0:
-                accounts = load_accounts()
-                new_balance = balance + amount
-                accounts[account_number]['balance'] = str(new_balance)
-                save_accounts(accounts)
-                
-                log_transaction(account_number, 'DEPOSIT', amount, description)
+                # Added to the current balance, not the one this page was rendered with
+                try:
+                    new_balance = bank.deposit(account_number, amount, description).balance
+                except TransactionError as e:
+                    st.error(f"❌ Deposit failed: {e}")
+                    return
                 
-                st.success(f"✅ Successfully deposited ${amount:,.2f}")
-                st.metric("New Balance", f"${new_balance:,.2f}")
+                st.success(f"✅ Successfully deposited {format_money(amount)}")
+                st.metric("New Balance", format_money(new_balance))
                 st.balloons()
             else:
                 st.error("Amount must be positive!")
@@ -901,23 +480,23 @@ def show_withdraw(account_number, balance):
     st.title("💸 Make a Withdrawal")
     
     with st.form("withdraw_form"):
-        amount = st.number_input("Amount to withdraw ($)", min_value=0.01, max_value=balance, step=10.0)
+        amount = st.number_input("Amount to withdraw ($)", min_value=0.01, max_value=to_dollars(balance), step=10.0)
         description = st.text_input("Description (optional)", placeholder="e.g., ATM, Purchase, etc.")
         
         if st.form_submit_button("Withdraw", use_container_width=True):
+            amount = to_cents(amount)
             if amount > 0 and amount <= balance:
-                accounts = load_accounts()
-                new_balance = balance - amount
-                accounts[account_number]['balance'] = str(new_balance)
-                save_accounts(accounts)
+                try:
+                    new_balance = bank.withdraw(account_number, amount, description).balance
+                except TransactionError as e:
+                    st.error(f"❌ Withdrawal failed: {e}")
+                    return
                 
-                log_transaction(account_number, 'WITHDRAWAL', amount, description)
-                
-                st.success(f"✅ Successfully withdrew ${amount:,.2f}")
-                st.metric("New Balance", f"${new_balance:,.2f}")
+                st.success(f"✅ Successfully withdrew {format_money(amount)}")
+                st.metric("New Balance", format_money(new_balance))
                 
                 # Check low balance alert
-                if new_balance < 100:
+                if new_balance < DEFAULT_ALERT_THRESHOLD:
                     st.warning("⚠️ Low balance alert! Your balance is below $100")
             else:
                 st.error("Invalid amount or insufficient funds!")
@@ -926,74 +505,121 @@ def show_transfer(account_number, balance):
     """Transfer page"""
     st.title("📤 Transfer Money")
     
-    accounts = load_accounts()
-    other_accounts = [acc for acc in accounts.keys() if acc != account_number]
-    
-    if not other_accounts:
-        st.warning("No other accounts available for transfer")
-        return
+    # Favorites and recent recipients only; other accounts are entered by number
+    payees = get_payees(account_number)
+    payee_labels = {p['account']: f"{'⭐ ' if p['favorite'] else ''}{p['account']} - {p['name']}" for p in payees}
+    recipient = st.radio("Send to", ["Saved payee", "Account number"] if payees else ["Account number"],
+                         horizontal=True)
     
     with st.form("transfer_form"):
-        to_account = st.selectbox("Transfer to", other_accounts)
-        amount = st.number_input("Amount to transfer ($)", min_value=0.01, max_value=balance, step=10.0)
+        if recipient == "Saved payee":
+            to_account = st.selectbox("Transfer to", list(payee_labels), format_func=payee_labels.get)
+        else:
+            to_account = st.text_input("Recipient account number", placeholder="e.g., 123456").strip()
+        amount = st.number_input("Amount to transfer ($)", min_value=0.01, max_value=to_dollars(balance), step=10.0)
         description = st.text_input("Description (optional)", placeholder="e.g., Rent, Payment, etc.")
+        favorite = st.checkbox("Save recipient as a favorite")
         
         if st.form_submit_button("Transfer", use_container_width=True):
-            if amount > 0 and amount <= balance:
-                accounts = load_accounts()
-                to_balance = float(accounts[to_account]['balance'])
-                
-                # Update balances
-                accounts[account_number]['balance'] = str(balance - amount)
-                accounts[to_account]['balance'] = str(to_balance + amount)
-                save_accounts(accounts)
+            amount = to_cents(amount)
+            if to_account == account_number:
+                st.error("You cannot transfer to your own account!")
+            elif not to_account or not account_exists(to_account):
+                st.error("❌ Recipient account not found!")
+            elif amount > 0 and amount <= balance:
+                # Both accounts are locked and both legs committed as one record
+                try:
+                    receipt = bank.transfer(account_number, to_account, amount)
+                except TransactionError as e:
+                    st.error(f"❌ Transfer failed: {e}")
+                    return
+                if favorite:
+                    set_favorite_payee(account_number, to_account)
                 
-                # Log transactions
-                log_transaction(account_number, 'TRANSFER_OUT', amount, f"To {to_account}")
-                log_transaction(to_account, 'TRANSFER_IN', amount, f"From {account_number}")
-                
-                st.success(f"✅ Successfully transferred ${amount:,.2f} to account {to_account}")
-                st.metric("New Balance", f"${balance - amount:,.2f}")
+                st.success(f"✅ Successfully transferred {format_money(amount)} to account {to_account}")
+                st.metric("New Balance", format_money(receipt.balance))
             else:
                 st.error("Invalid amount or insufficient funds!")
 
+# ========== HISTORY TABLES ==========
+def history_frame(transactions):
+    """Build a typed history DataFrame from transaction dicts
+
+    Columns: type (category), date (datetime64), amount_cents (int64, as
+    stored) and signed_amount (float64 dollars for display, negative for
+    money going out). Everything is
+    computed with column operations, never row by row.
+    """
+    df = pd.DataFrame(transactions, columns=['date', 'type', 'amount', 'description'])
+    df['type'] = df['type'].astype('category')
+    df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    df['amount_cents'] = df['amount'].astype('int64')
+    sign = np.where(df['type'].isin(INFLOW_TYPES), 1, -1)
+    df['signed_amount'] = to_dollars(df['amount_cents'] * sign)
+    return df
+
+def history_totals(df):
+    """Total deposits, withdrawals and net flow of a history frame (exact int cents)"""
+    inflow = int(df['amount_cents'].where(df['type'].isin(INFLOW_TYPES), 0).sum())
+    outflow = int(df['amount_cents'].where(df['type'].isin(OUTFLOW_TYPES), 0).sum())
+    return {'inflow': inflow, 'outflow': outflow, 'net': inflow - outflow}
+
 def show_history(account_number):
     """Transaction history page"""
     st.title("📋 Transaction History")
     
-    accounts = load_accounts()
-    account = accounts.get(account_number, {})
-    transactions = account.get('transactions', [])
+    # Cursors of the pages shown so far (newest first), reset when the account changes
+    if st.session_state.get('history_account') != account_number:
+        st.session_state.history_account = account_number
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+    page = get_history_page(account_number, cursors[-1], HISTORY_PAGE_SIZE)
+    transactions = page['transactions']
     
     if transactions:
-        # Convert to DataFrame for better display
-        df = pd.DataFrame(transactions)
-        df['amount_display'] = df.apply(
-            lambda row: f"+${row['amount']:,.2f}" if row['type'] in ['DEPOSIT', 'TRANSFER_IN', 'INTEREST'] 
-            else f"-${row['amount']:,.2f}",
-            axis=1
-        )
+        # Typed DataFrame; number/date formatting is left to the table widget
+        df = history_frame(transactions)
         
         # Display as table
         st.dataframe(
-            df[['date', 'type', 'amount_display', 'description']].rename(
-                columns={'date': 'Date', 'type': 'Type', 'amount_display': 'Amount', 'description': 'Description'}
+            df[['date', 'type', 'signed_amount', 'description']].rename(
+                columns={'date': 'Date', 'type': 'Type', 'signed_amount': 'Amount', 'description': 'Description'}
             ),
+            column_config={
+                'Date': st.column_config.DatetimeColumn(format='YYYY-MM-DD HH:mm'),
+                'Amount': st.column_config.NumberColumn('Amount ($)', format='%+.2f')
+            },
             use_container_width=True
         )
+        st.caption(f"Net flow on this page: {format_money(history_totals(df)['net'], sign=True)}")
         
-        # Summary stats
+        # Page navigation
+        total_pages = max((page['total'] + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE, 1)
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ Newer", disabled=len(cursors) == 1, use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"Page {len(cursors)} of {total_pages} ({page['total']} transactions)")
+        with col3:
+            if st.button("Older ➡️", disabled=page['next_cursor'] is None, use_container_width=True):
+                cursors.append(page['next_cursor'])
+                st.rerun()
+        
+        # Summary stats (kept up to date on the account at commit time)
+        stats = get_stats(account_number)
         st.markdown("---")
         col1, col2, col3 = st.columns(3)
-        total_deposits = sum(t['amount'] for t in transactions if t['type'] in ['DEPOSIT', 'TRANSFER_IN', 'INTEREST'])
-        total_withdrawals = sum(t['amount'] for t in transactions if t['type'] in ['WITHDRAWAL', 'TRANSFER_OUT'])
+        total_deposits = stats['inflow']
+        total_withdrawals = stats['outflow']
         
         with col1:
-            st.metric("Total Deposits", f"${total_deposits:,.2f}")
+            st.metric("Total Deposits", format_money(total_deposits))
         with col2:
-            st.metric("Total Withdrawals", f"${total_withdrawals:,.2f}")
+            st.metric("Total Withdrawals", format_money(total_withdrawals))
         with col3:
-            st.metric("Net Flow", f"${total_deposits - total_withdrawals:,.2f}")
+            st.metric("Net Flow", format_money(total_deposits - total_withdrawals))
     else:
         st.info("No transactions found")
 
@@ -1001,8 +627,10 @@ def show_settings(account_number):
     """Settings page"""
     st.title("⚙️ Account Settings")
     
-    accounts = load_accounts()
-    account = accounts[account_number]
+    account = get_account(account_number)
+    if account is None:
+        st.error("Account not found!")
+        return
     
     # Initialize session state for country selection in settings
     if 'settings_edit_country' not in st.session_state:
@@ -1057,11 +685,18 @@ def show_settings(account_number):
         st.subheader("Notification Preferences")
         prefs = account.get('preferences', {})
         email_notifications = st.checkbox("Enable email notifications", value=prefs.get('email_notifications', True))
+        digest_modes = list(DIGEST_MODES)
+        email_digest = st.selectbox(
+            "Email frequency",
+            digest_modes,
+            index=digest_modes.index(prefs.get('email_digest', DEFAULT_DIGEST)),
+            help="Receive one summary email per period instead of one email per transaction"
+        )
         low_balance_alerts = st.checkbox("Enable low balance alerts", value=prefs.get('low_balance_alert', True))
         alert_threshold = st.number_input(
             "Low balance alert threshold ($)",
-            min_value=10,
-            value=prefs.get('alert_threshold', 100)
+            min_value=10.0,
+            value=to_dollars(prefs.get('alert_threshold', DEFAULT_ALERT_THRESHOLD))
         )
         
         if st.form_submit_button("Save Settings", use_container_width=True):
@@ -1087,25 +722,26 @@ def show_settings(account_number):
             elif not zip_code:
                 st.error("❌ Zip code cannot be empty!")
             else:
-                accounts[account_number]['name'] = name
-                accounts[account_number]['email'] = email
-                accounts[account_number]['phone'] = phone
-                accounts[account_number]['ssn'] = ssn
-                accounts[account_number]['dob'] = dob
-                accounts[account_number]['country'] = country
-                accounts[account_number]['address'] = {
+                account['name'] = name
+                account['email'] = email
+                account['phone'] = phone
+                account['ssn'] = ssn
+                account['dob'] = dob
+                account['country'] = country
+                account['address'] = {
                     'street': street_address,
                     'apartment': apartment,
                     'city': city,
                     'county': county,
                     'zip_code': zip_code
                 }
-                accounts[account_number]['preferences'] = {
+                account['preferences'] = {
                     'email_notifications': email_notifications,
+                    'email_digest': email_digest,
                     'low_balance_alert': low_balance_alerts,
-                    'alert_threshold': alert_threshold
+                    'alert_threshold': to_cents(alert_threshold)
                 }
-                save_accounts(accounts)
+                save_account(account_number, account)
                 st.success("✅ Settings saved successfully!")
                 st.rerun()
 
@@ -1119,6 +755,12 @@ def main():
         initial_sidebar_state="collapsed"
     )
     
+    try:
+        get_store()
+    except UnconvertedStore as e:
+        st.error(f"❌ {e}")
+        st.stop()
+    
     # Initialize session state
     init_session_state()
     
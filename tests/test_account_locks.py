@@ -0,0 +1,127 @@
+"""
+Account locks and versioned commits under several processes and threads
+
+Each test runs a throwaway store in a temporary directory. Worker
+processes post deposits and transfers between the same two accounts from
+several threads each; afterwards every posting must have succeeded and
+each balance must equal its history's net.
+
+Usage: python -m pytest tests
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_store import create_store, STORE_CONFIG, OUTFLOW_TYPES, VERSION_FIELD, VersionConflict
+from bank_engine import Bank
+
+PROCESSES = 3
+THREADS = 4
+ROUNDS = 20
+OPENING_BALANCE = 1000000
+
+def _config(directory, backend):
+    """Store configuration with every file inside `directory`"""
+    return dict(
+        STORE_CONFIG,
+        backend=backend,
+        json_path=os.path.join(directory, 'bank_accounts.json'),
+        journal_path=os.path.join(directory, 'bank_accounts.journal'),
+        sqlite_path=os.path.join(directory, 'bank_accounts.db'),
+        history_path=os.path.join(directory, 'bank_history'),
+        index_path=os.path.join(directory, 'bank_accounts.index.json'),
+        outbox_path=os.path.join(directory, 'bank_outbox.jsonl'),
+        fsync=False
+    )
+
+def _post(config, errors):
+    """Worker process: THREADS threads depositing into and transferring between accounts 1 and 2"""
+    bank = Bank(store=create_store(config))
+
+    def run(thread):
+        try:
+            for i in range(ROUNDS):
+                # Alternate directions so stripes are taken in both orders
+                if (thread + i) % 2:
+                    bank.transfer('1', '2', 1)
+                else:
+                    bank.transfer('2', '1', 1)
+                bank.deposit(str(1 + i % 2), 1)
+        except Exception as e:
+            errors.put(f"{type(e).__name__}: {e}")
+
+    threads = [threading.Thread(target=run, args=(thread,)) for thread in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def _history_net(store, account_number):
+    """Balance implied by an account's history"""
+    return sum(-t['amount'] if t['type'] in OUTFLOW_TYPES else t['amount']
+               for t in store.get_history(account_number))
+
+class ConcurrentPostingTest(unittest.TestCase):
+
+    def _run(self, backend):
+        with tempfile.TemporaryDirectory() as directory:
+            config = _config(directory, backend)
+            bank = Bank(store=create_store(config))
+            bank.create_account('1', 'Ann Lee', 'ann@example.com', OPENING_BALANCE)
+            bank.create_account('2', 'Bo Lee', 'bo@example.com', OPENING_BALANCE)
+
+            context = multiprocessing.get_context('spawn')
+            errors = context.Queue()
+            workers = [context.Process(target=_post, args=(config, errors)) for _ in range(PROCESSES)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            failures = []
+            while not errors.empty():
+                failures.append(errors.get())
+            self.assertEqual(failures, [])
+
+            store = create_store(config)
+            balances = {number: store.get_account(number)['balance'] for number in ('1', '2')}
+            for number, balance in balances.items():
+                self.assertEqual(balance, _history_net(store, number))
+            deposits = PROCESSES * THREADS * ROUNDS
+            self.assertEqual(sum(balances.values()), 2 * OPENING_BALANCE + deposits)
+
+    def test_json_backend(self):
+        self._run('json')
+
+    def test_sqlite_backend(self):
+        self._run('sqlite')
+
+class VersionedCommitTest(unittest.TestCase):
+
+    def _run(self, backend):
+        with tempfile.TemporaryDirectory() as directory:
+            store = create_store(_config(directory, backend))
+            Bank(store=store).create_account('1', 'Ann Lee', 'ann@example.com', 5000)
+            version = store.get_account('1')[VERSION_FIELD]
+            entry = {'account': '1', 'type': 'DEPOSIT', 'amount': 100, 'balance': 5100, VERSION_FIELD: version}
+            store.commit_transactions([entry])
+            # The same read-version again is stale now
+            with self.assertRaises(VersionConflict):
+                store.commit_transactions([dict(entry, balance=5200)])
+            account = store.get_account('1')
+            self.assertEqual(account['balance'], 5100)
+            self.assertEqual(account[VERSION_FIELD], version + 1)
+
+    def test_json_backend(self):
+        self._run('json')
+
+    def test_sqlite_backend(self):
+        self._run('sqlite')
+
+if __name__ == '__main__':
+    unittest.main()
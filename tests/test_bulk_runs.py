@@ -0,0 +1,127 @@
+"""
+Month-end interest runs and batch files
+
+The interest tests stop a run between chunks, on either side of a chunk's
+commit, and check that the resumed run credits every account exactly
+once. The batch test streams a small request file in several chunks.
+Both run against a throwaway store (see test_account_locks._config).
+
+Usage: python -m pytest tests
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_store import create_store
+from bank_engine import Bank
+from bank_interest import run_interest, read_checkpoint
+from bank_batch import process_file
+from test_account_locks import _config
+
+ACCOUNTS = ['1', '2', '3', '4', '5']
+RATE = 0.01
+
+class Crash(Exception):
+    """Stands in for the process dying"""
+
+def _crashing_bank(store, chunk, after_commit):
+    """A Bank whose post_interest dies on the `chunk`-th call, before or after committing it"""
+    bank = Bank(store=store)
+    post_interest = bank.post_interest
+    calls = []
+
+    def post(*args, **kwargs):
+        calls.append(None)
+        if len(calls) == chunk and not after_commit:
+            raise Crash()
+        receipts = post_interest(*args, **kwargs)
+        if len(calls) == chunk:
+            raise Crash()
+        return receipts
+
+    bank.post_interest = post
+    return bank
+
+class InterestResumeTest(unittest.TestCase):
+
+    def _run(self, after_commit):
+        with tempfile.TemporaryDirectory() as directory:
+            config = _config(directory, 'json')
+            checkpoint_path = os.path.join(directory, 'interest.checkpoint.json')
+            period = datetime.now().strftime('%Y-%m')
+            store = create_store(config)
+            bank = Bank(store=store)
+            for number in ACCOUNTS:
+                bank.create_account(number, f'Holder {number}', f'holder{number}@example.com', 1000000)
+
+            with self.assertRaises(Crash):
+                run_interest(period, RATE, 2, _crashing_bank(store, 2, after_commit), checkpoint_path)
+            checkpoint = read_checkpoint(checkpoint_path)
+            self.assertEqual((checkpoint['done_through'], checkpoint['in_flight']), ('2', ['3', '4']))
+
+            store = create_store(config)
+            summary = run_interest(period, RATE, 2, Bank(store=store), checkpoint_path)
+            self.assertTrue(summary['resumed'])
+            interest = {number: [t['amount'] for t in store.get_history(number) if t['type'] == 'INTEREST']
+                        for number in ACCOUNTS}
+            for number in ACCOUNTS:
+                self.assertEqual(len(interest[number]), 1, number)
+                self.assertGreater(interest[number][0], 0)
+                self.assertEqual(store.get_account(number)['balance'], 1000000 + interest[number][0])
+            self.assertEqual(summary['credited'], len(ACCOUNTS))
+            self.assertEqual(summary['interest'], sum(amounts[0] for amounts in interest.values()))
+
+            again = run_interest(period, RATE, 2, Bank(store=store), checkpoint_path)
+            self.assertTrue(again['already_done'])
+            self.assertEqual(again['interest'], summary['interest'])
+
+    def test_resume_after_committed_chunk(self):
+        self._run(after_commit=True)
+
+    def test_resume_before_chunk_commit(self):
+        self._run(after_commit=False)
+
+class BatchFileTest(unittest.TestCase):
+
+    def test_chunked_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = create_store(_config(directory, 'json'))
+            requests_path = os.path.join(directory, 'requests.jsonl')
+            lines = [
+                {'id': 'r1', 'op': 'create', 'account': '1001', 'name': 'Ann Lee', 'email': 'ann@example.com',
+                 'amount': 50, 'phone': '404-401-3601', 'country': 'USA'},
+                {'id': 'r2', 'op': 'create', 'account': '1002', 'name': 'Bo Lee', 'email': 'bo@example.com',
+                 'amount': '20.00'},
+                {'id': 'r3', 'op': 'deposit', 'account': '1001', 'amount': '1,250.00', 'description': 'Payroll'},
+                {'id': 'r4', 'op': 'withdraw', 'account': '1002', 'amount': 40},
+                {'id': 'r5', 'op': 'transfer', 'from': '1001', 'to': '1002', 'amount': 12.5},
+                {'id': 'r6', 'op': 'refund', 'account': '1001', 'amount': 1}
+            ]
+            with open(requests_path, 'w') as f:
+                for line in lines:
+                    f.write(json.dumps(line) + '\n')
+                f.write('not json\n')
+
+            summary = process_file(requests_path, chunk_size=3, bank=Bank(store=store))
+            self.assertEqual((summary['requests'], summary['ok'], summary['errors'], summary['chunks']),
+                             (7, 4, 3, 3))
+            with open(summary['results_path']) as f:
+                results = [json.loads(line) for line in f]
+            self.assertEqual([result['line'] for result in results], list(range(1, 8)))
+            self.assertEqual([result['status'] for result in results],
+                             ['ok', 'ok', 'ok', 'error', 'ok', 'error', 'error'])
+            self.assertEqual(results[3]['code'], 'insufficient_funds')
+            self.assertEqual(results[2]['balance'], 130000)
+
+            self.assertEqual(store.get_account('1001')['balance'], 128750)
+            self.assertEqual(store.get_account('1002')['balance'], 3250)
+            self.assertEqual(store.find_accounts('phone', '+14044013601'), ['1001'])
+
+if __name__ == '__main__':
+    unittest.main()
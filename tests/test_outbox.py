@@ -0,0 +1,128 @@
+"""
+Outbox delivery: retries, failures and digest windows
+
+deliver_due runs against a throwaway store (see test_account_locks._config)
+with fake send callbacks; `now` is passed in so retries and digest windows
+can be stepped through without waiting.
+
+Usage: python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_store import create_store
+from bank_engine import Bank
+from bank_digest import plan_deliveries, window_end
+from bank_outbox import deliver_due, retry_delay, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE, OUTBOX_RETRY_MAX
+from test_account_locks import _config
+
+HOUR = 3600
+LATER = time.time() + 30 * 86400  # Past every retry delay and digest window
+
+def _item(key, account, created, event_type='DEPOSIT'):
+    """An outbox item as outbox_due returns it"""
+    return {'key': key, 'attempts': 0, 'created': created,
+            'event': {'type': event_type, 'account': account, 'amount': 100, 'balance': 100, 'details': {}}}
+
+class RetryTest(unittest.TestCase):
+
+    def test_retry_delay_bounds(self):
+        for attempts in range(1, 12):
+            delay = min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+            for _ in range(20):
+                self.assertTrue(delay / 2 <= retry_delay(attempts) <= delay)
+
+    def _run(self, backend):
+        with tempfile.TemporaryDirectory() as directory:
+            store = create_store(_config(directory, backend))
+            Bank(store=store, outbox=True).create_account('1', 'Ann Lee', 'ann@example.com', 5000)
+
+            def refuse(event):
+                raise ConnectionError('mail server down')
+
+            for attempt in range(1, OUTBOX_MAX_ATTEMPTS):
+                started = time.time()
+                self.assertEqual(deliver_due(store, refuse, now=LATER)['retried'], 1)
+                # Rescheduled with backoff: not due before half the delay, due after all of it
+                delay = min(OUTBOX_RETRY_BASE * 2 ** (attempt - 1), OUTBOX_RETRY_MAX)
+                self.assertEqual(store.outbox_due(started + delay / 2 - 1), [])
+                self.assertEqual(len(store.outbox_due(time.time() + delay + 1)), 1)
+            self.assertEqual(deliver_due(store, refuse, now=LATER)['failed'], 1)
+            self.assertEqual(store.outbox_counts(), {'pending': 0, 'sent': 0, 'failed': 1})
+            self.assertEqual(store.outbox_due(LATER), [])
+
+    def test_json_backend(self):
+        self._run('json')
+
+    def test_sqlite_backend(self):
+        self._run('sqlite')
+
+    def test_false_is_a_failed_try(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = create_store(_config(directory, 'json'))
+            Bank(store=store, outbox=True).create_account('1', 'Ann Lee', 'ann@example.com', 5000)
+            self.assertEqual(deliver_due(store, lambda event: False, now=LATER)['retried'], 1)
+            self.assertEqual(deliver_due(store, lambda event: None, now=LATER)['sent'], 1)
+            self.assertEqual(store.outbox_counts(), {'pending': 0, 'sent': 1, 'failed': 0})
+
+class DigestPlanTest(unittest.TestCase):
+
+    def test_window_release(self):
+        items = [_item('a1', 'A', '2026-10-17 09:05:00'),
+                 _item('a2', 'A', '2026-10-17 09:55:00'),
+                 _item('a3', 'A', '2026-10-17 10:01:00'),
+                 _item('w', 'A', '2026-10-17 10:02:00', 'WELCOME'),
+                 _item('b1', 'B', '2026-10-17 09:10:00')]
+        window_of = {'A': HOUR, 'B': 0}.get
+        ten = datetime(2026, 10, 17, 10).timestamp()
+
+        deliveries, held = plan_deliveries(items, window_of, ten + 60)
+        keys = sorted([item['key'] for item in delivery] for delivery in deliveries)
+        # The 9-10 window has closed; 10:01 waits for 11:00; WELCOME and B's items go alone
+        self.assertEqual(keys, [['a1', 'a2'], ['b1'], ['w']])
+        self.assertEqual([(item['key'], release) for item, release in held], [('a3', ten + HOUR)])
+
+        deliveries, held = plan_deliveries(items, window_of, ten - 1)
+        self.assertEqual(sorted(item['key'] for item, _ in held), ['a1', 'a2', 'a3'])
+
+    def test_window_end_from_midnight(self):
+        midnight = datetime(2026, 10, 17)
+        self.assertEqual(window_end('2026-10-17 23:59:59', 86400), (midnight + timedelta(days=1)).timestamp())
+        self.assertEqual(window_end('2026-10-17 00:14:59', 900), (midnight + timedelta(minutes=15)).timestamp())
+        self.assertEqual(window_end('2026-10-17 00:15:00', 900), (midnight + timedelta(minutes=30)).timestamp())
+
+    def _run(self, backend):
+        with tempfile.TemporaryDirectory() as directory:
+            store = create_store(_config(directory, backend))
+            bank = Bank(store=store, outbox=True)
+            bank.create_account('A', 'Ann Lee', 'ann@example.com', 5000)
+            bank.create_account('B', 'Bo Lee', 'bo@example.com', 5000)
+            for i in range(25):
+                bank.deposit('A', 1)
+                if i % 5 == 0:
+                    bank.deposit('B', 1)
+
+            singles, digests = [], []
+            while sum(deliver_due(store, singles.append, limit=10, now=LATER,
+                                  send_digest=lambda account, events: digests.append((account, len(events))),
+                                  digest_window={'A': 86400, 'B': 0}.get).values()):
+                pass
+            # One email for A's whole window, although it spans several polls
+            self.assertEqual(digests, [('A', 25)])
+            self.assertEqual(sorted(event['type'] for event in singles), ['DEPOSIT'] * 5 + ['WELCOME'] * 2)
+
+    def test_json_digest_across_polls(self):
+        self._run('json')
+
+    def test_sqlite_digest_across_polls(self):
+        self._run('sqlite')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Store recovery, cents conversion, history pages and secondary indexes
+
+Each test runs a throwaway store in a temporary directory (see
+test_account_locks._config). The recovery tests stop a JSON checkpoint
+part way through and check that a fresh store replays the journal
+without losing or repeating anything.
+
+Usage: python -m pytest tests
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_store import create_store, DOLLAR_BACKUP_SUFFIX
+from bank_engine import Bank
+from test_account_locks import _config
+
+DOLLAR_SNAPSHOT = {
+    '1001': {
+        'name': 'Ann Lee',
+        'email': 'ann@example.com',
+        'balance': 10250.5,
+        'created': '2026-02-25 05:25:07',
+        'transactions': [
+            {'type': 'DEPOSIT', 'amount': 10000.0, 'date': '2026-02-25 05:25:07', 'description': 'Initial deposit'},
+            {'type': 'DEPOSIT', 'amount': 250.5, 'date': '2026-02-26 09:00:00', 'description': 'Payroll'}
+        ],
+        'preferences': {'low_balance_alert': True, 'alert_threshold': 100}
+    }
+}
+
+def _types(store, account_number):
+    """Transaction types of an account's history, oldest first"""
+    return [t['type'] for t in store.get_history(account_number)]
+
+def _set_preferences(store, account_number, **preferences):
+    """Change an account's preferences the way the CLI's settings menu does"""
+    account = store.get_account(account_number)
+    account['preferences'].update(preferences)
+    store.save_account(account_number, account)
+
+class CheckpointRecoveryTest(unittest.TestCase):
+
+    def _post(self, config):
+        """Open an account and post two transactions, all left in the journal"""
+        store = create_store(config)
+        bank = Bank(store=store, outbox=True)
+        bank.create_account('1', 'Ann Lee', 'ann@example.com', 5000)
+        bank.deposit('1', 250)
+        bank.withdraw('1', 100)
+        return store
+
+    def _check(self, store):
+        self.assertEqual(store.get_account('1')['balance'], 5150)
+        self.assertEqual(_types(store, '1'), ['DEPOSIT', 'DEPOSIT', 'WITHDRAWAL'])
+        self.assertEqual(store.outbox_counts()['pending'], 3)
+
+    def test_replay_unfolded_journal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = _config(directory, 'json')
+            self._post(config)
+            # A new process finds the records only in the journal
+            self._check(create_store(config))
+
+    def test_crash_between_history_and_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = _config(directory, 'json')
+            store = self._post(config)
+            # History and outbox lines are written, the snapshot is not
+            with mock.patch.object(store, '_write_snapshot', side_effect=OSError('disk full')):
+                with self.assertRaises(OSError):
+                    store.checkpoint()
+
+            recovered = create_store(config)
+            self._check(recovered)
+            self.assertTrue(recovered.checkpoint())
+            self._check(recovered)
+
+            restarted = create_store(config)
+            self._check(restarted)
+            self.assertFalse(restarted.checkpoint())
+
+    def test_corrupt_snapshot_is_refused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = _config(directory, 'json')
+            store = self._post(config)
+            store.checkpoint()
+            with open(config['json_path'], 'w') as f:
+                f.write('{"1": {"name": ')
+            with self.assertRaises(ValueError):
+                create_store(config).load_accounts()
+
+class CentsConversionTest(unittest.TestCase):
+
+    def test_convert_twice(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = _config(directory, 'json')
+            with open(config['json_path'], 'w') as f:
+                json.dump(DOLLAR_SNAPSHOT, f)
+
+            store = create_store(config)
+            self.assertTrue(store.holds_dollars())
+            self.assertEqual(store.convert_to_cents(), 1)
+            self.assertFalse(store.holds_dollars())
+            self.assertEqual(store.convert_to_cents(), 0)
+
+            # The backup keeps the dollar figures; the history files were copied aside with it
+            with open(config['json_path'] + DOLLAR_BACKUP_SUFFIX, 'r') as f:
+                self.assertEqual(json.load(f)['1001']['balance'], 10250.5)
+            self.assertTrue(os.path.isdir(config['history_path'] + DOLLAR_BACKUP_SUFFIX))
+            store = create_store(config)
+            account = store.get_account('1001')
+            self.assertEqual(account['balance'], 1025050)
+            self.assertEqual(account['preferences']['alert_threshold'], 10000)
+            self.assertEqual([t['amount'] for t in store.get_history('1001')], [1000000, 25050])
+
+class HistoryPageTest(unittest.TestCase):
+
+    def _run(self, backend):
+        with tempfile.TemporaryDirectory() as directory:
+            # Small history files, so pages cross file boundaries
+            store = create_store(dict(_config(directory, backend), history_segment_size=7))
+            bank = Bank(store=store)
+            bank.create_account('1', 'Ann Lee', 'ann@example.com', 5000)
+            for i in range(1, 31):
+                bank.deposit('1', i)
+                if i == 20 and backend == 'json':
+                    store.checkpoint()  # Older pages from history files, newer ones from the journal
+
+            amounts = []
+            page = store.get_history_page('1', limit=8)
+            self.assertEqual(page['total'], 31)
+            # A transaction added while paging does not shift the older pages
+            bank.deposit('1', 99)
+            while True:
+                amounts.extend(t['amount'] for t in page['transactions'])
+                if page['next_cursor'] is None:
+                    break
+                page = store.get_history_page('1', page['next_cursor'], limit=8)
+            self.assertEqual(amounts, list(range(30, 0, -1)) + [5000])
+
+    def test_json_backend(self):
+        self._run('json')
+
+    def test_sqlite_backend(self):
+        self._run('sqlite')
+
+class IndexTest(unittest.TestCase):
+
+    def _run(self, backend):
+        with tempfile.TemporaryDirectory() as directory:
+            store = create_store(_config(directory, backend))
+            bank = Bank(store=store)
+            bank.create_account('1', 'Ann Lee', 'ann@example.com', 5000,
+                                {'phone': '404-401-3601', 'country': 'USA'})
+            bank.create_account('2', 'Bo Lee', 'bo@example.com', 20000)
+            bank.create_account('3', 'Cy Tan', 'cy@example.com', 9000)
+            _set_preferences(store, '2', alert_threshold=25000)
+            _set_preferences(store, '3', low_balance_alert=False)
+
+            self.assertEqual(store.find_accounts('phone', '+14044013601'), ['1'])
+            self.assertEqual(store.search_accounts('search', 'lee'), ['1', '2'])
+            self.assertEqual(store.search_accounts('search', 'bo l'), ['2'])
+
+            # Default threshold ($100) for account 1; account 3 has alerts off
+            bank.withdraw('1', 4500)
+            below = store.low_balance_accounts()
+            self.assertEqual([row['account'] for row in below], ['1', '2'])
+            self.assertEqual(below[0], {'account': '1', 'balance': 500, 'threshold': 10000})
+            bank.deposit('2', 10000)
+            self.assertEqual([row['account'] for row in store.low_balance_accounts()], ['1'])
+
+    def test_json_backend(self):
+        self._run('json')
+
+    def test_sqlite_backend(self):
+        self._run('sqlite')
+
+if __name__ == '__main__':
+    unittest.main()